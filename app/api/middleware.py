@@ -0,0 +1,56 @@
+"""
+Middlewares ASGI da aplicação.
+
+`RequestTracingMiddleware` abre um trace por requisição HTTP (app.core.tracing):
+aceita o X-Request-ID recebido (ou gera um), devolve-o na resposta e grava
+método, rota e status na linha JSON do trace. Também alimenta o histograma de
+latência por rota exposto em /metrics.
+"""
+import re
+import time
+
+from app.core.metrics import histogram
+from app.core.tracing import trace, current_request_id
+
+REQUEST_SECONDS = histogram(
+    "barbershop_http_request_duration_seconds",
+    "Duração das requisições HTTP, por rota",
+    ("method", "route", "status"),
+)
+
+REQUEST_ID_HEADER = b"x-request-id"
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+
+class RequestTracingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        received = dict(scope["headers"]).get(REQUEST_ID_HEADER, b"").decode("latin-1")
+        request_id = received if _VALID_REQUEST_ID.match(received) else None
+
+        started = time.perf_counter()
+        status = 500
+        with trace("http", request_id, method=scope["method"], path=scope["path"], status=status) as current:
+            response_id = current_request_id().encode()
+
+            async def send_with_request_id(message):
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    if current is not None:
+                        current.attrs["status"] = status
+                    message["headers"] = [*message.get("headers", []), (REQUEST_ID_HEADER, response_id)]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_request_id)
+            finally:
+                # Rota declarada ("/chat/web"), não o caminho: cardinalidade fixa
+                route = getattr(scope.get("route"), "path", "unmatched")
+                REQUEST_SECONDS.observe(time.perf_counter() - started, scope["method"], route, str(status))
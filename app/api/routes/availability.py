@@ -0,0 +1,91 @@
+from datetime import date
+
+from fastapi import APIRouter, HTTPException, Query, status
+from pydantic import BaseModel
+
+from app.core.config import SLOT_STEP_MINUTES
+from app.core.logging import get_logger
+from app.core.timezone import TZ, today_br
+from app.repositories.services_repo import find_service_by_id
+from app.services.availability import search_availability
+from app.services.parsers import parse_br_time
+
+logger = get_logger(__name__)
+
+router = APIRouter()
+
+MAX_SEARCH_DAYS = 31
+MAX_RESULTS = 50
+
+
+class SlotOut(BaseModel):
+    barber_id: int
+    barber_name: str
+    date: str
+    time: str
+    start_at: str
+
+
+class AvailabilityOut(BaseModel):
+    slots: list[SlotOut]
+
+
+@router.get("/availability", response_model=AvailabilityOut)
+def get_availability(
+    date_from: date | None = Query(None, alias="date", description="Primeiro dia (YYYY-MM-DD); default: hoje"),
+    days: int = Query(7, ge=1, le=MAX_SEARCH_DAYS),
+    time_pref: str = Query("09:00", alias="time", description="Horário preferido (ex: 14:00 ou 14h)"),
+    service_id: int | None = None,
+    duration_minutes: int | None = Query(None, ge=1, le=8 * 60),
+    barber_id: int | None = None,
+    limit: int = Query(5, ge=1, le=MAX_RESULTS),
+):
+    """
+    GET /availability
+
+    Retorna os `limit` horários livres mais próximos do horário preferido entre
+    `date` e `date + days - 1`, para um barbeiro ou qualquer barbeiro ativo.
+
+    A duração vem do serviço (`service_id`) ou de `duration_minutes`.
+    """
+    preferred = parse_br_time(time_pref)
+    if not preferred:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Horário inválido (ex: 14:00 ou 14h)"
+        )
+
+    if service_id is not None:
+        service = find_service_by_id(service_id)
+        if not service:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Serviço não encontrado"
+            )
+        duration = int(service["duration_minutes"])
+    else:
+        duration = duration_minutes or SLOT_STEP_MINUTES
+
+    results = search_availability(
+        start_date=date_from or today_br(),
+        days=days,
+        duration_minutes=duration,
+        preferred_time=preferred,
+        tz=TZ,
+        barber_id=barber_id,
+        limit=limit,
+    )
+    logger.debug("Availability search: %d slots", len(results))
+
+    return AvailabilityOut(
+        slots=[
+            SlotOut(
+                barber_id=r["barber_id"],
+                barber_name=r["barber_name"],
+                date=r["start"].date().isoformat(),
+                time=r["start"].strftime("%H:%M"),
+                start_at=r["start"].isoformat(),
+            )
+            for r in results
+        ]
+    )
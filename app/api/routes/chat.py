@@ -2,13 +2,8 @@ from fastapi import APIRouter, HTTPException, status
 from pydantic import BaseModel, Field
 import re
 
-from app.repositories.clients_repo import (
-    upsert_client_by_key,
-    get_client_state_and_ctx,
-    set_client_state_and_ctx,
-)
-from app.services.conversation import handle_message
-from app.core.logging import get_logger
+from app.services.inbound import run_conversation_turn
+from app.core.logging import get_logger, kv
 
 logger = get_logger(__name__)
 
@@ -66,30 +61,12 @@ def chat_web(payload: WebChatIn):
         # Valida client_id
         _validate_client_id(payload.client_id)
         
-        logger.info(f"Chat request from client: {payload.client_id}")
+        logger.info("Chat request", extra=kv(client_id=payload.client_id))
         
-        # Garante que o cliente existe no BD
-        upsert_client_by_key(client_key=payload.client_id)
+        # Carrega/cria cliente, processa e persiste o novo estado em uma única transação
+        reply, state, next_state, buttons = run_conversation_turn(payload.client_id, payload.message)
 
-        # Recupera estado e contexto do cliente
-        state, ctx = get_client_state_and_ctx(payload.client_id)
-        # Injeta client_key no contexto para permitir criação de appointment na service layer
-        if isinstance(ctx, dict) and "client_key" not in ctx:
-            ctx["client_key"] = payload.client_id
-        
-        logger.debug(f"Client state: {state}")
-
-        # Processa mensagem
-        reply, next_state, next_ctx, buttons = handle_message(
-            current_state=state,
-            ctx=ctx,
-            message=payload.message,
-        )
-
-        # Persiste novo estado
-        set_client_state_and_ctx(payload.client_id, next_state, next_ctx)
-        
-        logger.info(f"State transition: {state} -> {next_state}")
+        logger.info("State transition", extra=kv(client_id=payload.client_id, state=state, next_state=next_state))
 
         return WebChatOut(
             reply=reply,
@@ -100,7 +77,7 @@ def chat_web(payload: WebChatIn):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Erro ao processar chat: {str(e)}", exc_info=True)
+        logger.error("Erro ao processar chat: %s", e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Erro ao processar mensagem"
@@ -1,7 +1,41 @@
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from app.repositories.db import get_storage_profile, get_pool_stats
+from app.services.inbound import inbound_queue
+from app.services.dedupe import message_deduper
+from app.services.outbox import outbox_dispatcher
+from app.services.nlu_engine import get_nlu_engine
+from app.core.tracing import get_tracing_stats
+from app.services.health import check_readiness
 
 router = APIRouter()
 
 @router.get("/health")
 def health():
+    return {
+        "status": "ok",
+        "storage": get_storage_profile(),
+        "db_pool": get_pool_stats(),
+        "inbound_queue": inbound_queue.stats(),
+        "dedupe": message_deduper.stats(),
+        "outbox": outbox_dispatcher.stats(),
+        "nlu": get_nlu_engine().stats(),
+        "tracing": get_tracing_stats(),
+    }
+
+
+@router.get("/health/live")
+def health_live():
+    """Liveness: o processo responde (sem consultar dependências)."""
     return {"status": "ok"}
+
+
+@router.get("/health/ready")
+def health_ready():
+    """Readiness: 200 se banco, scheduler e filas estão saudáveis; senão 503 para o balanceador drenar."""
+    result = check_readiness()
+    return JSONResponse(
+        {"status": "ready" if result["ready"] else "not_ready", **result},
+        status_code=200 if result["ready"] else 503,
+    )
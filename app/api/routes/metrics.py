@@ -0,0 +1,86 @@
+"""
+GET /metrics: métricas no formato de texto do Prometheus.
+
+Histogramas e contadores do caminho quente ficam junto de quem os alimenta
+(middleware HTTP, turnos, handlers de estado, SQL, job de lembretes). Aqui são
+registrados os valores lidos só na coleta: hits de cache, filas e pool.
+"""
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core.metrics import register_collector, render_metrics
+from app.repositories.catalog_cache import barbers_cache, services_cache
+from app.repositories.db import get_pool_stats
+from app.repositories.outbox_repo import get_outbox_counts
+from app.services.availability_index import availability_index
+from app.services.dedupe import message_deduper
+from app.services.inbound import inbound_queue
+from app.services.nlu_engine import get_nlu_engine
+from app.services.outbox import outbox_dispatcher
+
+router = APIRouter()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _cache_metrics():
+    dedupe = message_deduper.stats()
+    nlu = get_nlu_engine().stats()
+    caches = {
+        "catalog_barbers": (barbers_cache.hits, barbers_cache.misses),
+        "catalog_services": (services_cache.hits, services_cache.misses),
+        "availability_index": (availability_index.hits, availability_index.misses),
+        # Miss do dedupe = consulta ao banco (mensagem nova ou duplicata antiga)
+        "dedupe": (dedupe["hits"], dedupe["db_hits"] + dedupe["misses"]),
+        "nlu": (nlu["hits"], nlu["misses"]),
+    }
+    yield "barbershop_cache_hits_total", "counter", "Acertos de cache em memória", [
+        ({"cache": name}, hits) for name, (hits, _) in caches.items()
+    ]
+    yield "barbershop_cache_misses_total", "counter", "Faltas de cache em memória", [
+        ({"cache": name}, misses) for name, (_, misses) in caches.items()
+    ]
+    yield "barbershop_cache_hit_ratio", "gauge", "Fração de acertos desde o início do processo", [
+        ({"cache": name}, hits / (hits + misses) if hits + misses else 0.0)
+        for name, (hits, misses) in caches.items()
+    ]
+
+
+def _queue_metrics():
+    inbound = inbound_queue.stats()
+    outbox = get_outbox_counts()
+    pool = get_pool_stats()
+    yield "barbershop_inbound_queue_depth", "gauge", "Mensagens aguardando na fila de entrada", [
+        ({}, inbound["depth"]),
+    ]
+    yield "barbershop_outbox_messages", "gauge", "Mensagens na outbox por status", [
+        ({"status": "pending"}, outbox["pending"]),
+        ({"status": "dead"}, outbox["dead"]),
+    ]
+    yield "barbershop_outbox_oldest_pending_age_seconds", "gauge", "Idade da mensagem pendente mais antiga", [
+        ({}, outbox["oldest_pending_age_s"]),
+    ]
+    yield "barbershop_outbox_deliveries_total", "counter", "Entregas da outbox por resultado (este processo)", [
+        ({"result": "sent"}, outbox_dispatcher.sent),
+        ({"result": "failed_attempt"}, outbox_dispatcher.failed_attempts),
+        ({"result": "dead_lettered"}, outbox_dispatcher.dead),
+    ]
+    yield "barbershop_outbox_retries_total", "counter", "Envios de mensagens que já tinham falhado (este processo)", [
+        ({}, outbox_dispatcher.retried),
+    ]
+    yield "barbershop_db_pool_connections", "gauge", "Conexões do pool SQLite", [
+        ({"state": "in_use"}, pool["in_use"]),
+        ({"state": "idle"}, pool["idle"]),
+    ]
+    yield "barbershop_db_pool_wait_seconds_total", "counter", "Tempo total esperando conexão livre no pool", [
+        ({}, pool["wait_ms_total"] / 1000),
+    ]
+
+
+register_collector(_cache_metrics)
+register_collector(_queue_metrics)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type=CONTENT_TYPE)
@@ -5,26 +5,26 @@ GET: Verificação do webhook (challenge)
 POST: Recebimento de mensagens
 """
 from fastapi import APIRouter, HTTPException, status, Request
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-import os
+import asyncio
 from app.integrations.channels.whatsapp import (
     verify_webhook_signature,
-    extract_message_from_webhook,
+    parse_webhook_body,
+    iter_webhook_messages,
     normalize_client_id,
-    send_message_via_graph_api,
+    enqueue_whatsapp_message,
 )
-from app.repositories.clients_repo import upsert_client_by_key, get_client_state_and_ctx, set_client_state_and_ctx
-from app.services.conversation import handle_message
-from app.core.logging import get_logger
+from app.services.inbound import inbound_queue, run_conversation_turn
+from app.services.dedupe import message_deduper
+from app.core.config import WHATSAPP_VERIFY_TOKEN
+from app.core.logging import get_logger, kv
+from app.core.tracing import trace, current_request_id
 
 logger = get_logger(__name__)
 
 router = APIRouter(prefix="/webhook")
 
-# Carrega config do .env
-WHATSAPP_VERIFY_TOKEN = os.getenv("WHATSAPP_VERIFY_TOKEN", "")
-WHATSAPP_ACCESS_TOKEN = os.getenv("WHATSAPP_ACCESS_TOKEN", "")
-WHATSAPP_PHONE_ID = os.getenv("WHATSAPP_PHONE_ID", "")
 
 
 @router.get("/whatsapp")
@@ -41,7 +41,7 @@ async def verify_webhook(
     
     Se o token estiver correto, respondemos com o challenge.
     """
-    logger.debug(f"Webhook verification request: mode={hub_mode}, token={hub_verify_token}")
+    logger.debug("Webhook verification request", extra=kv(mode=hub_mode, token=hub_verify_token))
     
     if not hub_mode or not hub_challenge or not hub_verify_token:
         raise HTTPException(
@@ -56,7 +56,7 @@ async def verify_webhook(
         )
     
     if hub_verify_token != WHATSAPP_VERIFY_TOKEN:
-        logger.warning(f"Token de verificação inválido: {hub_verify_token}")
+        logger.warning("Token de verificação inválido", extra=kv(token=hub_verify_token))
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Token inválido"
@@ -97,64 +97,78 @@ async def receive_message(request: Request):
             logger.warning("X-Hub-Signature-256 ausente")
             # Nota: em produção, rejeitar sem assinatura; por enquanto, permitir para testes
         elif WHATSAPP_VERIFY_TOKEN:
-            if not verify_webhook_signature(body.decode(), signature, WHATSAPP_VERIFY_TOKEN):
+            if not verify_webhook_signature(body, signature, WHATSAPP_VERIFY_TOKEN):
                 logger.warning("Assinatura do webhook inválida")
                 raise HTTPException(
                     status_code=status.HTTP_403_FORBIDDEN,
                     detail="Assinatura inválida"
                 )
         
-        # Parseia payload
-        payload = await request.json()
-        logger.debug(f"Webhook payload: {payload}")
+        # Parseia payload (uma vez, dos mesmos bytes usados na assinatura)
+        payload = parse_webhook_body(body)
+        logger.debug("Webhook payload: %s", payload)
         
-        # Extrai mensagem
-        result = extract_message_from_webhook(payload)
-        if not result:
-            logger.info("Nenhuma mensagem de texto encontrada no webhook")
-            return {"status": "ok"}  # Retorna OK mesmo sem mensagem
+        # Processa todas as mensagens do lote (várias entries/changes/messages por POST).
+        # Responde 200 imediatamente; o processamento segue na fila de entrada
+        # (particionada por telefone: mensagens do mesmo cliente ficam em ordem).
+        # Sem fila ativa ou com a partição cheia responde 503: a Meta reenvia o lote
+        # e as mensagens já enfileiradas são descartadas pelo dedupe.
+        received = 0
+        for message_id, phone, msg_type, message_text in iter_webhook_messages(payload):
+            if message_text is None:
+                logger.info("Mensagem ignorada", extra=kv(message_id=message_id, type=msg_type))
+                continue
+            if message_deduper.seen(message_id):
+                # Reentrega da Meta de mensagem já processada (só memória: sem I/O no event loop);
+                # a confirmação definitiva é feita na transação do turno
+                logger.info("Mensagem duplicada ignorada", extra=kv(message_id=message_id))
+                continue
+            received += 1
+            logger.info("Mensagem recebida: %s", message_text, extra=kv(phone=phone, message_id=message_id))
+            request_id = current_request_id()
+            args = (phone, message_text, request_id, message_id)
+            if not await inbound_queue.put(phone, process_whatsapp_message, *args):
+                logger.warning("Fila de entrada indisponível; pedindo reenvio", extra=kv(message_id=message_id))
+                return JSONResponse({"status": "unavailable"}, status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
         
-        phone, message_text = result
-        client_id = normalize_client_id(phone)
-        
-        logger.info(f"Mensagem recebida de {phone}: {message_text}")
-        
-        # Garante que cliente existe
-        upsert_client_by_key(client_key=client_id)
-        
-        # Recupera estado e contexto
-        state, ctx = get_client_state_and_ctx(client_id)
-        if isinstance(ctx, dict) and "client_key" not in ctx:
-            ctx["client_key"] = client_id
-        
-        # Processa mensagem
-        reply, next_state, next_ctx, buttons = handle_message(
-            current_state=state,
-            ctx=ctx,
-            message=message_text,
-        )
-        
-        # Persiste novo estado
-        set_client_state_and_ctx(client_id, next_state, next_ctx)
-        
-        logger.info(f"Estado: {state} → {next_state}")
-        
-        # Envia resposta via WhatsApp
-        success = await send_message_via_graph_api(
-            phone=phone,
-            text=reply,
-            buttons=buttons,
-            access_token=WHATSAPP_ACCESS_TOKEN,
-            phone_id=WHATSAPP_PHONE_ID,
-        )
-        
-        if not success:
-            logger.error(f"Falha ao enviar resposta para {phone}")
-            # Retorna OK mesmo se falhar (para não retentar o webhook)
+        if not received:
+            logger.info("Nenhuma mensagem processável encontrada no webhook")
         
         return {"status": "ok"}
     
     except Exception as e:
-        logger.error(f"Erro ao processar webhook: {str(e)}", exc_info=True)
+        logger.error("Erro ao processar webhook: %s", e, exc_info=True)
         # Retorna OK para não causar retry
         return {"status": "error", "detail": str(e)}
+
+
+async def process_whatsapp_message(
+    phone: str,
+    message_text: str,
+    request_id: str | None = None,
+    message_id: str | None = None,
+) -> None:
+    """
+    Processa uma mensagem do WhatsApp: turno da conversa + resposta na outbox.
+
+    O turno (SQLite, síncrono) roda em uma thread para não bloquear o event loop.
+    A resposta e o id da mensagem (idempotência) são gravados na mesma transação
+    do novo estado; a resposta é entregue pelo dispatcher (com retentativas). O
+    turno tem trace próprio ("whatsapp.turn") com o request id do webhook que o recebeu.
+    """
+    client_id = normalize_client_id(phone)
+    with trace("whatsapp.turn", request_id) as current:
+        result = await asyncio.to_thread(
+            run_conversation_turn,
+            client_id,
+            message_text,
+            lambda reply, buttons: enqueue_whatsapp_message(phone, reply, buttons),
+            message_id,
+        )
+        if result is None:
+            logger.info("Mensagem duplicada ignorada", extra=kv(message_id=message_id))
+            return
+        reply, state, next_state, buttons = result
+        if current is not None:
+            current.attrs.update(state=state, next_state=next_state)
+        logger.info("Transição de estado", extra=kv(client_id=client_id, state=state, next_state=next_state))
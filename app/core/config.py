@@ -1,3 +1,5 @@
+import os
+
 BUSINESS_START = "09:00"
 BUSINESS_END = "19:00"
 
@@ -5,3 +7,98 @@ LUNCH_START = "12:00"
 LUNCH_END = "13:00"
 
 SLOT_STEP_MINUTES = 30
+
+# Pool de conexões SQLite
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "8"))
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "5"))
+
+# Perfil de armazenamento SQLite (pragmas aplicados em cada conexão nova).
+# "legacy" mantém os padrões do SQLite (rollback journal), útil para comparação.
+SQLITE_STORAGE_PROFILES = {
+    "legacy": {},
+    "wal": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,      # ms
+        "cache_size": -16000,      # negativo = KiB (~16 MB)
+        "mmap_size": 134217728,    # 128 MB
+        "temp_store": "MEMORY",
+    },
+}
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "wal")
+
+# Índice de disponibilidade em memória (ocupação por minuto por barbeiro/dia)
+AVAILABILITY_INDEX_MAX_ENTRIES = int(os.getenv("AVAILABILITY_INDEX_MAX_ENTRIES", "4096"))
+
+# Busca "próximo horário livre com qualquer barbeiro" quando o dia escolhido está cheio
+NEXT_FREE_SEARCH_DAYS = 7
+
+# Job de lembretes D-1: agendamentos processados por lote (consulta + UPDATE em lote)
+REMINDER_BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", "500"))
+
+# Credenciais da WhatsApp Cloud API
+WHATSAPP_VERIFY_TOKEN = os.getenv("WHATSAPP_VERIFY_TOKEN", "")
+WHATSAPP_ACCESS_TOKEN = os.getenv("WHATSAPP_ACCESS_TOKEN", "")
+WHATSAPP_PHONE_ID = os.getenv("WHATSAPP_PHONE_ID", "")
+
+# Cliente HTTP da WhatsApp Graph API (um AsyncClient de longa duração por processo)
+WHATSAPP_GRAPH_API_URL = os.getenv("WHATSAPP_GRAPH_API_URL", "https://graph.facebook.com/v18.0")
+WHATSAPP_HTTP_MAX_CONNECTIONS = int(os.getenv("WHATSAPP_HTTP_MAX_CONNECTIONS", "20"))
+WHATSAPP_HTTP_MAX_KEEPALIVE = int(os.getenv("WHATSAPP_HTTP_MAX_KEEPALIVE", "20"))
+WHATSAPP_HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("WHATSAPP_HTTP_KEEPALIVE_EXPIRY_SECONDS", "30"))
+WHATSAPP_HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("WHATSAPP_HTTP_CONNECT_TIMEOUT_SECONDS", "3"))
+WHATSAPP_HTTP_READ_TIMEOUT_SECONDS = float(os.getenv("WHATSAPP_HTTP_READ_TIMEOUT_SECONDS", "10"))
+# HTTP/2 só é usado se o pacote `h2` estiver instalado
+WHATSAPP_HTTP2 = os.getenv("WHATSAPP_HTTP2", "1") == "1"
+
+# Fila de entrada do webhook do WhatsApp (processamento em segundo plano)
+INBOUND_WORKERS = int(os.getenv("INBOUND_WORKERS", "4"))
+INBOUND_QUEUE_MAXSIZE = int(os.getenv("INBOUND_QUEUE_MAXSIZE", "1000"))
+INBOUND_DRAIN_TIMEOUT_SECONDS = float(os.getenv("INBOUND_DRAIN_TIMEOUT_SECONDS", "10"))
+# Espera máxima por vaga na partição do cliente; depois disso o webhook responde 503 (a Meta reenvia)
+INBOUND_SUBMIT_TIMEOUT_SECONDS = float(os.getenv("INBOUND_SUBMIT_TIMEOUT_SECONDS", "0.5"))
+
+# Serialização por cliente: turnos de um mesmo client_key nunca rodam em paralelo
+CONVERSATION_LOCK_STRIPES = int(os.getenv("CONVERSATION_LOCK_STRIPES", "64"))
+# Turno refeito quando outra conexão/processo grava o estado no meio dele
+CONVERSATION_STALE_RETRIES = 3
+
+# Idempotência do webhook: ids de mensagem já recebidos (a Meta reentrega por até 7 dias)
+DEDUPE_TTL_SECONDS = int(os.getenv("DEDUPE_TTL_SECONDS", str(7 * 24 * 3600)))
+DEDUPE_CACHE_MAX_ENTRIES = int(os.getenv("DEDUPE_CACHE_MAX_ENTRIES", "10000"))
+
+# Outbox (fila de saída persistente): dispatcher em lote com backoff e dead-letter
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "1.0"))
+OUTBOX_RATE_PER_SECOND = float(os.getenv("OUTBOX_RATE_PER_SECOND", "80"))
+OUTBOX_RATE_BURST = int(os.getenv("OUTBOX_RATE_BURST", "20"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "6"))
+OUTBOX_RETRY_BASE_SECONDS = float(os.getenv("OUTBOX_RETRY_BASE_SECONDS", "2"))
+OUTBOX_RETRY_MAX_SECONDS = float(os.getenv("OUTBOX_RETRY_MAX_SECONDS", "300"))
+
+# Readiness (GET /health/ready): acima destes limites a instância sai do balanceador
+HEALTH_DB_TIMEOUT_SECONDS = float(os.getenv("HEALTH_DB_TIMEOUT_SECONDS", "1.0"))
+HEALTH_INBOUND_MAX_FILL = float(os.getenv("HEALTH_INBOUND_MAX_FILL", "0.8"))  # fração de INBOUND_QUEUE_MAXSIZE
+HEALTH_OUTBOX_MAX_PENDING = int(os.getenv("HEALTH_OUTBOX_MAX_PENDING", "500"))
+HEALTH_OUTBOX_MAX_AGE_SECONDS = float(os.getenv("HEALTH_OUTBOX_MAX_AGE_SECONDS", "120"))
+HEALTH_SCHEDULER_MAX_LATE_SECONDS = float(os.getenv("HEALTH_SCHEDULER_MAX_LATE_SECONDS", "60"))
+
+# Motor de NLU: "rules" (palavras-chave, padrão), "trigram" (modelo local de
+# trigramas, substituto de um modelo/LLM) ou caminho "pacote.modulo:Classe"
+NLU_ENGINE = os.getenv("NLU_ENGINE", "rules")
+NLU_CACHE_MAX_ENTRIES = int(os.getenv("NLU_CACHE_MAX_ENTRIES", "4096"))
+
+# Similaridade mínima (0-1) para aceitar um nome de barbeiro/serviço digitado com erro
+NAME_MATCH_MIN_SCORE = float(os.getenv("NAME_MATCH_MIN_SCORE", "0.8"))
+
+# Logging: nível dos loggers da aplicação (DEBUG inclui payloads do webhook) e
+# arquivo único com rotação em logs/app.log
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FILE_MAX_BYTES = int(os.getenv("LOG_FILE_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_FILE_BACKUP_COUNT = int(os.getenv("LOG_FILE_BACKUP_COUNT", "5"))
+
+# Tracing de requisições: uma linha JSON por requisição/turno em logs/trace.jsonl
+# com o tempo por etapa. Grava uma amostra aleatória (TRACE_SAMPLE_RATE, 0-1) e
+# sempre as mais lentas que TRACE_SLOW_MS; ambos 0 desligam o tracing.
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "500"))
@@ -0,0 +1,29 @@
+"""
+Locks por chave (striped locks).
+
+Serializa trabalho de uma mesma chave (ex: client_key) sem um lock por cliente:
+as chaves são distribuídas por hash estável entre um número fixo de locks.
+Chaves diferentes podem compartilhar um stripe (contenção ocasional), mas a
+mesma chave sempre cai no mesmo lock.
+
+Uso:
+    with conversation_locks.lock_for("wa:5511987654321"):
+        ...
+"""
+import threading
+import zlib
+
+
+def key_shard(key: str, shards: int) -> int:
+    """Índice estável (entre processos e execuções) de `key` em `shards` partes."""
+    return zlib.crc32(key.encode("utf-8")) % shards
+
+
+class StripedLock:
+    """Tabela fixa de threading.Lock indexada por hash da chave."""
+
+    def __init__(self, stripes: int = 64):
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+    def lock_for(self, key: str) -> threading.Lock:
+        return self._locks[key_shard(key, len(self._locks))]
@@ -1,45 +1,174 @@
+import atexit
 import logging
+import queue
 import sys
+import threading
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
 
+from app.core.config import LOG_LEVEL, LOG_FILE_MAX_BYTES, LOG_FILE_BACKUP_COUNT
+
 # Configuração centralizada de logging
+#
+# Os loggers só enfileiram o registro (QueueHandler); uma thread (QueueListener)
+# formata e grava no console e num único arquivo com rotação (logs/app.log).
+# Assim nenhum logger.info no event loop espera por disco ou stdout.
 LOG_DIR = Path(__file__).resolve().parents[2] / "logs"
 LOG_DIR.mkdir(exist_ok=True)
+LOG_FILE = LOG_DIR / "app.log"
+# Traces de requisição (app.core.tracing): só a linha JSON, em arquivo próprio
+TRACE_LOGGER = "app.trace"
+TRACE_FILE = LOG_DIR / "trace.jsonl"
+
+# Id da requisição/turno atual (definido por app.core.tracing.trace), anexado
+# a todo registro como request_id=...
+request_id_var: ContextVar[str | None] = ContextVar("request_id", default=None)
+
+# O formato não usa processo/multiprocessing: menos trabalho por LogRecord
+logging.logProcesses = False
+logging.logMultiprocessing = False
+
+
+class _InlineQueueHandler(QueueHandler):
+    """
+    QueueHandler para fila no mesmo processo.
+
+    A mensagem é montada aqui (argumentos mutáveis, como o payload, poderiam
+    mudar antes da thread de logging formatar), mas sem a cópia do registro que
+    o QueueHandler padrão faz; com exceção, segue o caminho padrão (traceback).
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.request_id = request_id_var.get()
+        if record.exc_info or record.stack_info:
+            return super().prepare(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        return record
+
+
+_queue: queue.SimpleQueue = queue.SimpleQueue()
+_queue_handler = _InlineQueueHandler(_queue)
+_listener: QueueListener | None = None
+_listener_lock = threading.Lock()
+
+
+def kv(**fields) -> dict:
+    """
+    Campos estruturados de um registro, para `extra=`.
+
+    Exemplo:
+        logger.info("Mensagem recebida", extra=kv(wa_id=phone, message_id=mid))
+        -> "... Mensagem recebida wa_id=5511... message_id=wamid..."
+
+    Os campos são formatados na thread de logging, não em quem loga.
+    """
+    return {"fields": fields}
+
+
+class KeyValueFormatter(logging.Formatter):
+    """Formato da aplicação seguido dos campos de `kv()` como chave=valor."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = getattr(record, "fields", None) or {}
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            fields = {**fields, "request_id": request_id}
+        if fields:
+            pairs = " ".join(f"{key}={_format_value(value)}" for key, value in fields.items())
+            line = f"{line} {pairs}" if "\n" not in line else line.replace("\n", f" {pairs}\n", 1)
+        return line
+
+
+def _format_value(value) -> str:
+    text = str(value)
+    return repr(text) if not text or any(ch.isspace() or ch in "='\"" for ch in text) else text
+
+
+class _TraceFilter(logging.Filter):
+    """Separa as linhas de trace (só no arquivo de traces) dos demais registros."""
+
+    def __init__(self, traces: bool):
+        super().__init__()
+        self.traces = traces
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return (record.name == TRACE_LOGGER) == self.traces
+
+
+def _build_handlers(log_file: Path = LOG_FILE, stream=None, trace_file: Path = TRACE_FILE) -> list[logging.Handler]:
+    formatter = KeyValueFormatter(
+        "[%(asctime)s] [%(name)s] [%(levelname)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S"
+    )
+
+    # Console (INFO e acima)
+    console_handler = logging.StreamHandler(stream or sys.stdout)
+    console_handler.setLevel(logging.INFO)
+    console_handler.setFormatter(formatter)
+    console_handler.addFilter(_TraceFilter(traces=False))
+
+    # Arquivo compartilhado por todos os módulos (tudo que passar por LOG_LEVEL)
+    file_handler = RotatingFileHandler(
+        log_file, maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUP_COUNT, encoding="utf-8"
+    )
+    file_handler.setFormatter(formatter)
+    file_handler.addFilter(_TraceFilter(traces=False))
+
+    # Uma linha JSON por trace
+    trace_handler = RotatingFileHandler(
+        trace_file, maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUP_COUNT, encoding="utf-8", delay=True
+    )
+    trace_handler.setFormatter(logging.Formatter("%(message)s"))
+    trace_handler.addFilter(_TraceFilter(traces=True))
+    return [console_handler, file_handler, trace_handler]
+
+
+def start_log_listener() -> None:
+    """Inicia a thread que grava os registros enfileirados (idempotente)."""
+    global _listener
+    with _listener_lock:
+        if _listener is None:
+            _listener = QueueListener(_queue, *_build_handlers(), respect_handler_level=True)
+            _listener.start()
+
+
+def stop_log_listener() -> None:
+    """Grava o que está na fila e encerra a thread de logging."""
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+            _listener = None
+
+
+atexit.register(stop_log_listener)
 
 
 def get_logger(name: str) -> logging.Logger:
     """
     Retorna um logger configurado com formato estruturado.
-    
+
+    Use formatação preguiçosa nos caminhos quentes, para que a mensagem só seja
+    montada se o nível estiver habilitado:
+        logger.debug("Webhook payload: %s", payload)
+
     Args:
         name: Nome do módulo (__name__)
-    
+
     Returns:
         logging.Logger configurado
     """
     logger = logging.getLogger(name)
-    
+
     if logger.handlers:
         return logger
-    
-    logger.setLevel(logging.DEBUG)
-    
-    # Formato estruturado
-    formatter = logging.Formatter(
-        "[%(asctime)s] [%(name)s] [%(levelname)s] %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S"
-    )
-    
-    # Handler para console (INFO e acima)
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(logging.INFO)
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-    
-    # Handler para arquivo (DEBUG e acima)
-    file_handler = logging.FileHandler(LOG_DIR / f"{name.replace('.', '_')}.log")
-    file_handler.setLevel(logging.DEBUG)
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
-    
+
+    logger.setLevel(LOG_LEVEL)
+    logger.addHandler(_queue_handler)
+    start_log_listener()
     return logger
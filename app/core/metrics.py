@@ -0,0 +1,203 @@
+"""
+Métricas em processo no formato de exposição de texto do Prometheus (sem dependências).
+
+- `counter(name, help, labels)`: contador (`inc`)
+- `histogram(name, help, labels, buckets)`: distribuição (`observe`), exposta
+  como _bucket/_count/_sum; a contagem também serve de contador
+- `register_collector(fn)`: valores lidos só na coleta (GET /metrics), como
+  profundidade de filas e hits de cache, sem custo no caminho quente
+
+Sem lock no caminho quente: cada thread atualiza o seu próprio shard (dict em
+`threading.local`) e a coleta soma os shards. Um lock só é usado quando uma
+thread cria o seu shard (uma vez por thread e métrica).
+
+Uso:
+    TURN_SECONDS = histogram("barbershop_turn_duration_seconds", "Turno", ("channel",))
+    TURN_SECONDS.observe(0.012, "web")
+"""
+import math
+import threading
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+# Latências de 1 ms a 10 s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# (nome, tipo, ajuda, [(labels, valor), ...])
+MetricFamily = tuple[str, str, str, list[tuple[dict, float]]]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _Sharded:
+    """Valores por thread: só a thread dona escreve no seu shard."""
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...]):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._local = threading.local()
+        self._shards: list[dict] = []
+        self._shards_lock = threading.Lock()
+
+    def _shard(self) -> dict:
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            with self._shards_lock:
+                self._shards.append(values)
+            return values
+
+    def _snapshot(self) -> list[dict]:
+        with self._shards_lock:
+            shards = list(self._shards)
+        # dict(shard) copia sem executar código Python: atômico sob o GIL
+        return [dict(shard) for shard in shards]
+
+
+class Counter(_Sharded):
+    """Contador monotônico, com valores de label posicionais (na ordem de `labelnames`)."""
+
+    type = "counter"
+
+    def inc(self, *labels, value: float = 1.0) -> None:
+        try:
+            shard = self._local.values
+        except AttributeError:
+            shard = self._shard()
+        shard[labels] = shard.get(labels, 0.0) + value
+
+    def value(self, *labels) -> float:
+        return sum(shard.get(labels, 0.0) for shard in self._snapshot())
+
+    def collect(self) -> Iterable[MetricFamily]:
+        totals: dict[tuple, float] = {}
+        for shard in self._snapshot():
+            for labels, value in shard.items():
+                totals[labels] = totals.get(labels, 0.0) + value
+        yield self.name, self.type, self.help, [
+            (dict(zip(self.labelnames, labels)), value) for labels, value in totals.items()
+        ]
+
+
+class Histogram(_Sharded):
+    """Histograma com buckets fixos."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels) -> None:
+        try:
+            shard = self._local.values
+        except AttributeError:
+            shard = self._shard()
+        # labels -> [contagem por bucket (não cumulativa, último = +Inf), soma, total]
+        series = shard.get(labels)
+        if series is None:
+            series = shard[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def _merged(self) -> dict[tuple, list]:
+        merged: dict[tuple, list] = {}
+        for shard in self._snapshot():
+            for labels, (counts, total, n) in shard.items():
+                counts = list(counts)
+                entry = merged.get(labels)
+                if entry is None:
+                    merged[labels] = [counts, total, n]
+                else:
+                    entry[0] = [a + b for a, b in zip(entry[0], counts)]
+                    entry[1] += total
+                    entry[2] += n
+        return merged
+
+    def count(self, *labels) -> int:
+        series = self._merged().get(labels)
+        return series[2] if series else 0
+
+    def collect(self) -> Iterable[MetricFamily]:
+        samples = []
+        for labels, (counts, total, n) in self._merged().items():
+            base = dict(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                samples.append(({**base, "le": _format_value(float(bound))}, cumulative, "_bucket"))
+            samples.append((base, total, "_sum"))
+            samples.append((base, n, "_count"))
+        yield self.name, self.type, self.help, samples
+
+
+_metrics: list = []
+_collectors: list[Callable[[], Iterable[MetricFamily]]] = []
+_registry_lock = threading.Lock()
+
+
+def counter(name: str, help: str, labelnames: tuple[str, ...] = ()) -> Counter:
+    metric = Counter(name, help, labelnames)
+    with _registry_lock:
+        _metrics.append(metric)
+    return metric
+
+
+def histogram(
+    name: str,
+    help: str,
+    labelnames: tuple[str, ...] = (),
+    buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+) -> Histogram:
+    metric = Histogram(name, help, labelnames, buckets)
+    with _registry_lock:
+        _metrics.append(metric)
+    return metric
+
+
+def register_collector(collector: Callable[[], Iterable[MetricFamily]]) -> None:
+    """Registra uma função chamada a cada coleta, que devolve famílias (nome, tipo, ajuda, amostras)."""
+    with _registry_lock:
+        if collector not in _collectors:
+            _collectors.append(collector)
+
+
+def render_metrics() -> str:
+    """Todas as métricas no formato de texto do Prometheus (version=0.0.4)."""
+    with _registry_lock:
+        sources = [metric.collect for metric in _metrics] + list(_collectors)
+
+    lines: list[str] = []
+    for source in sources:
+        for name, kind, help, samples in source():
+            lines.append(f"# HELP {name} {_escape(help)}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample in samples:
+                labels, value, suffix = sample if len(sample) == 3 else (*sample, "")
+                lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,49 @@
+"""
+Limitador de taxa (token bucket) para chamadas assíncronas.
+
+Uso:
+    bucket = TokenBucket(rate_per_second=80, burst=20)
+    await bucket.acquire()   # espera até haver um token disponível
+"""
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+    Token bucket assíncrono.
+
+    Reabastece `rate_per_second` tokens por segundo até o limite `burst`.
+    `acquire()` consome um token, dormindo o tempo necessário quando o balde
+    está vazio; chamadores concorrentes são atendidos em ordem de chegada.
+    """
+
+    def __init__(self, rate_per_second: float, burst: int = 1, clock=time.monotonic):
+        if rate_per_second <= 0:
+            raise ValueError("rate_per_second deve ser > 0")
+        if burst < 1:
+            raise ValueError("burst deve ser >= 1")
+        self.rate = float(rate_per_second)
+        self.burst = burst
+        self._clock = clock
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._lock = asyncio.Lock()
+        self.waits = 0
+        self.wait_total = 0.0
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                delay = (1 - self._tokens) / self.rate
+                self.waits += 1
+                self.wait_total += delay
+                await asyncio.sleep(delay)
+                self._refill()
+            self._tokens -= 1
@@ -0,0 +1,223 @@
+"""
+Tracing leve de requisições, sem APM externo.
+
+- `trace(name)`: abre o trace de uma requisição/turno/lote, com request id
+  (ContextVar, herdado por `asyncio.to_thread` e tasks criadas dentro dele)
+- `span(name)` / `@traced(name)`: somam o tempo de uma etapa (repositório, NLU,
+  disponibilidade, envio) no trace atual; sem trace ativo custam um
+  ContextVar.get()
+- Ao fechar, o trace vira uma linha JSON em logs/trace.jsonl com o tempo total
+  e, por etapa, quantas vezes rodou e quanto levou. Etapas aninhadas aparecem
+  cada uma com seu tempo (ex: `state.WAIT_CONFIRMATION` inclui
+  `db.create_appointment`)
+
+Amostragem: todo trace é medido, mas só é gravado se sorteado
+(TRACE_SAMPLE_RATE) ou se passou de TRACE_SLOW_MS. Com ambos 0 nada é medido.
+
+Exemplo de linha:
+    {"trace": "http", "request_id": "3f2a...", "duration_ms": 12.4,
+     "sampled": "slow", "method": "POST", "path": "/chat/web", "status": 200,
+     "stages": {"db.load_session": {"count": 1, "ms": 0.41}, ...}}
+"""
+import functools
+import inspect
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+from app.core.config import TRACE_SAMPLE_RATE, TRACE_SLOW_MS
+from app.core.logging import TRACE_LOGGER, get_logger, request_id_var
+
+trace_logger = get_logger(TRACE_LOGGER)
+trace_logger.setLevel(logging.INFO)  # independe de LOG_LEVEL: a amostragem já filtra
+
+_current_trace: ContextVar["Trace | None"] = ContextVar("current_trace", default=None)
+
+
+class Trace:
+    """Tempo total e por etapa de uma requisição."""
+
+    __slots__ = ("name", "request_id", "attrs", "stages", "started")
+
+    def __init__(self, name: str, request_id: str, attrs: dict):
+        self.name = name
+        self.request_id = request_id
+        self.attrs = attrs
+        # etapa -> [chamadas, tempo total (s)]
+        self.stages: dict[str, list] = {}
+        self.started = time.perf_counter()
+
+    def add(self, stage: str, elapsed: float) -> None:
+        entry = self.stages.get(stage)
+        if entry is None:
+            self.stages[stage] = [1, elapsed]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed
+
+    def to_dict(self, duration: float, sampled: str) -> dict:
+        return {
+            "trace": self.name,
+            "request_id": self.request_id,
+            "duration_ms": round(duration * 1000, 3),
+            "sampled": sampled,
+            **self.attrs,
+            "stages": {
+                stage: {"count": count, "ms": round(total * 1000, 3)}
+                for stage, (count, total) in sorted(self.stages.items(), key=lambda item: -item[1][1])
+            },
+        }
+
+
+class _Span:
+    __slots__ = ("_trace", "_name", "_started")
+
+    def __init__(self, trace: Trace, name: str):
+        self._trace = trace
+        self._name = name
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._trace.add(self._name, time.perf_counter() - self._started)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+_stats_lock = threading.Lock()
+_stats = {"traces": 0, "emitted": 0, "slow": 0}
+
+
+def tracing_enabled() -> bool:
+    return TRACE_SAMPLE_RATE > 0 or TRACE_SLOW_MS > 0
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def current_request_id() -> str | None:
+    return request_id_var.get()
+
+
+@contextmanager
+def trace(name: str, request_id: str | None = None, **attrs) -> Iterator[Trace | None]:
+    """
+    Abre um trace (requisição HTTP, turno de conversa, lote da outbox).
+
+    Args:
+        name: Tipo do trace ("http", "whatsapp.turn", ...)
+        request_id: Id recebido (ex: X-Request-ID) ou None para gerar um novo
+        **attrs: Campos extras da linha JSON; podem ser alterados via `Trace.attrs`
+
+    Yields:
+        O Trace (ou None com o tracing desligado)
+    """
+    request_id = request_id or new_request_id()
+    id_token = request_id_var.set(request_id)
+    if not tracing_enabled():
+        try:
+            yield None
+        finally:
+            request_id_var.reset(id_token)
+        return
+
+    current = Trace(name, request_id, attrs)
+    trace_token = _current_trace.set(current)
+    try:
+        yield current
+    finally:
+        _current_trace.reset(trace_token)
+        request_id_var.reset(id_token)
+        _finish(current)
+
+
+def _finish(current: Trace) -> None:
+    duration = time.perf_counter() - current.started
+    if TRACE_SLOW_MS > 0 and duration * 1000 >= TRACE_SLOW_MS:
+        sampled = "slow"
+    elif random.random() < TRACE_SAMPLE_RATE:
+        sampled = "random"
+    else:
+        sampled = None
+    with _stats_lock:
+        _stats["traces"] += 1
+        if sampled:
+            _stats["emitted"] += 1
+            _stats["slow"] += sampled == "slow"
+    if sampled:
+        trace_logger.info(json.dumps(current.to_dict(duration, sampled), ensure_ascii=False, default=str))
+
+
+def span(name: str):
+    """Mede um trecho como etapa do trace atual: `with span("nlu.analyze"): ...`"""
+    current = _current_trace.get()
+    if current is None:
+        return _NO_SPAN
+    return _Span(current, name)
+
+
+def add_span(name: str, elapsed: float) -> None:
+    """Soma um tempo já medido (segundos) como etapa do trace atual."""
+    current = _current_trace.get()
+    if current is not None:
+        current.add(name, elapsed)
+
+
+def traced(name: str):
+    """Decorator: cada chamada da função (sync ou async) é uma etapa `name`."""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                current = _current_trace.get()
+                if current is None:
+                    return await func(*args, **kwargs)
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    current.add(name, time.perf_counter() - started)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            current = _current_trace.get()
+            if current is None:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                current.add(name, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def get_tracing_stats() -> dict:
+    with _stats_lock:
+        return {
+            "enabled": tracing_enabled(),
+            "sample_rate": TRACE_SAMPLE_RATE,
+            "slow_ms": TRACE_SLOW_MS,
+            **_stats,
+        }
@@ -51,3 +51,13 @@ class Appointment:
     status: str = "scheduled"  # scheduled, completed, cancelled
     created_at: Optional[str] = None
     updated_at: Optional[str] = None
+
+
+@dataclass
+class ClientSession:
+    """Cliente + estado da conversa carregados para processar um turno."""
+    client_id: int
+    client_key: str
+    state: str = "START"
+    ctx: dict = field(default_factory=dict)
+    version: int = 0  # clients.state_version lido no início do turno
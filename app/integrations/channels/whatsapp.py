@@ -5,22 +5,50 @@ Responsabilidades:
 - Normalizar payloads de entrada do webhook
 - Validar assinatura X-Hub-Signature
 - Formatar respostas para envio via Graph API
+- Enviar mensagens pela Graph API com um cliente HTTP compartilhado
+  (keep-alive, HTTP/2 quando disponível, limites de pool)
+- Enfileirar mensagens na outbox (entrega com retentativas pelo dispatcher)
 """
 import hmac
 import hashlib
+import importlib.util
 import json
-from typing import Optional
-from app.core.logging import get_logger
+from typing import Iterator, Optional
+
+import httpx
+
+try:
+    import orjson
+except ImportError:  # dependência opcional
+    orjson = None
+
+from app.core.config import (
+    WHATSAPP_GRAPH_API_URL,
+    WHATSAPP_HTTP_MAX_CONNECTIONS, WHATSAPP_HTTP_MAX_KEEPALIVE,
+    WHATSAPP_HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    WHATSAPP_HTTP_CONNECT_TIMEOUT_SECONDS, WHATSAPP_HTTP_READ_TIMEOUT_SECONDS,
+    WHATSAPP_HTTP2,
+)
+from app.core.logging import get_logger, kv
+from app.core.tracing import traced
+from app.repositories.outbox_repo import enqueue_outbound
 
 logger = get_logger(__name__)
 
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+_graph_client: httpx.AsyncClient | None = None
 
-def verify_webhook_signature(body: str, signature: str, verify_token: str) -> bool:
+
+def verify_webhook_signature(body: bytes | str, signature: str, verify_token: str) -> bool:
     """
     Valida a assinatura X-Hub-Signature do webhook do WhatsApp.
     
+    O HMAC é calculado direto sobre os bytes recebidos (sem decode/re-encode) e
+    comparado em tempo constante.
+
     Args:
-        body: Raw request body (string)
+        body: Raw request body (bytes; str é aceito e codificado em UTF-8)
         signature: Header X-Hub-Signature (ex: "sha256=abc123...")
         verify_token: Token de verificação (da config)
     
@@ -28,62 +56,68 @@ def verify_webhook_signature(body: str, signature: str, verify_token: str) -> bo
         True se a assinatura é válida
     """
     try:
-        hash_method, hash_value = signature.split("=")
-        expected_hash = hmac.new(
-            verify_token.encode(),
-            body.encode(),
-            hashlib.sha256
-        ).hexdigest()
-        return hash_value == expected_hash
+        hash_method, _, hash_value = signature.partition("=")
+        if hash_method != "sha256" or not hash_value:
+            return False
+        if isinstance(body, str):
+            body = body.encode()
+        expected_hash = hmac.new(verify_token.encode(), body, hashlib.sha256).hexdigest()
+        return hmac.compare_digest(hash_value.encode(), expected_hash.encode())
     except Exception as e:
-        logger.error(f"Erro ao validar assinatura: {e}")
+        logger.error("Erro ao validar assinatura: %s", e)
         return False
 
 
-def extract_message_from_webhook(payload: dict) -> Optional[tuple[str, str]]:
+def parse_webhook_body(body: bytes) -> dict:
     """
-    Extrai (phone_number, message_text) de um webhook do WhatsApp.
-    
-    Estrutura esperada:
-    {
-      "entry": [{
-        "changes": [{
-          "value": {
-            "messages": [{
-              "from": "<phone>",
-              "text": { "body": "<msg>" },
-              "type": "text"
-            }]
-          }
-        }]
-      }]
-    }
-    
+    Parseia o corpo do webhook uma única vez a partir dos bytes brutos.
+
+    Usa orjson quando instalado (mais rápido em payloads grandes); senão, json.
+    """
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def _message_payload(msg: dict) -> Optional[str]:
+    """Texto a ser processado pela conversa para cada tipo de mensagem (None se não suportado)."""
+    msg_type = msg.get("type")
+    if msg_type == "text":
+        return (msg.get("text") or {}).get("body", "").strip() or None
+    if msg_type == "interactive":
+        # Resposta a botões/listas enviados pelo bot: o id (ex: SLOT_14:00, APPT_5)
+        interactive = msg.get("interactive") or {}
+        reply = interactive.get("button_reply") or interactive.get("list_reply") or {}
+        return reply.get("id") or None
+    if msg_type == "button":
+        # Quick reply de template
+        button = msg.get("button") or {}
+        return button.get("payload") or button.get("text") or None
+    return None
+
+
+def iter_webhook_messages(payload: dict) -> Iterator[tuple[str, str, str, Optional[str]]]:
+    """
+    Percorre todas as mensagens de um webhook do WhatsApp.
+
+    Sob carga a Meta agrupa várias mensagens, changes e entries no mesmo POST;
+    todas são entregues, na ordem em que aparecem. Itens malformados são ignorados.
+
+    Args:
+        payload: Corpo do webhook já parseado
+
     Returns:
-        (phone_number, message) ou None se não encontrar mensagem de texto
+        Iterador de (message_id, phone, type, payload), onde payload é o texto
+        para a conversa (corpo do texto ou id do botão) ou None se o tipo não é suportado
     """
-    try:
-        entry = payload.get("entry", [{}])[0]
-        changes = entry.get("changes", [{}])[0]
-        messages = changes.get("value", {}).get("messages", [])
-        
-        if not messages:
-            return None
-        
-        msg = messages[0]
-        if msg.get("type") != "text":
-            return None
-        
-        phone = msg.get("from")
-        text = msg.get("text", {}).get("body", "").strip()
-        
-        if not phone or not text:
-            return None
-        
-        return phone, text
-    except Exception as e:
-        logger.error(f"Erro ao extrair mensagem do webhook: {e}")
-        return None
+    for entry in payload.get("entry") or ():
+        for change in (entry or {}).get("changes") or ():
+            value = (change or {}).get("value") or {}
+            for msg in value.get("messages") or ():
+                phone = msg.get("from")
+                if not phone:
+                    continue
+                yield msg.get("id", ""), phone, msg.get("type", ""), _message_payload(msg)
 
 
 def normalize_client_id(phone: str) -> str:
@@ -159,6 +193,50 @@ def build_button_message_response(phone: str, text: str, buttons: list[dict]) ->
     }
 
 
+def build_graph_client(base_url: str = WHATSAPP_GRAPH_API_URL) -> httpx.AsyncClient:
+    """
+    Cria o cliente HTTP da Graph API com keep-alive, limites de pool e timeouts da config.
+
+    Args:
+        base_url: URL base da Graph API (ex: https://graph.facebook.com/v18.0)
+
+    Returns:
+        httpx.AsyncClient (o chamador é responsável por fechá-lo)
+    """
+    return httpx.AsyncClient(
+        base_url=base_url,
+        http2=WHATSAPP_HTTP2 and HTTP2_AVAILABLE,
+        limits=httpx.Limits(
+            max_connections=WHATSAPP_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=WHATSAPP_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=WHATSAPP_HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        timeout=httpx.Timeout(
+            WHATSAPP_HTTP_READ_TIMEOUT_SECONDS,
+            connect=WHATSAPP_HTTP_CONNECT_TIMEOUT_SECONDS,
+        ),
+    )
+
+
+async def start_graph_client(base_url: str = WHATSAPP_GRAPH_API_URL) -> httpx.AsyncClient:
+    """Abre o cliente compartilhado da Graph API (startup da aplicação)."""
+    global _graph_client
+    if _graph_client is None:
+        _graph_client = build_graph_client(base_url)
+        logger.info("Cliente Graph API iniciado", extra=kv(http2=WHATSAPP_HTTP2 and HTTP2_AVAILABLE))
+    return _graph_client
+
+
+async def close_graph_client() -> None:
+    """Fecha o cliente compartilhado da Graph API (shutdown da aplicação)."""
+    global _graph_client
+    if _graph_client is not None:
+        client, _graph_client = _graph_client, None
+        await client.aclose()
+        logger.info("Cliente Graph API encerrado")
+
+
+@traced("channel.whatsapp")
 async def send_message_via_graph_api(
     phone: str,
     text: str,
@@ -167,8 +245,12 @@ async def send_message_via_graph_api(
     phone_id: str
 ) -> bool:
     """
-    Envia mensagem via Graph API do WhatsApp (placeholder para integração real).
+    Envia mensagem via Graph API do WhatsApp.
     
+    Usa o cliente compartilhado aberto no startup (conexões reaproveitadas).
+    Sem access_token/phone_id configurados, apenas loga o payload (mock),
+    como em desenvolvimento e nos testes.
+
     Args:
         phone: Número do destinatário
         text: Corpo da mensagem
@@ -177,10 +259,7 @@ async def send_message_via_graph_api(
         phone_id: ID do número de telefone business
     
     Returns:
-        True se enviado com sucesso
-    
-    Nota: Implementação real requer requests/httpx para fazer POST real.
-    Por enquanto, apenas loga e retorna True (mock).
+        True se enviado com sucesso (HTTP 2xx)
     """
     try:
         if buttons:
@@ -188,10 +267,44 @@ async def send_message_via_graph_api(
         else:
             payload = build_text_message_response(phone, text)
         
-        logger.info(f"[MOCK] Enviando para {phone}: {payload}")
-        # TODO: Implementar POST real em https://graph.instagram.com/v18.0/{phone_id}/messages
-        # via requests.post(..., json=payload, headers={"Authorization": f"Bearer {access_token}"})
-        return True
+        if not access_token or not phone_id:
+            logger.info("[MOCK] Enviando: %s", payload, extra=kv(phone=phone))
+            return True
+
+        headers = {"Authorization": f"Bearer {access_token}"}
+        if _graph_client is not None:
+            response = await _graph_client.post(f"/{phone_id}/messages", json=payload, headers=headers)
+        else:
+            # Fora da aplicação (scripts/CLI): cliente descartável para esta chamada
+            async with build_graph_client() as client:
+                response = await client.post(f"/{phone_id}/messages", json=payload, headers=headers)
+
+        if response.is_success:
+            return True
+        logger.error("Graph API respondeu %s: %.200s", response.status_code, response.text, extra=kv(phone=phone))
+        return False
+    except httpx.HTTPError as e:
+        logger.error("Erro HTTP ao enviar mensagem: %r", e, extra=kv(phone=phone))
+        return False
     except Exception as e:
-        logger.error(f"Erro ao enviar mensagem: {e}")
+        logger.error("Erro ao enviar mensagem: %s", e)
         return False
+
+
+def enqueue_whatsapp_message(phone: str, text: str, buttons: list[dict] | None = None) -> int:
+    """
+    Enfileira uma mensagem para o WhatsApp na outbox.
+
+    Participa da transação corrente: chamada dentro de um turno, a mensagem só
+    é gravada se o novo estado for commitado. A entrega (com retentativas, ordem
+    por destinatário e limite de taxa) fica a cargo do dispatcher da outbox.
+
+    Args:
+        phone: Número do destinatário
+        text: Corpo da mensagem
+        buttons: Lista de {"id", "label"} (opcional)
+
+    Returns:
+        id da mensagem na outbox
+    """
+    return enqueue_outbound("whatsapp", phone, text, buttons)
@@ -6,23 +6,54 @@ Responsabilidades:
 - Para cada cliente, enviar lembrete pedindo confirmação ou cancelamento
 - Marcar como reminder_sent para evitar duplicata
 - Suportar web chat e WhatsApp (abstração de canal)
+
+O job só grava os lembretes na outbox; entrega, retentativas, limite de taxa e
+dead-letter ficam com o dispatcher da outbox (`app.services.outbox`), que também
+mede o p95 de cada envio e conta as retentativas.
 """
-from datetime import datetime, timedelta, time
+import time
+from datetime import datetime, timedelta
+from typing import Iterator
 from zoneinfo import ZoneInfo
 
-from app.repositories.appointments_repo import (
-    list_appointments_for_barber_on_date,
-    get_appointment_by_id,
-)
-from app.repositories.clients_repo import get_client_by_key, set_client_state_and_ctx
 from app.repositories.barbers_repo import find_barber_by_id
 from app.repositories.services_repo import find_service_by_id
-from app.repositories.db import get_conn
-from app.core.logging import get_logger
-from app.domain.enums import State
+from app.repositories.db import pooled_conn, transaction
+from app.repositories.outbox_repo import enqueue_outbound
+from app.core.config import REMINDER_BATCH_SIZE
+from app.core.logging import get_logger, kv
+from app.core.metrics import counter, histogram
 
 logger = get_logger(__name__)
 
+# Usa idx_appointments_status_day (status, day, reminder_sent_at)
+REMINDER_CANDIDATES_SQL = """
+    SELECT id, client_id, barber_id, service_id, start_at, end_at, status, reminder_sent_at,
+           created_at, updated_at
+    FROM appointments
+    WHERE status = 'scheduled'
+      AND day = ?
+      AND reminder_sent_at IS NULL
+    ORDER BY start_epoch
+"""
+
+# Lote do job: já traz client_key e nomes (sem N+1). Paginação por keyset em
+# (start_epoch, id), na ordem de idx_appointments_status_day, sem OFFSET.
+REMINDER_BATCH_SQL = """
+    SELECT a.id, a.client_id, a.barber_id, a.service_id, a.start_at, a.end_at,
+           a.start_epoch, c.client_key, b.name AS barber_name, s.name AS service_name
+    FROM appointments a
+    JOIN clients c ON c.id = a.client_id
+    LEFT JOIN barbers b ON b.id = a.barber_id
+    LEFT JOIN services s ON s.id = a.service_id
+    WHERE a.status = 'scheduled'
+      AND a.day = ?
+      AND a.reminder_sent_at IS NULL
+      AND (a.start_epoch, a.id) > (?, ?)
+    ORDER BY a.start_epoch, a.id
+    LIMIT ?
+"""
+
 
 def list_appointments_for_reminder(tz: ZoneInfo) -> list[dict]:
     """
@@ -30,7 +61,7 @@ def list_appointments_for_reminder(tz: ZoneInfo) -> list[dict]:
     
     Critérios:
     - status = 'scheduled'
-    - start_at está entre amanhã 00:00 e amanhã 23:59
+    - day (dia local de start_at) = amanhã
     - reminder_sent_at IS NULL (ainda não foi enviado)
     
     Args:
@@ -39,57 +70,86 @@ def list_appointments_for_reminder(tz: ZoneInfo) -> list[dict]:
     Returns:
         Lista de appointments com os dados completos
     """
-    conn = get_conn()
-    try:
-        now = datetime.now(tz)
-        tomorrow = now + timedelta(days=1)
-        tomorrow_start = datetime.combine(tomorrow.date(), time.min, tzinfo=tz).isoformat()
-        tomorrow_end = datetime.combine(tomorrow.date(), time.max, tzinfo=tz).isoformat()
-        
-        rows = conn.execute(
-            """
-            SELECT id, client_id, barber_id, service_id, start_at, end_at, status, reminder_sent_at,
-                   created_at, updated_at
-            FROM appointments
-            WHERE status = 'scheduled'
-              AND start_at >= ?
-              AND start_at <= ?
-              AND reminder_sent_at IS NULL
-            ORDER BY start_at
-            """,
-            (tomorrow_start, tomorrow_end),
-        ).fetchall()
+    tomorrow = (datetime.now(tz) + timedelta(days=1)).date()
+    with pooled_conn() as conn:
+        rows = conn.execute(REMINDER_CANDIDATES_SQL, (tomorrow.isoformat(),)).fetchall()
         return [dict(r) for r in rows]
-    finally:
-        conn.close()
 
 
-def mark_reminder_sent(appointment_id: int) -> None:
+def iter_reminder_batches(tz: ZoneInfo, batch_size: int = REMINDER_BATCH_SIZE) -> Iterator[list[dict]]:
     """
-    Marca que o lembrete foi enviado para um agendamento.
-    
+    Percorre os agendamentos de amanhã sem lembrete em lotes de tamanho fixo.
+
+    Cada lote é uma única consulta (com client_key, barber_name e service_name) e
+    a conexão é devolvida ao pool entre lotes, então a memória fica limitada ao
+    tamanho do lote mesmo em dias com dezenas de milhares de agendamentos.
+    Agendamentos cujo envio falhar não são revisitados na mesma execução.
+
     Args:
-        appointment_id: ID do agendamento
+        tz: Timezone
+        batch_size: Máximo de agendamentos por lote
+
+    Returns:
+        Iterador de listas de agendamentos
     """
-    conn = get_conn()
-    try:
-        conn.execute(
-            """
+    tomorrow = (datetime.now(tz) + timedelta(days=1)).date().isoformat()
+    last_epoch, last_id = -1, 0
+    while True:
+        with pooled_conn() as conn:
+            rows = conn.execute(
+                REMINDER_BATCH_SQL, (tomorrow, last_epoch, last_id, batch_size)
+            ).fetchall()
+        if not rows:
+            return
+        batch = [dict(r) for r in rows]
+        last_epoch, last_id = batch[-1]["start_epoch"], batch[-1]["id"]
+        yield batch
+        if len(batch) < batch_size:
+            return
+
+
+def mark_reminders_sent(appointment_ids: list[int]) -> int:
+    """
+    Marca o lembrete como enviado para vários agendamentos em um único UPDATE.
+
+    Args:
+        appointment_ids: IDs dos agendamentos
+
+    Returns:
+        Quantidade de linhas atualizadas
+    """
+    if not appointment_ids:
+        return 0
+    placeholders = ",".join("?" * len(appointment_ids))
+    with transaction() as conn:
+        cur = conn.execute(
+            f"""
             UPDATE appointments
             SET reminder_sent_at = datetime('now'), updated_at = datetime('now')
-            WHERE id = ?
+            WHERE id IN ({placeholders}) AND reminder_sent_at IS NULL
             """,
-            (appointment_id,),
+            [int(i) for i in appointment_ids],
         )
-        conn.commit()
-    finally:
-        conn.close()
+        return cur.rowcount
+
+
+def mark_reminder_sent(appointment_id: int) -> None:
+    """
+    Marca que o lembrete foi enviado para um agendamento.
+    
+    Args:
+        appointment_id: ID do agendamento
+    """
+    mark_reminders_sent([appointment_id])
 
 
 def format_reminder_message(appointment: dict, tz: ZoneInfo) -> str:
     """
     Formata a mensagem de lembrete para o cliente.
     
+    Usa barber_name/service_name do próprio dict quando presentes (lote do job);
+    caso contrário, consulta o catálogo.
+
     Args:
         appointment: Dict com id, barber_id, start_at, etc
         tz: Timezone
@@ -98,11 +158,15 @@ def format_reminder_message(appointment: dict, tz: ZoneInfo) -> str:
         Mensagem formatada
     """
     try:
-        barber = find_barber_by_id(int(appointment["barber_id"]))
-        barber_name = barber["name"] if barber else "Barbeiro"
+        barber_name = appointment.get("barber_name")
+        if barber_name is None:
+            barber = find_barber_by_id(int(appointment["barber_id"]))
+            barber_name = barber["name"] if barber else "Barbeiro"
         
-        service = find_service_by_id(int(appointment["service_id"]))
-        service_name = service["name"] if service else "Serviço"
+        service_name = appointment.get("service_name")
+        if service_name is None:
+            service = find_service_by_id(int(appointment["service_id"]))
+            service_name = service["name"] if service else "Serviço"
         
         # Parse datetime
         dt = datetime.fromisoformat(appointment["start_at"])
@@ -120,88 +184,92 @@ Responda com SIM para confirmar ou NÃO para cancelar."""
         
         return message
     except Exception as e:
-        logger.error(f"Erro ao formatar mensagem: {e}")
+        logger.error("Erro ao formatar mensagem: %s", e)
         return "🔔 Você tem um agendamento amanhã. Confirma presença?"
 
 
-async def send_reminder_to_client(
-    client_key: str,
-    appointment: dict,
-    tz: ZoneInfo,
-) -> bool:
+def reminder_recipient(client_key: str) -> tuple[str, str]:
+    """(canal, destinatário) da outbox para um client_key (wa:<phone> -> WhatsApp)."""
+    if client_key.startswith("wa:"):
+        return "whatsapp", client_key[3:]
+    return "web", client_key
+
+
+def enqueue_reminder(appointment: dict, tz: ZoneInfo) -> int:
     """
-    Envia um lembrete para um cliente (abstração de canal).
-    
-    Por enquanto, apenas loga a intenção (mock).
-    Futura integração: enviar via email/SMS/WhatsApp conforme channel.
-    
+    Grava o lembrete na outbox (participa da transação corrente).
+
     Args:
-        client_key: Identificador do cliente (ex: user_123 ou wa:5511987654321)
-        appointment: Dict com dados do agendamento
+        appointment: Dict do lote (com client_key e nomes)
         tz: Timezone
-    
+
     Returns:
-        True se enviado com sucesso
+        id da mensagem na outbox
     """
-    try:
-        message = format_reminder_message(appointment, tz)
-        logger.info(f"[REMINDER] Enviando para {client_key}: {message[:50]}...")
-        
-        # TODO: Implementar envio real (email, SMS, WhatsApp, etc)
-        # Por enquanto, apenas marca como enviado
-        return True
-    except Exception as e:
-        logger.error(f"Erro ao enviar lembrete para {client_key}: {e}")
-        return False
+    channel, recipient = reminder_recipient(appointment["client_key"])
+    return enqueue_outbound(channel, recipient, format_reminder_message(appointment, tz))
+
 
+REMINDERS_JOB_SECONDS = histogram(
+    "barbershop_reminders_job_duration_seconds",
+    "Duração de uma execução do job de lembretes D-1",
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0),
+)
+REMINDERS = counter(
+    "barbershop_reminders_total",
+    "Lembretes processados pelo job, por resultado (enqueued: gravados na outbox)",
+    ("result",),
+)
 
-async def run_reminders_job(tz: ZoneInfo = None) -> None:
+
+async def run_reminders_job(
+    tz: ZoneInfo = None,
+    batch_size: int = REMINDER_BATCH_SIZE,
+) -> dict:
     """
-    Job principal: busca agendamentos para amanhã e envia lembretes.
-    
-    Fluxo:
-    1. Lista agendamentos de amanhã (sem reminder_sent)
-    2. Para cada um, busca cliente e envia lembrete
-    3. Marca como reminder_sent para evitar duplicata
-    
+    Job principal: busca agendamentos para amanhã e enfileira os lembretes.
+
+    Por lote de `batch_size`, uma consulta traz agendamentos + client_key +
+    nomes de barbeiro/serviço e, em uma única transação, os lembretes são
+    gravados na outbox e o lote é marcado como reminder_sent. Um lote com erro
+    é desfeito inteiro e fica para a próxima execução.
+
     Args:
         tz: Timezone (default: America/Sao_Paulo)
+        batch_size: Tamanho do lote
+
+    Returns:
+        Dict com total, enqueued, failed e duration_ms. A entrega é contada pela
+        outbox (`barbershop_outbox_deliveries_total`), não aqui
     """
     if not tz:
         tz = ZoneInfo("America/Sao_Paulo")
-    
+
     logger.info("[REMINDERS] Iniciando job de lembretes D-1...")
-    
+
+    started = time.perf_counter()
+    summary = {"total": 0, "enqueued": 0, "failed": 0}
     try:
-        appointments = list_appointments_for_reminder(tz)
-        logger.info(f"[REMINDERS] Encontrados {len(appointments)} agendamentos para amanhã")
-        
-        success_count = 0
-        for appt in appointments:
+        for batch in iter_reminder_batches(tz, batch_size):
+            summary["total"] += len(batch)
             try:
-                client_id = int(appt["client_id"])
-                client_row = get_client_by_key(f"user_{client_id}")  # Web chat
-                
-                if not client_row:
-                    # Tenta buscar para WhatsApp mais tarde (versão futura)
-                    logger.warning(f"Cliente {client_id} não encontrado")
-                    continue
-                
-                client_key = client_row["client_key"]
-                
-                # Envia lembrete
-                sent = await send_reminder_to_client(client_key, appt, tz)
-                if sent:
-                    mark_reminder_sent(int(appt["id"]))
-                    success_count += 1
-                    logger.info(f"[REMINDERS] Lembrete enviado: appt_id={appt['id']}, client_key={client_key}")
-                else:
-                    logger.warning(f"[REMINDERS] Falha ao enviar para appt_id={appt['id']}")
-            
+                with transaction():
+                    for appt in batch:
+                        enqueue_reminder(appt, tz)
+                    mark_reminders_sent([appt["id"] for appt in batch])
             except Exception as e:
-                logger.error(f"[REMINDERS] Erro ao processar agendamento {appt.get('id')}: {e}", exc_info=True)
-        
-        logger.info(f"[REMINDERS] Job concluído: {success_count}/{len(appointments)} lembretes enviados")
-    
+                summary["failed"] += len(batch)
+                logger.error("[REMINDERS] Erro ao enfileirar lote: %s", e, exc_info=True, extra=kv(size=len(batch)))
+                continue
+            summary["enqueued"] += len(batch)
+
     except Exception as e:
-        logger.error(f"[REMINDERS] Erro geral no job: {e}", exc_info=True)
+        logger.error("[REMINDERS] Erro geral no job: %s", e, exc_info=True)
+
+    elapsed = time.perf_counter() - started
+    summary["duration_ms"] = round(elapsed * 1000, 3)
+    REMINDERS_JOB_SECONDS.observe(elapsed)
+    for result in ("enqueued", "failed"):
+        REMINDERS.inc(result, value=summary[result])
+    logger.info("[REMINDERS] Job concluído", extra=kv(**summary))
+    return summary
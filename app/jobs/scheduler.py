@@ -9,10 +9,12 @@ Responsabilidades:
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 import asyncio
+from datetime import datetime, timezone
 from zoneinfo import ZoneInfo
 
 from app.core.logging import get_logger
 from app.jobs.reminders_24h import run_reminders_job
+from app.services.dedupe import message_deduper
 
 logger = get_logger(__name__)
 
@@ -25,6 +27,7 @@ def start_scheduler() -> None:
     
     Jobs:
     - Reminders D-1: todos os dias às 9h (América/São Paulo)
+    - Limpeza dos ids de mensagem expirados (idempotência do webhook): a cada hora
     """
     if scheduler.running:
         logger.warning("Scheduler já está rodando")
@@ -41,6 +44,15 @@ def start_scheduler() -> None:
         replace_existing=True,
     )
     
+    # Job: Limpeza de processed_messages a cada hora
+    scheduler.add_job(
+        _prune_processed_messages,
+        CronTrigger(minute=17, timezone="America/Sao_Paulo"),
+        id="prune_processed_messages",
+        name="Limpar ids de mensagem expirados",
+        replace_existing=True,
+    )
+    
     scheduler.start()
     logger.info("[OK] Scheduler iniciado com jobs configurados")
 
@@ -59,11 +71,19 @@ def _run_reminders_sync() -> None:
     try:
         asyncio.run(run_reminders_job())
     except Exception as e:
-        logger.error(f"Erro ao executar job de reminders: {e}", exc_info=True)
+        logger.error("Erro ao executar job de reminders: %s", e, exc_info=True)
+
+
+def _prune_processed_messages() -> None:
+    try:
+        message_deduper.prune()
+    except Exception as e:
+        logger.error("Erro ao limpar processed_messages: %s", e, exc_info=True)
 
 
 def get_scheduler_info() -> dict:
     """Retorna status do scheduler e jobs ativos."""
+    now = datetime.now(timezone.utc)
     return {
         "running": scheduler.running,
         "jobs": [
@@ -71,6 +91,8 @@ def get_scheduler_info() -> dict:
                 "id": job.id,
                 "name": job.name,
                 "next_run_time": str(job.next_run_time) if job.next_run_time else None,
+                # Negativo: execução atrasada (scheduler parado ou pool de jobs travado)
+                "next_run_in_s": round((job.next_run_time - now).total_seconds(), 3) if job.next_run_time else None,
             }
             for job in scheduler.get_jobs()
         ],
@@ -92,7 +114,7 @@ if __name__ == "__main__":
     try:
         while True:
             info = get_scheduler_info()
-            logger.info(f"Scheduler status: {info}")
+            logger.info("Scheduler status: %s", info)
             time.sleep(10)
     except KeyboardInterrupt:
         logger.info("Encerrando...")
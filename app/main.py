@@ -1,11 +1,18 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.routes.health import router as health_router
+from app.api.routes.metrics import router as metrics_router
 from app.api.routes.chat import router as chat_router
 from app.api.routes.whatsapp import router as whatsapp_router
-from app.repositories.db import init_db
+from app.api.routes.availability import router as availability_router
+from app.repositories.db import init_db, close_pool
 from app.core.logging import get_logger
+from app.api.middleware import RequestTracingMiddleware
 from app.jobs.scheduler import start_scheduler, stop_scheduler
+from app.integrations.channels.whatsapp import start_graph_client, close_graph_client
+from app.services.inbound import inbound_queue
+from app.services.outbox import outbox_dispatcher
+from app.services.nlu_engine import get_nlu_engine
 
 logger = get_logger(__name__)
 
@@ -21,24 +28,39 @@ def create_app() -> FastAPI:
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    # Trace por requisição (X-Request-ID + linha JSON em logs/trace.jsonl)
+    app.add_middleware(RequestTracingMiddleware)
 
     @app.on_event("startup")
-    def _startup():
+    async def _startup():
         logger.info("Iniciando aplicação...")
         init_db()
         logger.info("Banco de dados inicializado")
+        get_nlu_engine()  # NLU_ENGINE inválido falha no startup, não no primeiro turno
+        await start_graph_client()
+        await inbound_queue.start()
+        await outbox_dispatcher.start()
         start_scheduler()
         logger.info("Scheduler iniciado")
 
     app.include_router(health_router, tags=["health"])
+    app.include_router(metrics_router, tags=["health"])
     app.include_router(chat_router, tags=["chat"])
     app.include_router(whatsapp_router, tags=["whatsapp"])
+    app.include_router(availability_router, tags=["availability"])
     
     @app.on_event("shutdown")
-    def _shutdown():
+    async def _shutdown():
         logger.info("Encerrando aplicação...")
+        # Drena a fila de entrada antes de fechar o cliente HTTP e o pool;
+        # mensagens ainda não entregues ficam persistidas na outbox
+        await inbound_queue.stop()
+        await outbox_dispatcher.stop()
         stop_scheduler()
         logger.info("Scheduler parado")
+        await close_graph_client()
+        close_pool()
+        logger.info("Pool de conexões encerrado")
     
     logger.info("Rotas registradas")
     return app
@@ -1,28 +1,138 @@
-from datetime import datetime
-from app.repositories.db import get_conn
+from datetime import datetime, timezone
+from typing import Callable
+from app.core.timezone import TZ
+from app.core.tracing import traced
+from app.repositories.db import pooled_conn, transaction, after_commit
 
-def list_appointments_for_barber_on_date(barber_id: int, date_iso: str) -> list[dict]:
+# Consultas sargáveis: usam as colunas day/start_epoch/end_epoch e
+# idx_appointments_barber_status_day em vez de date(start_at).
+# Intervalos ocupados de vários barbeiros/dias ({barber_ids}/{days}: placeholders "?,?,...")
+BUSY_INTERVALS_SQL = """
+    SELECT barber_id, day, start_epoch, end_epoch
+    FROM appointments
+    WHERE barber_id IN ({barber_ids})
+      AND status = 'scheduled'
+      AND day IN ({days})
+    ORDER BY barber_id, day, start_epoch
+"""
+
+# Sobreposição por epoch (independe do offset gravado e da virada do dia):
+# start_epoch fica entre (início - MAX_APPOINTMENT_SECONDS) e o fim do novo
+# horário, faixa de idx_appointments_barber_status_start
+CONFLICT_SQL = """
+    SELECT id FROM appointments
+    WHERE barber_id = ?
+      AND status = 'scheduled'
+      AND start_epoch > ?
+      AND start_epoch < ?
+      AND end_epoch > ?
+    LIMIT 1
+"""
+
+# Nenhum agendamento dura mais que um dia (limita a faixa do CONFLICT_SQL)
+MAX_APPOINTMENT_SECONDS = 24 * 3600
+
+# Observadores de mudanças em agendamentos (ex: índice de disponibilidade).
+# Chamados após o COMMIT com um dict:
+#   {"event": "created"|"cancelled", "barber_id", "day", "start_epoch", "end_epoch", "version"}
+_change_listeners: list[Callable[[dict], None]] = []
+
+
+def add_appointment_listener(listener: Callable[[dict], None]) -> None:
+    """Registra um observador de criação/cancelamento de agendamentos."""
+    if listener not in _change_listeners:
+        _change_listeners.append(listener)
+
+
+def _notify_after_commit(change: dict) -> None:
+    def _notify():
+        for listener in list(_change_listeners):
+            listener(change)
+    after_commit(_notify)
+
+
+def _day_version(conn, barber_id: int, day: str) -> int:
+    row = conn.execute(
+        "SELECT version FROM appointment_day_versions WHERE barber_id = ? AND day = ?",
+        (barber_id, day),
+    ).fetchone()
+    return int(row["version"]) if row else 0
+
+
+def to_epoch(iso: str) -> int:
+    """Converte ISO (com offset) para epoch-seconds UTC, como strftime('%s') do SQLite."""
+    dt = datetime.fromisoformat(iso)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+def to_local_iso(iso: str) -> str:
+    """
+    Reescreve um ISO (com qualquer offset) no fuso da barbearia.
+
+    `day` é o prefixo de start_at: gravar sempre no fuso local garante que ele
+    seja o dia local do agendamento. Sem offset, o ISO é tratado como UTC
+    (como em `to_epoch`).
+    """
+    dt = datetime.fromisoformat(iso)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(TZ).isoformat()
+
+
+@traced("db.get_day_versions")
+def get_day_versions(keys: list[tuple[int, str]]) -> dict[tuple[int, str], int]:
     """
-    date_iso: YYYY-MM-DD
+    Versões atuais de vários (barber_id, day) em uma consulta.
+    Chaves sem nenhuma mudança registrada têm versão 0.
     """
-    conn = get_conn()
-    try:
+    if not keys:
+        return {}
+    barber_ids = sorted({k[0] for k in keys})
+    days = sorted({k[1] for k in keys})
+    with pooled_conn() as conn:
         rows = conn.execute(
-            """
-            SELECT id, start_at, end_at, status
-            FROM appointments
-            WHERE barber_id = ?
-              AND status = 'scheduled'
-              AND date(start_at) = date(?)
-            ORDER BY start_at
+            f"""
+            SELECT barber_id, day, version
+            FROM appointment_day_versions
+            WHERE barber_id IN ({",".join("?" * len(barber_ids))})
+              AND day IN ({",".join("?" * len(days))})
             """,
-            (barber_id, date_iso),
+            (*barber_ids, *days),
         ).fetchall()
-        return [dict(r) for r in rows]
-    finally:
-        conn.close()
+    found = {(int(r["barber_id"]), r["day"]): int(r["version"]) for r in rows}
+    return {k: found.get(k, 0) for k in keys}
+
+
+@traced("db.list_busy_intervals_for_days")
+def list_busy_intervals_for_days(
+    barber_ids: list[int], days: list[str]
+) -> dict[tuple[int, str], list[tuple[int, int]]]:
+    """
+    Intervalos ocupados de vários barbeiros em vários dias, em uma única consulta.
+
+    Returns:
+        {(barber_id, day): [(start_epoch, end_epoch), ...]} (chaves sem agendamento ficam vazias)
+    """
+    result: dict[tuple[int, str], list[tuple[int, int]]] = {
+        (b, d): [] for b in barber_ids for d in days
+    }
+    if not barber_ids or not days:
+        return result
+    with pooled_conn() as conn:
+        rows = conn.execute(
+            BUSY_INTERVALS_SQL.format(barber_ids=",".join("?" * len(barber_ids)), days=",".join("?" * len(days))),
+            (*barber_ids, *days),
+        ).fetchall()
+    for r in rows:
+        key = (int(r["barber_id"]), r["day"])
+        if key in result:
+            result[key].append((int(r["start_epoch"]), int(r["end_epoch"])))
+    return result
 
 
+@traced("db.create_appointment")
 def create_appointment(
     client_id: int,
     barber_id: int,
@@ -34,12 +144,19 @@ def create_appointment(
     """
     Cria um agendamento.
     Retorna o appointment.id
-    
+
+    start_at/end_at são gravados no fuso da barbearia, qualquer que seja o
+    offset recebido.
+
     Raises:
         ValueError: Se houver conflito de horário ou dados inválidos
     """
-    conn = get_conn()
-    try:
+    start_at, end_at = to_local_iso(start_at), to_local_iso(end_at)
+    start_epoch, end_epoch = to_epoch(start_at), to_epoch(end_at)
+    if not 0 < end_epoch - start_epoch <= MAX_APPOINTMENT_SECONDS:
+        raise ValueError(f"Horário inválido: {start_at} -> {end_at}")
+
+    with transaction() as conn:
         # Valida se barber existe e está ativo
         barber = conn.execute(
             "SELECT id FROM barbers WHERE id = ? AND is_active = 1",
@@ -66,14 +183,8 @@ def create_appointment(
 
         # Valida se horário se sobrepõe com outro agendamento do mesmo barbeiro
         conflict = conn.execute(
-            """
-            SELECT id FROM appointments
-            WHERE barber_id = ?
-              AND status = 'scheduled'
-              AND start_at < ?
-              AND end_at > ?
-            """,
-            (barber_id, end_at, start_at)
+            CONFLICT_SQL,
+            (barber_id, start_epoch - MAX_APPOINTMENT_SECONDS, end_epoch, start_epoch)
         ).fetchone()
         if conflict:
             raise ValueError(f"Conflito de horário com agendamento {conflict['id']}")
@@ -85,16 +196,22 @@ def create_appointment(
             """,
             (client_id, barber_id, service_id, start_at, end_at, status)
         )
-        conn.commit()
+        if status == "scheduled":
+            _notify_after_commit({
+                "event": "created",
+                "barber_id": barber_id,
+                "day": start_at[:10],
+                "start_epoch": start_epoch,
+                "end_epoch": end_epoch,
+                "version": _day_version(conn, barber_id, start_at[:10]),
+            })
         return int(cur.lastrowid)
-    finally:
-        conn.close()
 
 
+@traced("db.get_appointment_by_id")
 def get_appointment_by_id(appointment_id: int) -> dict | None:
     """Retorna um agendamento pelo ID."""
-    conn = get_conn()
-    try:
+    with pooled_conn() as conn:
         row = conn.execute(
             """
             SELECT id, client_id, barber_id, service_id, start_at, end_at, status, created_at, updated_at
@@ -104,14 +221,12 @@ def get_appointment_by_id(appointment_id: int) -> dict | None:
             (appointment_id,)
         ).fetchone()
         return dict(row) if row else None
-    finally:
-        conn.close()
 
 
+@traced("db.list_appointments_for_client")
 def list_appointments_for_client(client_id: int, status: str | None = None) -> list[dict]:
     """Lista agendamentos de um cliente."""
-    conn = get_conn()
-    try:
+    with pooled_conn() as conn:
         if status:
             rows = conn.execute(
                 """
@@ -133,22 +248,27 @@ def list_appointments_for_client(client_id: int, status: str | None = None) -> l
                 (client_id,)
             ).fetchall()
         return [dict(r) for r in rows]
-    finally:
-        conn.close()
 
 
+@traced("db.cancel_appointment")
 def cancel_appointment(appointment_id: int) -> None:
     """Cancela um agendamento."""
-    conn = get_conn()
-    try:
-        conn.execute(
+    with transaction() as conn:
+        row = conn.execute(
             """
             UPDATE appointments
             SET status = 'cancelled', updated_at = datetime('now')
             WHERE id = ?
+            RETURNING barber_id, day, start_epoch, end_epoch
             """,
             (appointment_id,)
-        )
-        conn.commit()
-    finally:
-        conn.close()
+        ).fetchone()
+        if row:
+            _notify_after_commit({
+                "event": "cancelled",
+                "barber_id": int(row["barber_id"]),
+                "day": row["day"],
+                "start_epoch": int(row["start_epoch"]),
+                "end_epoch": int(row["end_epoch"]),
+                "version": _day_version(conn, int(row["barber_id"]), row["day"]),
+            })
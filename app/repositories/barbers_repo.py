@@ -1,33 +1,16 @@
-from app.repositories.db import get_conn
+from app.repositories.catalog_cache import barbers_cache
 
 def list_active_barbers() -> list[dict]:
-    conn = get_conn()
-    try:
-        rows = conn.execute(
-            "SELECT id, name FROM barbers WHERE is_active = 1 ORDER BY id"
-        ).fetchall()
-        return [dict(r) for r in rows]
-    finally:
-        conn.close()
+    return barbers_cache.list()
 
 def find_barber_by_name(name: str) -> dict | None:
-    conn = get_conn()
-    try:
-        row = conn.execute(
-            "SELECT id, name FROM barbers WHERE is_active = 1 AND name = ?",
-            (name,),
-        ).fetchone()
-        return dict(row) if row else None
-    finally:
-        conn.close()
+    return barbers_cache.find_by_name(name)
+
+def find_barber_in_text(text: str) -> dict | None:
+    return barbers_cache.search_name(text)
+
+def barber_short_name(barber_id: int) -> str | None:
+    return barbers_cache.name_index().short_name(barber_id)
 
 def find_barber_by_id(barber_id: int) -> dict | None:
-    conn = get_conn()
-    try:
-        row = conn.execute(
-            "SELECT id, name FROM barbers WHERE id = ? AND is_active = 1",
-            (barber_id,),
-        ).fetchone()
-        return dict(row) if row else None
-    finally:
-        conn.close()
+    return barbers_cache.get_by_id(barber_id)
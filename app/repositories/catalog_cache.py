@@ -0,0 +1,172 @@
+"""
+Cache em processo do catálogo (barbeiros e serviços).
+
+As tabelas mudam raramente, mas são lidas em quase todo turno de conversa e
+uma vez por agendamento ao montar rótulos/lembretes. Cada tabela é carregada
+inteira (apenas ativos) e indexada por id e por nome; a busca tolerante por
+nome (`NameIndex`) é montada sob demanda e refeita só quando a versão muda.
+
+Invalidação:
+- Triggers incrementam `catalog_versions` a cada escrita em barbers/services,
+  inclusive de outros processos; a versão é conferida uma vez por empréstimo de
+  conexão (um turno de conversa faz uma única leitura)
+- `invalidate_catalog()` força a recarga imediata após escritas administrativas
+"""
+import sqlite3
+import threading
+from contextvars import ContextVar
+
+from app.core.config import NAME_MATCH_MIN_SCORE
+from app.repositories.db import pooled_conn, current_borrow_id
+from app.repositories.name_index import NameIndex
+
+CATALOG_VERSIONS_QUERY = "SELECT name, version FROM catalog_versions"
+
+# (borrow_id, versões) da última conferência feita no contexto atual
+_checked: ContextVar[tuple[int, dict[str, int]] | None] = ContextVar("_catalog_checked", default=None)
+
+
+def _current_versions(conn: sqlite3.Connection) -> dict[str, int] | None:
+    """Versões do catálogo, lidas no máximo uma vez por empréstimo de conexão."""
+    borrow = current_borrow_id()
+    checked = _checked.get()
+    if checked is not None and checked[0] == borrow:
+        return checked[1]
+    try:
+        versions = dict(conn.execute(CATALOG_VERSIONS_QUERY).fetchall())
+    except sqlite3.OperationalError:
+        # Banco ainda não migrado: sem versão confiável, não usa cache
+        return None
+    _checked.set((borrow, versions))
+    return versions
+
+
+class CatalogCache:
+    """Linhas ativas de uma tabela do catálogo, indexadas por id e por nome."""
+
+    def __init__(self, table: str, query: str):
+        self.table = table
+        self.query = query
+        self._lock = threading.Lock()
+        self._version: int | None = None
+        self._rows: list[dict] = []
+        self._by_id: dict[int, dict] = {}
+        self._by_name: dict[str, dict] = {}
+        self._index: NameIndex | None = None
+        self._index_rows: list[dict] | None = None
+        self.hits = 0
+        self.misses = 0
+        self.index_builds = 0
+
+    def _snapshot(self) -> tuple[list[dict], dict[int, dict], dict[str, dict]]:
+        with pooled_conn() as conn:
+            versions = _current_versions(conn)
+            version = None if versions is None else versions.get(self.table, 0)
+            with self._lock:
+                if version is not None and version == self._version:
+                    self.hits += 1
+                    return self._rows, self._by_id, self._by_name
+
+            rows = [dict(r) for r in conn.execute(self.query).fetchall()]
+
+        by_id = {r["id"]: r for r in rows}
+        by_name = {r["name"]: r for r in rows}
+        with self._lock:
+            self.misses += 1
+            if version is not None:
+                self._version = version
+                self._rows, self._by_id, self._by_name = rows, by_id, by_name
+        return rows, by_id, by_name
+
+    def list(self) -> list[dict]:
+        rows, _, _ = self._snapshot()
+        return [dict(r) for r in rows]
+
+    def get_by_id(self, row_id: int) -> dict | None:
+        _, by_id, _ = self._snapshot()
+        try:
+            row = by_id.get(int(row_id))
+        except (TypeError, ValueError):
+            return None
+        return dict(row) if row else None
+
+    def get_by_name(self, name: str) -> dict | None:
+        _, _, by_name = self._snapshot()
+        row = by_name.get(name)
+        return dict(row) if row else None
+
+    def name_index(self) -> NameIndex:
+        """Índice de nomes/apelidos das linhas atuais (refeito só se o catálogo mudou)."""
+        rows, _, _ = self._snapshot()
+        with self._lock:
+            if self._index_rows is rows:
+                return self._index
+        index = NameIndex(rows)
+        with self._lock:
+            self.index_builds += 1
+            if rows is self._rows:
+                self._index, self._index_rows = index, rows
+        return index
+
+    def find_by_name(self, name: str, min_score: float = NAME_MATCH_MIN_SCORE) -> dict | None:
+        """Linha pelo nome exato ou, senão, por apelido/nome parecido ("joao", "calros")."""
+        row = self.get_by_name(name)
+        if row:
+            return row
+        found = self.name_index().lookup(name, min_score)
+        return dict(found[0]) if found else None
+
+    def search_name(self, text: str, min_score: float = NAME_MATCH_MIN_SCORE) -> dict | None:
+        """Linha cujo nome/apelido aparece dentro de uma mensagem livre."""
+        found = self.name_index().search(text, min_score)
+        return dict(found[0]) if found else None
+
+    def version(self) -> int | None:
+        """Versão atualmente em cache (None se nunca carregado)."""
+        with self._lock:
+            return self._version
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._version = None
+            self._rows, self._by_id, self._by_name = [], {}, {}
+            self._index, self._index_rows = None, None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "rows": len(self._rows),
+                "version": self._version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "index_builds": self.index_builds,
+            }
+
+
+barbers_cache = CatalogCache(
+    "barbers",
+    "SELECT id, name, aliases FROM barbers WHERE is_active = 1 ORDER BY id",
+)
+services_cache = CatalogCache(
+    "services",
+    "SELECT id, name, duration_minutes, price_cents, aliases FROM services WHERE is_active = 1 ORDER BY id",
+)
+
+
+def invalidate_catalog() -> None:
+    """Descarta o catálogo em cache. Chamar após escritas administrativas em barbers/services."""
+    barbers_cache.invalidate()
+    services_cache.invalidate()
+    _checked.set(None)
+
+
+def get_catalog_version() -> tuple:
+    """Versão combinada do catálogo (útil como parte de chaves de cache derivadas)."""
+    with pooled_conn():
+        barbers_cache._snapshot()
+        services_cache._snapshot()
+    return (barbers_cache.version(), services_cache.version())
+
+
+def get_catalog_stats() -> dict:
+    return {"barbers": barbers_cache.stats(), "services": services_cache.stats()}
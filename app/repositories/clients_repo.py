@@ -1,14 +1,22 @@
-from typing import Optional
-from app.repositories.db import get_conn
+from contextlib import contextmanager
+from typing import Iterator, Optional
 import json
-from app.repositories.db import get_conn
+from app.domain.models import ClientSession
+from app.core.tracing import traced
+from app.repositories.db import pooled_conn, transaction
+
+
+class StaleSessionError(Exception):
+    """O estado da conversa foi alterado por outro turno desde que foi carregado."""
+
+
+@traced("db.upsert_client_by_key")
 def upsert_client_by_key(client_key: str, name: Optional[str] = None) -> int:
     """
     Garante que existe um client com client_key.
     Retorna o client.id
     """
-    conn = get_conn()
-    try:
+    with transaction() as conn:
         row = conn.execute(
             "SELECT id FROM clients WHERE client_key = ?",
             (client_key,),
@@ -21,20 +29,18 @@ def upsert_client_by_key(client_key: str, name: Optional[str] = None) -> int:
                     "UPDATE clients SET name = ?, updated_at = datetime('now') WHERE id = ?",
                     (name.strip(), client_id),
                 )
-                conn.commit()
             return client_id
 
         cur = conn.execute(
             "INSERT INTO clients(client_key, name) VALUES(?, ?)",
             (client_key, name.strip() if name else None),
         )
-        conn.commit()
         return int(cur.lastrowid)
-    finally:
-        conn.close()
+
+
+@traced("db.get_client_state_and_ctx")
 def get_client_state_and_ctx(client_key: str) -> tuple[str, dict]:
-    conn = get_conn()
-    try:
+    with pooled_conn() as conn:
         row = conn.execute(
             "SELECT conversation_state, conversation_ctx_json FROM clients WHERE client_key = ?",
             (client_key,),
@@ -44,29 +50,107 @@ def get_client_state_and_ctx(client_key: str) -> tuple[str, dict]:
         state = row["conversation_state"] or "START"
         ctx = json.loads(row["conversation_ctx_json"] or "{}")
         return state, ctx
-    finally:
-        conn.close()
 
+@traced("db.set_client_state_and_ctx")
 def set_client_state_and_ctx(client_key: str, state: str, ctx: dict) -> None:
-    conn = get_conn()
-    try:
+    with transaction() as conn:
         conn.execute(
-            "UPDATE clients SET conversation_state = ?, conversation_ctx_json = ?, updated_at = datetime('now') WHERE client_key = ?",
+            """
+            UPDATE clients
+            SET conversation_state = ?, conversation_ctx_json = ?,
+                state_version = state_version + 1, updated_at = datetime('now')
+            WHERE client_key = ?
+            """,
             (state, json.dumps(ctx, ensure_ascii=False), client_key),
         )
-        conn.commit()
-    finally:
-        conn.close()
 
 
+@traced("db.get_client_by_key")
 def get_client_by_key(client_key: str) -> dict | None:
     "Retorna um cliente pelo client_key."
-    conn = get_conn()
-    try:
+    with pooled_conn() as conn:
         row = conn.execute(
             "SELECT id, client_key, name, total_cuts, total_cancels, last_appointment_at, conversation_state, conversation_ctx_json, created_at, updated_at FROM clients WHERE client_key = ?",
             (client_key,),
         ).fetchone()
         return dict(row) if row else None
-    finally:
-        conn.close()
+
+
+@traced("db.load_or_create_session")
+def load_or_create_session(client_key: str) -> ClientSession:
+    """
+    Busca (ou cria) o cliente e carrega seu estado de conversa.
+
+    Cliente existente é só lido: dentro de `client_session` o lock de escrita
+    não é pego ao carregar a sessão. O INSERT fica para o primeiro contato.
+    """
+    with pooled_conn() as conn:
+        row = conn.execute(
+            "SELECT id, conversation_state, conversation_ctx_json, state_version FROM clients WHERE client_key = ?",
+            (client_key,),
+        ).fetchone()
+    if row is None:
+        with transaction() as conn:
+            row = conn.execute(
+                """
+                INSERT INTO clients(client_key) VALUES(?)
+                ON CONFLICT(client_key) DO UPDATE SET updated_at = datetime('now')
+                RETURNING id, conversation_state, conversation_ctx_json, state_version
+                """,
+                (client_key,),
+            ).fetchone()
+    return ClientSession(
+        client_id=int(row["id"]),
+        client_key=client_key,
+        state=row["conversation_state"] or "START",
+        ctx=json.loads(row["conversation_ctx_json"] or "{}"),
+        version=int(row["state_version"]),
+    )
+
+
+@traced("db.save_session")
+def save_session(session: ClientSession) -> None:
+    """
+    Persiste o estado e o contexto da conversa da sessão.
+
+    Só grava se state_version ainda for a versão carregada; caso contrário
+    levanta StaleSessionError e o turno inteiro é desfeito (e refeito por
+    `run_conversation_turn`). A sessão é lida antes do lock de escrita
+    (`transaction(lazy=True)`), então a checagem pega turnos de outras conexões
+    ou processos que gravaram no meio, além de escritas do próprio turno por
+    fora da sessão (ex: `set_client_state_and_ctx`).
+    """
+    with transaction() as conn:
+        cur = conn.execute(
+            """
+            UPDATE clients
+            SET conversation_state = ?, conversation_ctx_json = ?,
+                state_version = state_version + 1, updated_at = datetime('now')
+            WHERE id = ? AND state_version = ?
+            """,
+            (session.state, json.dumps(session.ctx, ensure_ascii=False), session.client_id, session.version),
+        )
+        if cur.rowcount == 0:
+            raise StaleSessionError(f"Estado de {session.client_key} alterado por outro turno")
+        session.version += 1
+
+
+@contextmanager
+def client_session(client_key: str) -> Iterator[ClientSession]:
+    """
+    Turno de conversa em uma única transação: carrega/cria o cliente, entrega a
+    sessão para o chamador alterar `state`/`ctx` e grava tudo no mesmo commit.
+
+    Escritas feitas por outros repositórios dentro do bloco (ex: create_appointment)
+    participam da mesma transação. Se o bloco levantar exceção, nada é gravado.
+    O lock de escrita só é pego na primeira escrita (`transaction(lazy=True)`):
+    leituras do turno (sessão, NLU, disponibilidade) não bloqueiam outros turnos.
+
+    Uso:
+        with client_session("user_123") as session:
+            session.state, session.ctx = "WAIT_BARBER", {...}
+    """
+    with transaction(lazy=True):
+        session = load_or_create_session(client_key)
+        yield session
+        save_session(session)
@@ -1,20 +1,586 @@
+import itertools
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
 from pathlib import Path
+from typing import Callable, Iterator
+
+from app.core.config import (
+    DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT_SECONDS,
+    SQLITE_STORAGE_PROFILES, SQLITE_PROFILE,
+)
+from app.core.logging import get_logger
+from app.core.metrics import histogram
+
+logger = get_logger(__name__)
+
+DB_QUERY_SECONDS = histogram(
+    "barbershop_db_query_duration_seconds",
+    "Duração de comandos SQL nas conexões do pool, por tipo de comando",
+    ("op",),
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0),
+)
+_QUERY_OPS = frozenset({
+    "SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "PRAGMA",
+    "BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE",
+})
 
 DB_PATH = Path(__file__).resolve().parents[2] / "data.sqlite3"
 
-def get_conn() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
+# Pragmas aceitos nos perfis de armazenamento (evita SQL arbitrário vindo da config)
+_PROFILE_PRAGMAS = ("journal_mode", "synchronous", "busy_timeout", "cache_size", "mmap_size", "temp_store")
+
+
+def _resolve_profile(profile: str | None) -> dict:
+    name = profile or SQLITE_PROFILE
+    if name not in SQLITE_STORAGE_PROFILES:
+        raise ValueError(f"Perfil de armazenamento SQLite desconhecido: {name}")
+    return SQLITE_STORAGE_PROFILES[name]
+
+
+def _configure_connection(conn: sqlite3.Connection, profile: str | None = None) -> None:
+    """Aplica row factory e pragmas por conexão (uma única vez, na criação)."""
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA foreign_keys = ON;")
+    for pragma, value in _resolve_profile(profile).items():
+        if pragma not in _PROFILE_PRAGMAS:
+            raise ValueError(f"Pragma não suportado no perfil: {pragma}")
+        if not isinstance(value, int) and not str(value).isalnum():
+            raise ValueError(f"Valor inválido para PRAGMA {pragma}: {value}")
+        conn.execute(f"PRAGMA {pragma} = {value};")
+
+
+def get_conn() -> sqlite3.Connection:
+    """
+    Abre uma conexão avulsa (fora do pool).
+
+    Usada por scripts e testes que controlam o próprio ciclo de vida da conexão.
+    Repositórios devem usar `pooled_conn()`.
+    """
+    conn = sqlite3.connect(DB_PATH)
+    _configure_connection(conn)
     return conn
 
+
+_query_ops: dict[str, str] = {}
+
+
+def _query_op(sql: str) -> str:
+    # Os comandos são quase sempre as mesmas strings: um dict.get no caso comum
+    op = _query_ops.get(sql)
+    if op is None:
+        words = sql[:64].split(None, 1)
+        op = words[0].upper() if words else ""
+        op = op if op in _QUERY_OPS else "OTHER"
+        if len(_query_ops) < 1024:
+            _query_ops[sql] = op
+    return op
+
+
+class MeteredConnection(sqlite3.Connection):
+    """Conexão que mede execute/executemany/commit em `barbershop_db_query_duration_seconds`."""
+
+    def execute(self, sql, parameters=(), /):
+        started = time.perf_counter()
+        try:
+            return sqlite3.Connection.execute(self, sql, parameters)
+        finally:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - started, _query_ops.get(sql) or _query_op(sql))
+
+    def executemany(self, sql, parameters, /):
+        started = time.perf_counter()
+        try:
+            return sqlite3.Connection.executemany(self, sql, parameters)
+        finally:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - started, _query_ops.get(sql) or _query_op(sql))
+
+    def commit(self):
+        started = time.perf_counter()
+        try:
+            return sqlite3.Connection.commit(self)
+        finally:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - started, "COMMIT")
+
+
+class ConnectionPool:
+    """
+    Pool limitado e thread-safe de conexões SQLite.
+
+    - Cria conexões sob demanda até `max_size`
+    - Reaproveita conexões ociosas (LIFO, mantém as "quentes" em uso)
+    - Se todas estiverem emprestadas, espera até `timeout` segundos
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        max_size: int = DB_POOL_MAX_SIZE,
+        timeout: float = DB_POOL_TIMEOUT_SECONDS,
+        profile: str | None = None,
+    ):
+        self.db_path = db_path
+        self.max_size = max(1, max_size)
+        self.timeout = timeout
+        self.profile = profile or SQLITE_PROFILE
+        _resolve_profile(self.profile)
+        self._idle: list[sqlite3.Connection] = []
+        self._size = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        # Estatísticas
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, factory=MeteredConnection)
+        _configure_connection(conn, self.profile)
+        return conn
+
+    def acquire(self, timeout: float | None = None) -> sqlite3.Connection:
+        """
+        Empresta uma conexão do pool.
+
+        Args:
+            timeout: Espera máxima por uma conexão livre (padrão: timeout do pool)
+
+        Raises:
+            TimeoutError: Se nenhuma conexão ficar livre dentro do timeout
+        """
+        timeout = self.timeout if timeout is None else timeout
+        started = time.perf_counter()
+        create = False
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Pool de conexões encerrado")
+            deadline = started + timeout
+            while not self._idle and self._size >= self.max_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    raise TimeoutError(
+                        f"Nenhuma conexão livre no pool após {timeout}s (max_size={self.max_size})"
+                    )
+                self._cond.wait(remaining)
+            if self._idle:
+                conn = self._idle.pop()
+            else:
+                self._size += 1
+                create = True
+
+            waited = time.perf_counter() - started
+            self._checkouts += 1
+            if waited > 0.001:
+                self._waits += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+
+        if create:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+        return conn
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        """Devolve a conexão ao pool, descartando transações pendentes."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            # Conexão quebrada: descarta e libera a vaga
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+            return
+
+        with self._cond:
+            if self._closed:
+                self._size -= 1
+                conn.close()
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+
+    def close(self) -> None:
+        """Fecha as conexões ociosas; as emprestadas são fechadas na devolução."""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                self._idle.pop().close()
+                self._size -= 1
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        """Retorna estatísticas de uso do pool."""
+        with self._cond:
+            return {
+                "max_size": self.max_size,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "wait_ms_total": round(self._wait_total * 1000, 3),
+                "wait_ms_max": round(self._wait_max * 1000, 3),
+            }
+
+
+_pool: ConnectionPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Retorna o pool global, criando-o na primeira chamada."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_PATH)
+    return _pool
+
+
+def close_pool() -> None:
+    """Fecha o pool global (shutdown da aplicação)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def get_pool_stats() -> dict:
+    """Estatísticas do pool global: checkouts, tempo de espera e tamanho."""
+    return get_pool().stats()
+
+
+def ping(timeout: float) -> None:
+    """
+    Confere se uma conexão do pool consegue ler e escrever (readiness).
+
+    `SELECT 1` sozinho passa mesmo com o banco travado por outro escritor; aqui
+    a conexão pega o lock de escrita (BEGIN IMMEDIATE) e desfaz em seguida,
+    esperando no máximo `timeout` pelo lock.
+
+    Args:
+        timeout: Espera máxima por uma conexão livre e pelo lock de escrita, em segundos
+
+    Raises:
+        TimeoutError: Pool esgotado dentro do timeout
+        sqlite3.OperationalError: Banco travado ("database is locked") ou inacessível
+    """
+    pool = get_pool()
+    conn = pool.acquire(timeout)
+    try:
+        busy_timeout = conn.execute("PRAGMA busy_timeout").fetchone()[0]
+        conn.execute(f"PRAGMA busy_timeout = {int(timeout * 1000)}")
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("SELECT 1 FROM catalog_versions LIMIT 1").fetchone()
+            conn.rollback()
+        finally:
+            conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout)}")
+    finally:
+        pool.release(conn)
+
+
+def get_storage_profile() -> dict:
+    """
+    Retorna o perfil de armazenamento ativo com os valores efetivos
+    lidos do SQLite (não apenas os configurados).
+    """
+    pool = get_pool()
+    with pooled_conn() as conn:
+        effective = {
+            pragma: conn.execute(f"PRAGMA {pragma};").fetchone()[0]
+            for pragma in _PROFILE_PRAGMAS
+        }
+    return {"profile": pool.profile, "pragmas": effective}
+
+
+# Conexão emprestada no contexto atual (permite reentrância dentro de uma transação)
+_current_conn: ContextVar[sqlite3.Connection | None] = ContextVar("_current_conn", default=None)
+_tx_depth: ContextVar[int] = ContextVar("_tx_depth", default=0)
+# False enquanto uma transação lazy ainda não emitiu o BEGIN IMMEDIATE
+_tx_begun: ContextVar[bool] = ContextVar("_tx_begun", default=True)
+# Identifica cada empréstimo externo de conexão (caches podem validar uma vez por empréstimo)
+_borrow_id: ContextVar[int | None] = ContextVar("_borrow_id", default=None)
+_borrow_seq = itertools.count(1)
+# Callbacks a executar após o COMMIT da transação externa
+_after_commit: ContextVar[list | None] = ContextVar("_after_commit", default=None)
+
+
+def after_commit(callback: Callable[[], None]) -> None:
+    """
+    Agenda `callback` para depois do COMMIT da transação corrente.
+
+    Descartado se a transação (ou o SAVEPOINT em que foi registrado) for desfeita.
+    Fora de transação, executa imediatamente.
+    """
+    pending = _after_commit.get()
+    if pending is None:
+        callback()
+    else:
+        pending.append(callback)
+
+
+def _run_after_commit(callbacks: list) -> None:
+    for callback in callbacks:
+        try:
+            callback()
+        except Exception as e:
+            logger.error("Erro em callback after_commit: %s", e, exc_info=True)
+
+
+@contextmanager
+def pooled_conn() -> Iterator[sqlite3.Connection]:
+    """
+    Empresta uma conexão do pool pelo tempo do bloco `with`.
+
+    Chamadas aninhadas no mesmo contexto reutilizam a mesma conexão, de modo
+    que leituras feitas dentro de `transaction()` enxergam as escritas pendentes.
+
+    Uso:
+        with pooled_conn() as conn:
+            conn.execute(...)
+    """
+    conn = _current_conn.get()
+    if conn is not None:
+        yield conn
+        return
+
+    pool = get_pool()
+    conn = pool.acquire()
+    token = _current_conn.set(conn)
+    borrow_token = _borrow_id.set(next(_borrow_seq))
+    try:
+        yield conn
+    finally:
+        _borrow_id.reset(borrow_token)
+        _current_conn.reset(token)
+        pool.release(conn)
+
+
+def current_borrow_id() -> int | None:
+    """Id do empréstimo de conexão em curso no contexto (None fora de `pooled_conn`)."""
+    return _borrow_id.get()
+
+
+@contextmanager
+def transaction(lazy: bool = False) -> Iterator[sqlite3.Connection]:
+    """
+    Bloco transacional sobre a conexão do contexto.
+
+    - Nível externo: BEGIN IMMEDIATE ... COMMIT (ou ROLLBACK em erro)
+    - Com `lazy=True`, o BEGIN IMMEDIATE só é emitido na primeira escrita (o
+      primeiro `transaction()` aninhado). Leituras anteriores rodam sem o lock
+      de escrita e sem snapshot: o chamador confere o que leu ao gravar (ex:
+      state_version em `save_session`)
+    - Níveis aninhados: SAVEPOINT, desfeito isoladamente em caso de erro
+
+    Uso:
+        with transaction() as conn:
+            conn.execute("UPDATE ...")
+    """
+    with pooled_conn() as conn:
+        depth = _tx_depth.get()
+        token = _tx_depth.set(depth + 1)
+        try:
+            if depth == 0:
+                if conn.in_transaction:
+                    conn.commit()
+                pending: list = []
+                pending_token = _after_commit.set(pending)
+                begun_token = _tx_begun.set(not lazy)
+                if not lazy:
+                    conn.execute("BEGIN IMMEDIATE")
+                try:
+                    yield conn
+                    conn.commit()
+                except BaseException:
+                    conn.rollback()
+                    raise
+                finally:
+                    _tx_begun.reset(begun_token)
+                    _after_commit.reset(pending_token)
+                _run_after_commit(pending)
+            else:
+                if not _tx_begun.get():
+                    # Primeira escrita de uma transação lazy: pega o lock agora
+                    if not conn.in_transaction:
+                        conn.execute("BEGIN IMMEDIATE")
+                    _tx_begun.set(True)
+                savepoint = f"sp_{depth}"
+                pending = _after_commit.get()
+                mark = len(pending)
+                conn.execute(f"SAVEPOINT {savepoint}")
+                try:
+                    yield conn
+                    conn.execute(f"RELEASE {savepoint}")
+                except BaseException:
+                    conn.execute(f"ROLLBACK TO {savepoint}")
+                    conn.execute(f"RELEASE {savepoint}")
+                    del pending[mark:]
+                    raise
+        finally:
+            _tx_depth.reset(token)
+
+
+# Colunas derivadas de start_at/end_at (geradas pelo SQLite, indexáveis):
+# - start_epoch/end_epoch: epoch-seconds UTC (normaliza o offset do ISO)
+# - day: dia local YYYY-MM-DD (start_at é gravado no fuso da barbearia)
+APPOINTMENT_TIME_COLUMNS = {
+    "start_epoch": "INTEGER GENERATED ALWAYS AS (CAST(strftime('%s', start_at) AS INTEGER)) VIRTUAL",
+    "end_epoch": "INTEGER GENERATED ALWAYS AS (CAST(strftime('%s', end_at) AS INTEGER)) VIRTUAL",
+    "day": "TEXT GENERATED ALWAYS AS (substr(start_at, 1, 10)) VIRTUAL",
+}
+
+APPOINTMENT_TIME_INDEXES_SQL = """
+CREATE INDEX IF NOT EXISTS idx_appointments_barber_status_day
+  ON appointments(barber_id, status, day, start_epoch, end_epoch);
+CREATE INDEX IF NOT EXISTS idx_appointments_barber_status_start
+  ON appointments(barber_id, status, start_epoch, end_epoch);
+CREATE INDEX IF NOT EXISTS idx_appointments_status_day
+  ON appointments(status, day, reminder_sent_at, start_epoch);
+"""
+
+# Versão por (barbeiro, dia), incrementada por triggers a cada mudança em appointments.
+# Permite que caches em memória (ex: índice de disponibilidade) detectem escritas feitas
+# por outros processos/conexões com uma única leitura por chave primária.
+APPOINTMENT_DAY_VERSIONS_SQL = """
+CREATE TABLE IF NOT EXISTS appointment_day_versions (
+  barber_id INTEGER NOT NULL,
+  day TEXT NOT NULL,
+  version INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (barber_id, day)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS trg_appointments_version_insert
+AFTER INSERT ON appointments
+BEGIN
+  INSERT INTO appointment_day_versions(barber_id, day, version) VALUES(NEW.barber_id, NEW.day, 1)
+  ON CONFLICT(barber_id, day) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_appointments_version_update
+AFTER UPDATE OF barber_id, start_at, end_at, status ON appointments
+BEGIN
+  INSERT INTO appointment_day_versions(barber_id, day, version) VALUES(OLD.barber_id, OLD.day, 1)
+  ON CONFLICT(barber_id, day) DO UPDATE SET version = version + 1;
+  INSERT INTO appointment_day_versions(barber_id, day, version) VALUES(NEW.barber_id, NEW.day, 1)
+  ON CONFLICT(barber_id, day) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_appointments_version_delete
+AFTER DELETE ON appointments
+BEGIN
+  INSERT INTO appointment_day_versions(barber_id, day, version) VALUES(OLD.barber_id, OLD.day, 1)
+  ON CONFLICT(barber_id, day) DO UPDATE SET version = version + 1;
+END;
+"""
+
+
+# Versão do catálogo (barbeiros/serviços), incrementada por triggers em qualquer escrita.
+# Permite que o cache em processo detecte edições feitas por outras conexões/processos.
+CATALOG_VERSIONS_SQL = """
+CREATE TABLE IF NOT EXISTS catalog_versions (
+  name TEXT PRIMARY KEY,
+  version INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+""" + "".join(
+    f"""
+CREATE TRIGGER IF NOT EXISTS trg_{table}_catalog_{event.lower()}
+AFTER {event} ON {table}
+BEGIN
+  INSERT INTO catalog_versions(name, version) VALUES('{table}', 1)
+  ON CONFLICT(name) DO UPDATE SET version = version + 1;
+END;
+"""
+    for table in ("barbers", "services")
+    for event in ("INSERT", "UPDATE", "DELETE")
+)
+
+
+# Ids de mensagens do WhatsApp já recebidas (idempotência do webhook)
+PROCESSED_MESSAGES_SQL = """
+CREATE TABLE IF NOT EXISTS processed_messages (
+  message_id TEXT PRIMARY KEY,
+  received_at INTEGER NOT NULL -- epoch (s)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_processed_messages_received ON processed_messages(received_at);
+"""
+
+
+# Fila de saída persistente (mensagens a enviar pelos canais).
+# status: pending -> sent | dead (esgotou as tentativas)
+OUTBOX_SQL = """
+CREATE TABLE IF NOT EXISTS outbox (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  channel TEXT NOT NULL,            -- whatsapp | web
+  recipient TEXT NOT NULL,          -- telefone (whatsapp) ou client_key (web)
+  payload_json TEXT NOT NULL,       -- {"text": ..., "buttons": [...]}
+  status TEXT NOT NULL DEFAULT 'pending',
+  attempts INTEGER NOT NULL DEFAULT 0,
+  next_attempt_at REAL NOT NULL,    -- epoch (s)
+  last_error TEXT NULL,
+  created_at REAL NOT NULL,         -- epoch (s)
+  sent_at REAL NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_outbox_status_due ON outbox(status, next_attempt_at);
+CREATE INDEX IF NOT EXISTS idx_outbox_recipient_status ON outbox(recipient, status, id);
+"""
+
+
+def column_exists(conn: sqlite3.Connection, table: str, col: str) -> bool:
+    # table_xinfo inclui colunas geradas (table_info não)
+    rows = conn.execute(f"PRAGMA table_xinfo({table})").fetchall()
+    return any(r[1] == col for r in rows)
+
+
+def migrate_appointment_time_columns(conn: sqlite3.Connection) -> None:
+    """
+    Adiciona as colunas start_epoch/end_epoch/day em appointments, os índices
+    que as cobrem e o versionamento por (barbeiro, dia).
+    Idempotente; colunas geradas dispensam backfill.
+    """
+    for col, ddl in APPOINTMENT_TIME_COLUMNS.items():
+        if not column_exists(conn, "appointments", col):
+            conn.execute(f"ALTER TABLE appointments ADD COLUMN {col} {ddl};")
+    conn.executescript(APPOINTMENT_TIME_INDEXES_SQL)
+    conn.executescript(APPOINTMENT_DAY_VERSIONS_SQL)
+
+
+def migrate_client_state_version(conn: sqlite3.Connection) -> None:
+    """Adiciona clients.state_version (versão do estado da conversa). Idempotente."""
+    if not column_exists(conn, "clients", "state_version"):
+        conn.execute("ALTER TABLE clients ADD COLUMN state_version INTEGER NOT NULL DEFAULT 0;")
+
+
+def migrate_catalog_aliases(conn: sqlite3.Connection) -> None:
+    """Adiciona barbers.aliases e services.aliases (apelidos para busca por nome). Idempotente."""
+    for table in ("barbers", "services"):
+        if not column_exists(conn, table, "aliases"):
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN aliases TEXT NULL;")
+
+
 def init_db() -> None:
     schema_sql = """
     CREATE TABLE IF NOT EXISTS barbers (
       id INTEGER PRIMARY KEY AUTOINCREMENT,
       name TEXT NOT NULL UNIQUE,
-      is_active INTEGER NOT NULL DEFAULT 1
+      is_active INTEGER NOT NULL DEFAULT 1,
+      aliases TEXT NULL -- apelidos separados por vírgula (busca por nome)
     );
 
     CREATE TABLE IF NOT EXISTS services (
@@ -22,7 +588,8 @@ def init_db() -> None:
       name TEXT NOT NULL UNIQUE,
       duration_minutes INTEGER NOT NULL,
       price_cents INTEGER NULL,
-      is_active INTEGER NOT NULL DEFAULT 1
+      is_active INTEGER NOT NULL DEFAULT 1,
+      aliases TEXT NULL -- apelidos separados por vírgula (ex: "cabelo e barba")
     );
 
     CREATE TABLE IF NOT EXISTS clients (
@@ -34,6 +601,7 @@ def init_db() -> None:
       last_appointment_at TEXT NULL,
       conversation_state TEXT NOT NULL DEFAULT 'START',
       conversation_ctx_json TEXT NOT NULL DEFAULT '{}',
+      state_version INTEGER NOT NULL DEFAULT 0, -- concorrência otimista do estado da conversa
       created_at TEXT NOT NULL DEFAULT (datetime('now')),
       updated_at TEXT NOT NULL DEFAULT (datetime('now'))
     );
@@ -57,9 +625,11 @@ def init_db() -> None:
     CREATE INDEX IF NOT EXISTS idx_appointments_barber_start ON appointments(barber_id, start_at);
     CREATE INDEX IF NOT EXISTS idx_appointments_client_status ON appointments(client_id, status);
     """
-    conn = get_conn()
-    try:
-      conn.executescript(schema_sql)
-      conn.commit()
-    finally:
-      conn.close()
+    with pooled_conn() as conn:
+        conn.executescript(schema_sql)
+        migrate_appointment_time_columns(conn)
+        migrate_client_state_version(conn)
+        migrate_catalog_aliases(conn)
+        conn.executescript(CATALOG_VERSIONS_SQL)
+        conn.executescript(PROCESSED_MESSAGES_SQL)
+        conn.executescript(OUTBOX_SQL)
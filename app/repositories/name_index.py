@@ -0,0 +1,172 @@
+"""
+Índice de nomes do catálogo para busca tolerante (barbeiros, serviços).
+
+Construído a partir das linhas ativas em cache (`CatalogCache`) e refeito só
+quando a versão do catálogo muda. Cada linha entra com:
+- o nome normalizado (minúsculas, sem acentos)
+- os apelidos da coluna `aliases` (separados por vírgula, ex: "cabelo e barba")
+- o primeiro nome, quando não é ambíguo ("Carlos Silva" -> "carlos")
+
+`short_name` dá o nome curto de exibição (botões do WhatsApp têm 20 caracteres):
+o primeiro nome, ou a inicial e o sobrenome quando o primeiro nome se repete
+("Carlos Silva" / "Carlos Souza" -> "C. Silva" / "C. Souza").
+
+Busca:
+1. Igualdade exata com um nome/apelido (dict, O(1))
+2. Candidatos que compartilham trigramas (índice invertido) e, entre os
+   melhores, a maior similaridade de sequência (difflib) acima de `min_score`
+   — tolera erros de digitação como "calros" ou "corte e barab"
+
+Numa mensagem livre (`search`), só vão para a etapa tolerante os trechos em que
+toda palavra lembra alguma palavra do catálogo ("quero", "amanha" descartam o
+trecho sem rodar o difflib).
+"""
+import heapq
+from collections import Counter
+from difflib import SequenceMatcher
+
+from app.core.config import NAME_MATCH_MIN_SCORE
+from app.core.text import normalize_text
+
+# Candidatos (por trigramas em comum) reavaliados com difflib
+_MAX_CANDIDATES = 8
+# Similaridade mínima de uma palavra da mensagem com uma palavra do catálogo
+_WORD_MIN_SCORE = 0.7
+
+
+def _clean(text: str) -> str:
+    return " ".join("".join(ch if ch.isalnum() else " " for ch in normalize_text(text)).split())
+
+
+def _trigrams(text: str) -> list[str]:
+    padded = f" {text} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+class NameIndex:
+    """Nomes e apelidos normalizados de um conjunto de linhas, com índice de trigramas."""
+
+    def __init__(self, rows: list[dict]):
+        names: dict[str, dict] = {}
+        for row in rows:
+            for alias in [row["name"], *(row.get("aliases") or "").split(",")]:
+                key = _clean(alias)
+                if key:
+                    names.setdefault(key, row)
+
+        # Primeiro nome como apelido, se nenhum outro nome/apelido começa igual
+        first_words = Counter(key.split()[0] for key in names)
+        for key, row in list(names.items()):
+            first = key.split()[0]
+            if first != key and first_words[first] == 1 and first not in names:
+                names[first] = row
+
+        self._exact = names
+
+        # Nome curto de exibição: mesmo critério de ambiguidade, mas entre as linhas
+        row_first = Counter(_clean(row["name"]).split()[0] for row in rows if _clean(row["name"]))
+        self._short: dict[int, str] = {}
+        for row in rows:
+            words = str(row["name"]).split()
+            if len(words) > 1 and row_first[_clean(words[0])] > 1:
+                self._short[int(row["id"])] = f"{words[0][0]}. {words[-1]}"
+            elif words:
+                self._short[int(row["id"])] = words[0]
+        self._keys = list(names)
+        self._postings: dict[str, list[int]] = {}
+        for i, key in enumerate(self._keys):
+            for gram in set(_trigrams(key)):
+                self._postings.setdefault(gram, []).append(i)
+        self.max_words = max((len(key.split()) for key in self._keys), default=0)
+        self._vocabulary = {word for key in self._keys for word in key.split()}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def short_name(self, row_id: int) -> str | None:
+        """Nome curto e sem ambiguidade da linha ("Carlos", "C. Silva"); None se não existe."""
+        return self._short.get(int(row_id))
+
+    def lookup(self, text: str, min_score: float = NAME_MATCH_MIN_SCORE) -> tuple[dict, float] | None:
+        """
+        Linha cujo nome/apelido corresponde ao texto inteiro.
+
+        Returns:
+            (linha, confiança 0-1) ou None abaixo de `min_score`
+        """
+        return self._lookup_clean(_clean(text), min_score)
+
+    def _lookup_clean(self, key: str, min_score: float) -> tuple[dict, float] | None:
+        if not key:
+            return None
+        row = self._exact.get(key)
+        if row is not None:
+            return row, 1.0
+
+        shared = Counter()
+        for gram in set(_trigrams(key)):
+            shared.update(self._postings.get(gram, ()))
+        # Limite superior da similaridade pelo tamanho: descarta sem rodar o difflib
+        size = len(key)
+        candidates = [
+            (count, i) for i, count in shared.items()
+            if 2 * min(size, len(self._keys[i])) >= min_score * (size + len(self._keys[i]))
+        ]
+        best = None
+        matcher = SequenceMatcher(autojunk=False)
+        matcher.set_seq2(key)  # o difflib pré-processa só a segunda sequência
+        for _, i in heapq.nlargest(_MAX_CANDIDATES, candidates):
+            candidate = self._keys[i]
+            matcher.set_seq1(candidate)
+            # quick_ratio (contagem de letras) é limite superior barato do ratio
+            if matcher.quick_ratio() < min_score:
+                continue
+            score = matcher.ratio()
+            if score >= min_score and (best is None or score > best[1]):
+                best = (self._exact[candidate], score)
+        return best
+
+    def search(self, text: str, min_score: float = NAME_MATCH_MIN_SCORE) -> tuple[dict, float] | None:
+        """
+        Linha cujo nome/apelido aparece dentro de uma mensagem ("corte com o calros amanhã").
+
+        Confere trechos de 1 até `max_words` palavras: nome exato vence (o mais
+        longo primeiro); senão, o trecho mais parecido acima de `min_score`.
+        """
+        words = _clean(text).split()
+        windows = [
+            " ".join(words[i:i + size])
+            for size in range(min(self.max_words, len(words)), 0, -1)
+            for i in range(len(words) - size + 1)
+        ]
+        for window in windows:
+            row = self._exact.get(window)
+            if row is not None:
+                return row, 1.0
+
+        known = {word for word in set(words) if self._known_word(word)}
+        best = None
+        for window in windows:
+            if len(window) < 3:
+                continue  # "o", "as": trigramas demais em comum com qualquer nome
+            if not known.issuperset(window.split()):
+                continue
+            found = self._lookup_clean(window, min_score)
+            if found and (best is None or found[1] > best[1]):
+                best = found
+        return best
+
+    def _known_word(self, word: str) -> bool:
+        """Palavra do catálogo ou parecida com alguma (erro de digitação)."""
+        if word in self._vocabulary:
+            return True
+        if len(word) < 3:
+            return False
+        matcher = SequenceMatcher(autojunk=False)
+        matcher.set_seq2(word)
+        for candidate in self._vocabulary:
+            matcher.set_seq1(candidate)
+            if matcher.real_quick_ratio() >= _WORD_MIN_SCORE and matcher.quick_ratio() >= _WORD_MIN_SCORE \
+                    and matcher.ratio() >= _WORD_MIN_SCORE:
+                return True
+        return False
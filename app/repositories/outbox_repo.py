@@ -0,0 +1,117 @@
+import json
+import time
+from typing import Callable
+
+from app.core.tracing import traced
+from app.repositories.db import pooled_conn, transaction, after_commit
+
+# Observadores de novas mensagens (ex: dispatcher acorda após o COMMIT)
+_enqueue_listeners: list[Callable[[], None]] = []
+
+# Mensagens devidas, no máximo uma por destinatário: só a mais antiga pendente de
+# cada destinatário é elegível, garantindo a ordem de entrega por destinatário.
+DUE_MESSAGES_SQL = """
+    SELECT o.id, o.channel, o.recipient, o.payload_json, o.attempts, o.created_at
+    FROM outbox o
+    WHERE o.status = 'pending'
+      AND o.next_attempt_at <= ?
+      AND o.id = (
+        SELECT MIN(p.id) FROM outbox p
+        WHERE p.recipient = o.recipient AND p.status = 'pending'
+      )
+    ORDER BY o.id
+    LIMIT ?
+"""
+
+
+def add_outbox_listener(listener: Callable[[], None]) -> None:
+    """Registra um observador chamado após o COMMIT de novas mensagens."""
+    if listener not in _enqueue_listeners:
+        _enqueue_listeners.append(listener)
+
+
+def _notify_after_commit() -> None:
+    def _notify():
+        for listener in list(_enqueue_listeners):
+            listener()
+    after_commit(_notify)
+
+
+@traced("db.enqueue_outbound")
+def enqueue_outbound(channel: str, recipient: str, text: str, buttons: list[dict] | None = None) -> int:
+    """
+    Grava uma mensagem na fila de saída.
+
+    Participa da transação corrente (se houver): a mensagem só existe se o
+    turno/alteração de estado que a gerou for commitado.
+
+    Returns:
+        id da mensagem na outbox
+    """
+    now = time.time()
+    with transaction() as conn:
+        cur = conn.execute(
+            """
+            INSERT INTO outbox(channel, recipient, payload_json, next_attempt_at, created_at)
+            VALUES(?, ?, ?, ?, ?)
+            """,
+            (channel, recipient, json.dumps({"text": text, "buttons": buttons or []}, ensure_ascii=False), now, now),
+        )
+        _notify_after_commit()
+        return int(cur.lastrowid)
+
+
+@traced("db.list_due_messages")
+def list_due_messages(now: float, limit: int) -> list[dict]:
+    """Próximas mensagens a enviar (uma por destinatário, em ordem de criação)."""
+    with pooled_conn() as conn:
+        rows = conn.execute(DUE_MESSAGES_SQL, (now, limit)).fetchall()
+        result = []
+        for r in rows:
+            item = dict(r)
+            item["payload"] = json.loads(item.pop("payload_json"))
+            result.append(item)
+        return result
+
+
+@traced("db.mark_outbox_sent")
+def mark_outbox_sent(message_ids: list[int], sent_at: float) -> None:
+    if not message_ids:
+        return
+    placeholders = ",".join("?" * len(message_ids))
+    with transaction() as conn:
+        conn.execute(
+            f"UPDATE outbox SET status = 'sent', sent_at = ?, attempts = attempts + 1 WHERE id IN ({placeholders})",
+            [sent_at, *message_ids],
+        )
+
+
+@traced("db.mark_outbox_failed")
+def mark_outbox_failed(message_id: int, error: str, next_attempt_at: float | None) -> None:
+    """Registra uma falha: reagenda para `next_attempt_at` ou, se None, move para dead-letter."""
+    with transaction() as conn:
+        if next_attempt_at is None:
+            conn.execute(
+                "UPDATE outbox SET status = 'dead', attempts = attempts + 1, last_error = ? WHERE id = ?",
+                (error, message_id),
+            )
+        else:
+            conn.execute(
+                "UPDATE outbox SET attempts = attempts + 1, last_error = ?, next_attempt_at = ? WHERE id = ?",
+                (error, next_attempt_at, message_id),
+            )
+
+
+def get_outbox_counts() -> dict:
+    """Profundidade da fila: pendentes, dead-letter e idade da mais antiga pendente."""
+    with pooled_conn() as conn:
+        rows = conn.execute(
+            "SELECT status, COUNT(*) AS n, MIN(created_at) AS oldest FROM outbox WHERE status IN ('pending', 'dead') GROUP BY status"
+        ).fetchall()
+    counts = {r["status"]: r for r in rows}
+    pending = counts.get("pending")
+    return {
+        "pending": pending["n"] if pending else 0,
+        "dead": counts["dead"]["n"] if "dead" in counts else 0,
+        "oldest_pending_age_s": round(time.time() - pending["oldest"], 3) if pending else 0.0,
+    }
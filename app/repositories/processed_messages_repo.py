@@ -0,0 +1,30 @@
+import time
+
+from app.core.tracing import traced
+from app.repositories.db import transaction
+
+
+@traced("db.claim_message")
+def claim_message(message_id: str, now: int | None = None) -> bool:
+    """
+    Registra o id da mensagem como recebido.
+
+    Atômico (um único INSERT): entre processos/workers concorrentes, apenas um
+    consegue o claim.
+
+    Returns:
+        True se a mensagem é nova; False se já havia sido registrada
+    """
+    with transaction() as conn:
+        cur = conn.execute(
+            "INSERT INTO processed_messages(message_id, received_at) VALUES(?, ?) ON CONFLICT(message_id) DO NOTHING",
+            (message_id, int(now if now is not None else time.time())),
+        )
+        return cur.rowcount == 1
+
+
+def prune_processed_messages(older_than: int) -> int:
+    """Remove registros recebidos antes de `older_than` (epoch). Retorna quantos removeu."""
+    with transaction() as conn:
+        cur = conn.execute("DELETE FROM processed_messages WHERE received_at < ?", (older_than,))
+        return cur.rowcount
@@ -1,33 +1,13 @@
-from app.repositories.db import get_conn
+from app.repositories.catalog_cache import services_cache
 
 def list_active_services() -> list[dict]:
-    conn = get_conn()
-    try:
-        rows = conn.execute(
-            "SELECT id, name, duration_minutes, price_cents FROM services WHERE is_active = 1 ORDER BY id"
-        ).fetchall()
-        return [dict(r) for r in rows]
-    finally:
-        conn.close()
+    return services_cache.list()
 
 def find_service_by_name(name: str) -> dict | None:
-    conn = get_conn()
-    try:
-        row = conn.execute(
-            "SELECT id, name, duration_minutes, price_cents FROM services WHERE is_active = 1 AND name = ?",
-            (name,),
-        ).fetchone()
-        return dict(row) if row else None
-    finally:
-        conn.close()
+    return services_cache.find_by_name(name)
+
+def find_service_in_text(text: str) -> dict | None:
+    return services_cache.search_name(text)
 
 def find_service_by_id(service_id: int) -> dict | None:
-    conn = get_conn()
-    try:
-        row = conn.execute(
-            "SELECT id, name, duration_minutes, price_cents FROM services WHERE id = ? AND is_active = 1",
-            (service_id,),
-        ).fetchone()
-        return dict(row) if row else None
-    finally:
-        conn.close()
+    return services_cache.get_by_id(service_id)
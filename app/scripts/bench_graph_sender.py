@@ -0,0 +1,121 @@
+"""
+Benchmark de envio de respostas pela Graph API contra um servidor HTTP local.
+
+Compara o cliente compartilhado (keep-alive, pool de conexões) com um cliente
+novo por resposta (uma conexão TCP por mensagem), medindo latência p50/p95 e
+vazão para N respostas com C envios simultâneos.
+
+Uso:
+    python -m app.scripts.bench_graph_sender --replies 1000 --concurrency 20
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+from app.integrations.channels import whatsapp
+from app.integrations.channels.whatsapp import (
+    build_graph_client,
+    send_message_via_graph_api,
+    start_graph_client,
+    close_graph_client,
+)
+
+
+class _StubGraphHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    connections: set = set()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.connections.add(self.client_address)
+        data = json.dumps({"messages": [{"id": "wamid.bench"}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+async def _run(mode: str, base_url: str, replies: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    async def one(i: int) -> bool:
+        async with semaphore:
+            started = time.perf_counter()
+            if mode == "pooled":
+                ok = await send_message_via_graph_api(
+                    phone=f"55119{i:08d}", text=f"resposta {i}", buttons=[],
+                    access_token="bench", phone_id="123",
+                )
+            else:
+                async with build_graph_client(base_url) as client:
+                    response = await client.post(
+                        "/123/messages",
+                        json=whatsapp.build_text_message_response(f"55119{i:08d}", f"resposta {i}"),
+                        headers={"Authorization": "Bearer bench"},
+                    )
+                    ok = response.is_success
+            latencies.append(time.perf_counter() - started)
+            return ok
+
+    _StubGraphHandler.connections = set()
+    if mode == "pooled":
+        await start_graph_client(base_url)
+    started = time.perf_counter()
+    try:
+        results = await asyncio.gather(*(one(i) for i in range(replies)))
+    finally:
+        if mode == "pooled":
+            await close_graph_client()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "mode": mode,
+        "ok": sum(results),
+        "seconds": round(elapsed, 3),
+        "per_second": round(replies / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+        "connections": len(_StubGraphHandler.connections),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--replies", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--modes", nargs="+", default=["pooled", "per-request"])
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubGraphHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v18.0"
+    print(f"httpx {httpx.__version__}, http2={'sim' if whatsapp.HTTP2_AVAILABLE else 'não (h2 ausente)'}")
+
+    try:
+        for mode in args.modes:
+            r = asyncio.run(_run(mode, base_url, args.replies, args.concurrency))
+            print(
+                f"{r['mode']:>11}: {r['ok']}/{args.replies} em {r['seconds']}s -> {r['per_second']} msg/s "
+                f"(p50 {r['p50_ms']} ms, p95 {r['p95_ms']} ms, {r['connections']} conexões)"
+            )
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
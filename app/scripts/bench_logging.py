@@ -0,0 +1,113 @@
+"""
+Benchmark do custo de logging por requisição do webhook.
+
+Compara, do ponto de vista de quem loga (o event loop):
+- legado: FileHandler síncrono por módulo + console, logger em DEBUG e
+  mensagens em f-string (montadas mesmo quando o nível está desabilitado)
+- fila: QueueHandler -> QueueListener (thread) -> console + arquivo com
+  rotação, formatação preguiçosa (%s) e campos `kv()`, em INFO e em DEBUG
+
+Cada "requisição" emite os registros do caminho do webhook: payload (DEBUG),
+estado/intent da conversa (DEBUG) e mensagem recebida/transição (INFO). O
+console vai para /dev/null e os arquivos para um diretório temporário.
+
+Uso:
+    python -m app.scripts.bench_logging --requests 2000 --gap-ms 0.5
+"""
+import argparse
+import logging
+import os
+import queue
+import tempfile
+import time
+from logging.handlers import QueueListener
+from pathlib import Path
+
+from app.core.logging import _InlineQueueHandler, _build_handlers, kv
+
+PAYLOAD = {
+    "object": "whatsapp_business_account",
+    "entry": [{"id": "1", "changes": [{"field": "messages", "value": {
+        "metadata": {"phone_number_id": "123"},
+        "messages": [{"from": "5511999990000", "id": "wamid.ABC", "type": "text",
+                      "text": {"body": "Quero agendar um corte amanhã às 14h"}}],
+    }}]}],
+}
+
+
+def legacy_logger(log_dir: Path, stream) -> logging.Logger:
+    """Configuração anterior de get_logger (handlers síncronos no logger)."""
+    logger = logging.getLogger("bench.legacy")
+    logger.handlers.clear()
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    formatter = logging.Formatter("[%(asctime)s] [%(name)s] [%(levelname)s] %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
+    console_handler = logging.StreamHandler(stream)
+    console_handler.setLevel(logging.INFO)
+    console_handler.setFormatter(formatter)
+    logger.addHandler(console_handler)
+    file_handler = logging.FileHandler(log_dir / "bench_legacy.log")
+    file_handler.setFormatter(formatter)
+    logger.addHandler(file_handler)
+    return logger
+
+
+def legacy_request(logger: logging.Logger) -> None:
+    logger.debug(f"Webhook payload: {PAYLOAD}")
+    logger.info(f"Mensagem recebida de 5511999990000: {'Quero agendar um corte amanhã às 14h'}")
+    logger.debug(f"State: {'START'} | Input: {'quero agendar um corte amanha as 14h'}")
+    logger.debug(f"Detected intent: {'BOOK_APPOINTMENT'}")
+    logger.info(f"Estado: {'START'} → {'WAIT_CONFIRMATION'}")
+
+
+def queued_request(logger: logging.Logger) -> None:
+    logger.debug("Webhook payload: %s", PAYLOAD)
+    logger.info("Mensagem recebida: %s", "Quero agendar um corte amanhã às 14h",
+                extra=kv(phone="5511999990000", message_id="wamid.ABC"))
+    logger.debug("Input: %s", "quero agendar um corte amanha as 14h", extra=kv(state="START"))
+    logger.debug("Detected intent: %s", "BOOK_APPOINTMENT")
+    logger.info("Transição de estado", extra=kv(client_id="5511999990000", state="START", next_state="WAIT_CONFIRMATION"))
+
+
+def _run(label: str, logger: logging.Logger, request, requests: int, gap: float, drain=None) -> None:
+    # Mede só o tempo dentro de cada requisição; o intervalo entre elas
+    # (como no servidor) deixa a thread de logging esvaziar a fila
+    spent = 0.0
+    for _ in range(requests):
+        started = time.perf_counter()
+        request(logger)
+        spent += time.perf_counter() - started
+        if gap:
+            time.sleep(gap)
+    if drain:
+        drain()
+    print(f"{label:>14}: {spent / requests * 1e6:7.1f} µs/requisição no chamador")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000, help="Requisições simuladas")
+    parser.add_argument("--gap-ms", type=float, default=0.5, help="Intervalo entre requisições (0 = rajada)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, "w") as devnull:
+        log_dir = Path(tmp)
+        _run("legado", legacy_logger(log_dir, devnull), legacy_request, args.requests, args.gap_ms / 1000)
+
+        for level in (logging.INFO, logging.DEBUG):
+            name = logging.getLevelName(level)
+            logger = logging.getLogger(f"bench.queue.{name}")
+            logger.handlers.clear()
+            logger.propagate = False
+            logger.setLevel(level)
+            q = queue.SimpleQueue()
+            logger.addHandler(_InlineQueueHandler(q))
+            listener = QueueListener(q, *_build_handlers(log_dir / f"bench_{name}.log", devnull), respect_handler_level=True)
+            listener.start()
+            _run(f"fila ({name})", logger, queued_request, args.requests, args.gap_ms / 1000, drain=listener.stop)
+            for handler in listener.handlers:
+                handler.close()
+
+
+if __name__ == "__main__":
+    main()
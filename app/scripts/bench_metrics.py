@@ -0,0 +1,107 @@
+"""
+Benchmark do custo da instrumentação de /metrics no caminho quente.
+
+1. Custo unitário: Counter.inc, Histogram.observe e um execute() SQL numa
+   conexão medida (MeteredConnection) contra uma sqlite3.Connection comum
+2. Requisições POST /chat/web reais (banco temporário): quantas observações
+   cada requisição faz e quanto isso pesa no tempo da requisição no servidor
+   (histograma do middleware) e no turno de conversa isolado
+
+Uso:
+    python -m app.scripts.bench_metrics --requests 300
+"""
+import argparse
+import sqlite3
+import tempfile
+import timeit
+from pathlib import Path
+
+from app.core.metrics import Counter, Histogram
+from app.repositories import db
+
+MESSAGES = ["oi", "quero agendar", "Barbeiro 1", "Corte", "amanhã", "14:00", "cancelar"]
+
+
+def _ns(stmt, number: int = 200_000) -> float:
+    return timeit.timeit(stmt, number=number) / number * 1e9
+
+
+def unit_costs() -> dict[str, float]:
+    counter = Counter("bench_total", "bench", ("state", "next_state"))
+    hist = Histogram("bench_seconds", "bench", ("state",))
+    plain = sqlite3.connect(":memory:")
+    metered = sqlite3.connect(":memory:", factory=db.MeteredConnection)
+    return {
+        "counter.inc": _ns(lambda: counter.inc("START", "WAIT_BARBER")),
+        "histogram.observe": _ns(lambda: hist.observe(0.0042, "START")),
+        "execute (comum)": _ns(lambda: plain.execute("SELECT 1"), 50_000),
+        "execute (medido)": _ns(lambda: metered.execute("SELECT 1"), 50_000),
+    }
+
+
+def _totals() -> dict[str, float]:
+    from app.api.middleware import REQUEST_SECONDS
+    from app.services.conversation import STATE_HANDLER_SECONDS
+    from app.services.inbound import STATE_TRANSITIONS, TURN_SECONDS
+
+    def count_and_sum(metric) -> tuple[int, float]:
+        merged = metric._merged().values()
+        return sum(series[2] for series in merged), sum(series[1] for series in merged)
+
+    queries, _ = count_and_sum(db.DB_QUERY_SECONDS)
+    requests, request_seconds = count_and_sum(REQUEST_SECONDS)
+    turns, turn_seconds = count_and_sum(TURN_SECONDS)
+    handlers, _ = count_and_sum(STATE_HANDLER_SECONDS)
+    transitions = sum(value for _, value in next(STATE_TRANSITIONS.collect())[3])
+    return {
+        "queries": queries,
+        "others": requests + turns + handlers + transitions,
+        "requests": requests,
+        "request_seconds": request_seconds,
+        "turns": turns,
+        "turn_seconds": turn_seconds,
+    }
+
+
+def run_requests(requests: int) -> dict[str, float]:
+    """Deltas dos totais de métricas ao longo de `requests` POST /chat/web."""
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.scripts.seed import run as seed
+
+    seed()
+    client = TestClient(app)
+    before = _totals()
+    for i in range(requests):
+        client.post("/chat/web", json={"client_id": f"bench-{i % 20}", "message": MESSAGES[i % len(MESSAGES)]})
+    after = _totals()
+    return {key: after[key] - before[key] for key in after}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300, help="Requisições de chat simuladas")
+    args = parser.parse_args()
+
+    costs = unit_costs()
+    for name, ns in costs.items():
+        print(f"{name:>18}: {ns:7.0f} ns")
+    per_query = costs["execute (medido)"] - costs["execute (comum)"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = Path(tmp) / "bench.sqlite3"
+        delta = run_requests(args.requests)
+        db.close_pool()
+
+    n = delta["requests"]
+    request_time = delta["request_seconds"] / n
+    turn_time = delta["turn_seconds"] / delta["turns"]
+    queries, others = delta["queries"] / n, delta["others"] / n
+    overhead = (queries * per_query + others * costs["histogram.observe"]) / 1e9
+    print(f"requisição (servidor): {request_time * 1e6:.0f} µs; turno: {turn_time * 1e6:.0f} µs")
+    print(f"observações: {queries:.1f} comandos SQL + {others:.1f} outras por requisição")
+    print(f"instrumentação: ~{overhead * 1e6:.1f} µs = {overhead / request_time:.2%} da requisição"
+          f" ({overhead / turn_time:.2%} do turno isolado)")
+
+if __name__ == "__main__":
+    main()
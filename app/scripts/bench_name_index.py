@@ -0,0 +1,93 @@
+"""
+Benchmark da resolução de nomes de barbeiros/serviços.
+
+Compara a busca pelo `NameIndex` (dict exato + trigramas + difflib nos
+melhores candidatos) com a varredura linear com difflib sobre todos os nomes,
+num catálogo sintético de várias unidades (centenas de nomes).
+
+Uso:
+    python -m app.scripts.bench_name_index --shops 20 --rounds 200
+"""
+import argparse
+import time
+from difflib import SequenceMatcher
+
+from app.repositories.name_index import NameIndex, _clean
+
+SERVICES = [
+    "Corte", "Corte e barba", "Barba", "Pigmentação", "Sobrancelha", "Luzes",
+    "Platinado", "Hidratação", "Relaxamento", "Corte infantil", "Degradê", "Pezinho",
+]
+BARBERS = ["Carlos", "João", "Pedro", "Marcos", "Rafael", "Thiago", "Lucas", "André"]
+
+QUERIES = [
+    "Corte e barba",        # exato
+    "corte e barab",        # erro de digitação
+    "pigmentacao",          # sem acento
+    "platnado 7",           # erro + unidade
+    "hidratacao unidade 3",
+    "sobrancelha 12",
+    "massagem",             # não existe
+]
+MESSAGES = [
+    "quero um corte e barba com o calros amanha as 14h",
+    "tem horario pra pigmentacao na sexta?",
+    "oi, queria saber o preço",
+]
+
+
+def build_rows(shops: int) -> list[dict]:
+    rows = []
+    for shop in range(1, shops + 1):
+        for name in SERVICES:
+            rows.append({"id": len(rows) + 1, "name": f"{name} {shop}", "aliases": None})
+    for name in BARBERS:
+        rows.append({"id": len(rows) + 1, "name": name, "aliases": None})
+    return rows
+
+
+def linear_lookup(text: str, rows: list[dict], min_score: float = 0.8) -> dict | None:
+    """Varredura ingênua: difflib contra todos os nomes a cada busca."""
+    key = _clean(text)
+    best, best_score = None, min_score
+    for row in rows:
+        score = SequenceMatcher(None, key, _clean(row["name"])).ratio()
+        if score >= best_score:
+            best, best_score = row, score
+    return best
+
+
+def _per_call_us(fn, args: list[str], rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for a in args:
+            fn(a)
+    return (time.perf_counter() - started) / (rounds * len(args)) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shops", type=int, default=20, help="Unidades (cada uma com todos os serviços)")
+    parser.add_argument("--rounds", type=int, default=200, help="Repetições de cada consulta")
+    args = parser.parse_args()
+
+    rows = build_rows(args.shops)
+    started = time.perf_counter()
+    index = NameIndex(rows)
+    build_ms = (time.perf_counter() - started) * 1000
+    print(f"catálogo: {len(rows)} linhas, {len(index)} chaves; montagem do índice {build_ms:.2f} ms")
+
+    linear = _per_call_us(lambda q: linear_lookup(q, rows), QUERIES, max(1, args.rounds // 10))
+    indexed = _per_call_us(index.lookup, QUERIES, args.rounds)
+    search = _per_call_us(index.search, MESSAGES, args.rounds)
+    print(f"  linear: {linear:9.1f} µs/nome")
+    print(f"  índice: {indexed:9.1f} µs/nome")
+    print(f"  busca em mensagem: {search:9.1f} µs/mensagem")
+    for q in QUERIES:
+        found = index.lookup(q)
+        result = f"{found[0]['name']} ({found[1]:.2f})" if found else "None"
+        print(f"    {q!r:>24} -> {result}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Benchmark e corpus de acurácia da detecção de intenção.
+
+Compara o `detect_intent` atual (regex única pré-compilada, fronteiras de
+palavra, texto sem acentos) com o legado (listas recriadas a cada chamada e
+busca por substring, onde "oi" casa em "noite" e "marcar" em "remarcar").
+
+Uso:
+    python -m app.scripts.bench_nlu --rounds 2000
+"""
+import argparse
+import time
+
+from app.services.nlu import detect_intent
+
+# (mensagem, intent esperada); as marcadas com "legado erra" mostram os falsos
+# positivos da busca por substring
+CORPUS: list[tuple[str, str]] = [
+    ("Quero agendar um corte", "BOOK_APPOINTMENT"),
+    ("preciso marcar horário pra amanhã", "BOOK_APPOINTMENT"),
+    ("Gostaria de agendar com o João", "BOOK_APPOINTMENT"),
+    ("tem horário sábado?", "BOOK_APPOINTMENT"),
+    ("tem horario livre hj?", "BOOK_APPOINTMENT"),
+    ("novo agendamento", "BOOK_APPOINTMENT"),
+    ("Oi, quero marcar", "BOOK_APPOINTMENT"),
+    ("boa tarde! dá pra agendar barba?", "BOOK_APPOINTMENT"),
+    ("quero marcar para outro dia", "BOOK_APPOINTMENT"),
+    ("AGENDAR", "BOOK_APPOINTMENT"),
+    ("Marcação pra sexta", "BOOK_APPOINTMENT"),
+    ("Cancelar", "CANCEL_APPOINTMENT"),
+    ("quero cancelar meu corte", "CANCEL_APPOINTMENT"),
+    ("preciso desmarcar", "CANCEL_APPOINTMENT"),
+    ("não vou conseguir ir", "CANCEL_APPOINTMENT"),
+    ("nao posso amanha", "CANCEL_APPOINTMENT"),
+    ("não dá mais", "CANCEL_APPOINTMENT"),
+    ("esqueci que tenho médico, cancela por favor", "CANCEL_APPOINTMENT"),
+    ("quero voltar", "CANCEL_APPOINTMENT"),
+    ("recomeçar", "CANCEL_APPOINTMENT"),
+    ("vamos começar de novo", "CANCEL_APPOINTMENT"),
+    ("cancelamento do meu horário", "BOOK_APPOINTMENT"),  # prioridade: BOOK vence
+    ("Remarcar", "REMARK_APPOINTMENT"),  # legado erra: "marcar" em "remarcar"
+    ("quero remarcar", "REMARK_APPOINTMENT"),  # legado erra
+    ("preciso remarcar meu corte", "REMARK_APPOINTMENT"),  # legado erra
+    ("dá pra mudar pra quinta?", "REMARK_APPOINTMENT"),
+    ("posso trocar o dia?", "REMARK_APPOINTMENT"),
+    ("quero adiar uma semana", "REMARK_APPOINTMENT"),
+    ("consigo antecipar?", "REMARK_APPOINTMENT"),
+    ("prefiro outra hora", "REMARK_APPOINTMENT"),
+    ("alterar meu agendamento", "REMARK_APPOINTMENT"),
+    ("modificar", "REMARK_APPOINTMENT"),
+    ("Oi", "GREETING"),
+    ("olá!", "GREETING"),
+    ("Ola tudo bem?", "GREETING"),
+    ("Bom dia", "GREETING"),
+    ("boa noite", "GREETING"),
+    ("e aí, beleza?", "GREETING"),
+    ("eae", "GREETING"),
+    ("opa blz", "GREETING"),
+    ("hey", "GREETING"),
+    ("tudo certo?", "GREETING"),
+    ("obrigado", "UNKNOWN"),
+    ("qual o endereço?", "UNKNOWN"),
+    ("vocês aceitam pix?", "UNKNOWN"),
+    ("noite", "UNKNOWN"),  # legado erra: "oi" em "noite"
+    ("fico até a noite no trabalho", "UNKNOWN"),  # legado erra
+    ("depois te respondo", "UNKNOWN"),
+    ("foi ótimo, valeu", "UNKNOWN"),
+    ("quanto custa o corte?", "UNKNOWN"),
+    ("estou indo", "UNKNOWN"),
+    ("corte e barba", "UNKNOWN"),
+    ("o corte foi dez", "UNKNOWN"),  # legado erra: "oi" em "foi"
+    ("Coisa boa", "UNKNOWN"),  # legado erra: "oi" em "coisa"
+    ("mudaram o endereço?", "UNKNOWN"),  # legado erra: "mudar" em "mudaram"
+    ("adiaram o jogo", "UNKNOWN"),  # legado erra: "adiar" em "adiaram"
+    ("tenho uma dúvida sobre o preço", "UNKNOWN"),
+    ("sim", "UNKNOWN"),
+    ("14:00", "UNKNOWN"),
+    ("20/01", "UNKNOWN"),
+]
+
+
+def legacy_detect_intent(message: str) -> str:
+    """Implementação anterior (substring, listas recriadas a cada chamada)."""
+    msg = message.lower().strip()
+    book_keywords = [
+        "agendar", "marcar", "marcação", "marcar horário", "horário", "horario",
+        "quero agendar", "preciso agendar", "quer agendar", "quer marcar",
+        "gostaria de marcar", "gostaria de agendar", "novo agendamento",
+    ]
+    if any(k in msg for k in book_keywords):
+        return "BOOK_APPOINTMENT"
+    cancel_keywords = [
+        "cancelar", "desmarcar", "desmarcar horário", "cancelamento",
+        "não vou", "não posso", "não dá", "nem vou", "esqueci",
+        "marcar diferente", "outra data", "outro horário", "outro dia",
+        "voltar", "recomeçar", "começar de novo",
+    ]
+    if any(k in msg for k in cancel_keywords):
+        return "CANCEL_APPOINTMENT"
+    remark_keywords = [
+        "remarcar", "mudar", "trocar", "alterar", "modificar", "adiar",
+        "antecipar", "outra hora", "outro horário", "não é possível",
+        "precisa mudar", "posso mudar", "acha que muda",
+    ]
+    if any(k in msg for k in remark_keywords):
+        return "REMARK_APPOINTMENT"
+    greeting_keywords = [
+        "oi", "olá", "ola", "bom dia", "boa tarde", "boa noite",
+        "e aí", "eae", "tudo bem", "tudo certo", "opa", "oopa",
+        "hey", "opa blz", "blz", "e ai", "tudo bem com você",
+    ]
+    if any(k in msg for k in greeting_keywords):
+        return "GREETING"
+    return "UNKNOWN"
+
+
+def accuracy(detect) -> tuple[float, list[tuple[str, str, str]]]:
+    """Acurácia no corpus e lista de erros (mensagem, esperado, obtido)."""
+    errors = [(msg, expected, detect(msg)) for msg, expected in CORPUS if detect(msg) != expected]
+    return 1 - len(errors) / len(CORPUS), errors
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=2000, help="Passadas pelo corpus")
+    parser.add_argument("--errors", action="store_true", help="Lista as mensagens classificadas errado")
+    args = parser.parse_args()
+
+    messages = [msg for msg, _ in CORPUS]
+    print(f"corpus: {len(CORPUS)} mensagens")
+    for name, detect in (("legado", legacy_detect_intent), ("atual", detect_intent)):
+        started = time.perf_counter()
+        for _ in range(args.rounds):
+            for msg in messages:
+                detect(msg)
+        per_msg = (time.perf_counter() - started) / (args.rounds * len(messages))
+        acc, errors = accuracy(detect)
+        print(f"{name:>6}: {per_msg * 1e6:6.2f} µs/mensagem, acurácia {acc:.1%} ({len(errors)} erros)")
+        if args.errors:
+            for msg, expected, got in errors:
+                print(f"        {msg!r}: esperado {expected}, obtido {got}")
+
+    # Mensagem longa (~parágrafo): o legado faz ~60 buscas de substring no texto todo
+    long_msg = " ".join(msg for msg, expected in CORPUS if expected == "UNKNOWN")
+    for name, detect in (("legado", legacy_detect_intent), ("atual", detect_intent)):
+        started = time.perf_counter()
+        for _ in range(args.rounds):
+            detect(long_msg)
+        per_msg = (time.perf_counter() - started) / args.rounds
+        print(f"{name:>6}: {per_msg * 1e6:6.2f} µs/mensagem longa ({len(long_msg)} caracteres)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark de escrita concorrente no SQLite por perfil de armazenamento.
+
+Simula N escritores concorrentes (workers uvicorn, job de lembretes, webhook)
+fazendo upsert de clientes e gravando estado de conversa, e compara a vazão
+entre os perfis configurados em SQLITE_STORAGE_PROFILES.
+
+Uso:
+    python -m app.scripts.bench_sqlite_writers --writers 8 --ops 300
+"""
+import argparse
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from app.core.config import SQLITE_STORAGE_PROFILES
+from app.repositories.db import ConnectionPool
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS clients (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  client_key TEXT NOT NULL UNIQUE,
+  conversation_state TEXT NOT NULL DEFAULT 'START',
+  conversation_ctx_json TEXT NOT NULL DEFAULT '{}',
+  updated_at TEXT NOT NULL DEFAULT (datetime('now'))
+);
+"""
+
+
+def _writer(pool: ConnectionPool, writer_id: int, ops: int, errors: list) -> None:
+    for i in range(ops):
+        key = f"bench_{writer_id}_{i % 50}"
+        conn = pool.acquire()
+        try:
+            conn.execute("INSERT OR IGNORE INTO clients(client_key) VALUES(?)", (key,))
+            conn.execute(
+                "UPDATE clients SET conversation_state = ?, conversation_ctx_json = ?, updated_at = datetime('now') WHERE client_key = ?",
+                ("WAIT_DATE", '{"barber_id": 1}', key),
+            )
+            conn.commit()
+        except sqlite3.OperationalError as e:
+            errors.append(str(e))
+        finally:
+            pool.release(conn)
+
+
+def run_profile(profile: str, writers: int, ops: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "bench.sqlite3"
+        pool = ConnectionPool(db_path, max_size=writers, timeout=30, profile=profile)
+        conn = pool.acquire()
+        conn.executescript(SCHEMA)
+        conn.commit()
+        pool.release(conn)
+
+        errors: list[str] = []
+        threads = [
+            threading.Thread(target=_writer, args=(pool, w, ops, errors))
+            for w in range(writers)
+        ]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+        pool.close()
+
+    total = writers * ops
+    return {
+        "profile": profile,
+        "writers": writers,
+        "transactions": total,
+        "seconds": round(elapsed, 3),
+        "tx_per_second": round((total - len(errors)) / elapsed, 1),
+        "errors": len(errors),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=300, help="Transações por escritor")
+    parser.add_argument("--profiles", nargs="+", default=list(SQLITE_STORAGE_PROFILES))
+    args = parser.parse_args()
+
+    for profile in args.profiles:
+        r = run_profile(profile, args.writers, args.ops)
+        print(
+            f"{r['profile']:>8}: {r['transactions']} tx com {r['writers']} escritores "
+            f"em {r['seconds']}s -> {r['tx_per_second']} tx/s ({r['errors']} erros)"
+        )
+
+
+if __name__ == "__main__":
+    main()
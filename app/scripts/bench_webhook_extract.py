@@ -0,0 +1,70 @@
+"""
+Benchmark de extração de mensagens de webhooks do WhatsApp em lote.
+
+Gera payloads sintéticos grandes (E entries x C changes x M mensagens, com texto,
+respostas de botões/listas e mídia) e mede o parse JSON + a extração de todas as
+mensagens com `iter_webhook_messages`.
+
+Uso:
+    python -m app.scripts.bench_webhook_extract --entries 10 --changes 5 --messages 20 --rounds 50
+"""
+import argparse
+import json
+import time
+
+from app.integrations.channels.whatsapp import iter_webhook_messages
+
+
+def _message(n: int) -> dict:
+    phone = f"55119{n % 5000:08d}"
+    kind = n % 4
+    if kind == 0:
+        return {"id": f"wamid.{n}", "from": phone, "type": "text", "text": {"body": f"quero agendar {n}"}}
+    if kind == 1:
+        return {"id": f"wamid.{n}", "from": phone, "type": "interactive",
+                "interactive": {"type": "button_reply", "button_reply": {"id": "SLOT_14:00", "title": "14:00"}}}
+    if kind == 2:
+        return {"id": f"wamid.{n}", "from": phone, "type": "interactive",
+                "interactive": {"type": "list_reply", "list_reply": {"id": f"APPT_{n}", "title": "Corte"}}}
+    return {"id": f"wamid.{n}", "from": phone, "type": "image", "image": {"id": f"media.{n}"}}
+
+
+def build_payload(entries: int, changes: int, messages: int) -> dict:
+    n = 0
+    payload = {"object": "whatsapp_business_account", "entry": []}
+    for e in range(entries):
+        entry = {"id": f"waba.{e}", "changes": []}
+        for _ in range(changes):
+            msgs = []
+            for _ in range(messages):
+                msgs.append(_message(n))
+                n += 1
+            entry["changes"].append({"field": "messages", "value": {"messaging_product": "whatsapp", "messages": msgs}})
+        payload["entry"].append(entry)
+    return payload
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=10)
+    parser.add_argument("--changes", type=int, default=5)
+    parser.add_argument("--messages", type=int, default=20, help="Mensagens por change")
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    body = json.dumps(build_payload(args.entries, args.changes, args.messages)).encode()
+    total = args.entries * args.changes * args.messages
+    print(f"payload: {len(body) / 1024:.1f} KB, {total} mensagens")
+
+    started = time.perf_counter()
+    for _ in range(args.rounds):
+        found = list(iter_webhook_messages(json.loads(body)))
+    stream_s = (time.perf_counter() - started) / args.rounds
+
+    processable = sum(1 for m in found if m[3] is not None)
+    print(f"iterador: {stream_s * 1000:.3f} ms/payload, {len(found)} mensagens ({processable} processáveis), "
+          f"{len(found) / stream_s:,.0f} msg/s")
+
+
+if __name__ == "__main__":
+    main()
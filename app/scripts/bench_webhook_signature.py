@@ -0,0 +1,67 @@
+"""
+Microbenchmark da verificação de assinatura + parse do webhook (~100 KB por POST).
+
+Compara o caminho legado (decode para str, re-encode, HMAC, `==` entre hex e
+`json.loads`) com o atual (HMAC sobre os bytes brutos, `hmac.compare_digest` e
+parse único com orjson quando disponível).
+
+Uso:
+    python -m app.scripts.bench_webhook_signature --kb 100 --rounds 2000
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import time
+
+from app.integrations.channels import whatsapp
+from app.integrations.channels.whatsapp import parse_webhook_body, verify_webhook_signature
+from app.scripts.bench_webhook_extract import build_payload
+
+SECRET = "bench_app_secret"
+
+
+def _legacy(body: bytes, signature: str) -> dict:
+    text = body.decode()
+    _, hash_value = signature.split("=")
+    expected = hmac.new(SECRET.encode(), text.encode(), hashlib.sha256).hexdigest()
+    assert hash_value == expected
+    return json.loads(body)
+
+
+def _current(body: bytes, signature: str) -> dict:
+    assert verify_webhook_signature(body, signature, SECRET)
+    return parse_webhook_body(body)
+
+
+def _timeit(func, body: bytes, signature: str, rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        func(body, signature)
+    return (time.perf_counter() - started) / rounds * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--kb", type=int, default=100, help="Tamanho aproximado do payload")
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    entries = 1
+    body = json.dumps(build_payload(entries, 5, 20)).encode()
+    while len(body) < args.kb * 1024:
+        entries += 1
+        body = json.dumps(build_payload(entries, 5, 20)).encode()
+    signature = "sha256=" + hmac.new(SECRET.encode(), body, hashlib.sha256).hexdigest()
+
+    backend = "orjson" if whatsapp.orjson is not None else "json"
+    print(f"payload: {len(body) / 1024:.1f} KB, parser atual: {backend}")
+    for name, func in (("legado", _legacy), ("atual", _current)):
+        print(f"{name:>7}: {_timeit(func, body, signature, args.rounds):8.1f} µs/payload")
+
+    hmac_only = _timeit(lambda b, s: verify_webhook_signature(b, s, SECRET), body, signature, args.rounds)
+    print(f"   hmac: {hmac_only:8.1f} µs/payload (só assinatura, bytes)")
+
+
+if __name__ == "__main__":
+    main()
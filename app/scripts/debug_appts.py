@@ -10,8 +10,8 @@ rows = con.execute(
     SELECT id, barber_id, start_at, end_at, status
     FROM appointments
     WHERE barber_id = ?
-      AND date(start_at) = date(?)
-    ORDER BY start_at
+      AND day = ?
+    ORDER BY start_epoch
     """,
     (BARBER_ID, DATE_ISO),
 ).fetchall()
@@ -0,0 +1,18 @@
+from app.repositories.db import get_conn, init_db, migrate_appointment_time_columns
+
+def run():
+    init_db()
+    conn = get_conn()
+    try:
+        migrate_appointment_time_columns(conn)
+        conn.commit()
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT start_epoch, end_epoch FROM appointments "
+            "WHERE barber_id = 1 AND status = 'scheduled' AND day = '2026-01-20'"
+        ).fetchall()
+        print("OK", [r[3] for r in plan])
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    run()
@@ -1,18 +1,13 @@
-from datetime import datetime, timedelta, time
+from datetime import date, datetime, timedelta, time
 from app.core.config import (
     BUSINESS_START, BUSINESS_END,
-    LUNCH_START, LUNCH_END,
     SLOT_STEP_MINUTES,
 )
-from app.repositories.appointments_repo import list_appointments_for_barber_on_date
-
-def _t(hhmm: str) -> time:
-    h, m = hhmm.split(":")
-    return time(int(h), int(m))
-
-def overlaps(a_start: datetime, a_end: datetime, b_start: datetime, b_end: datetime) -> bool:
-    return a_start < b_end and b_start < a_end
+from app.core.tracing import traced
+from app.repositories.barbers_repo import list_active_barbers
+from app.services.availability_index import availability_index, hhmm_to_minute, is_free
 
+@traced("availability.generate_suggestions")
 def generate_suggestions(
     date_iso: str,
     barber_id: int,
@@ -23,69 +18,115 @@ def generate_suggestions(
 ) -> list[datetime]:
     day = datetime.fromisoformat(date_iso).date()
 
-    business_start_dt = datetime.combine(day, _t(BUSINESS_START), tzinfo=tz)
-    business_end_dt = datetime.combine(day, _t(BUSINESS_END), tzinfo=tz)
-
-    lunch_start_dt = datetime.combine(day, _t(LUNCH_START), tzinfo=tz)
-    lunch_end_dt = datetime.combine(day, _t(LUNCH_END), tzinfo=tz)
-
-    appts = list_appointments_for_barber_on_date(barber_id, date_iso)
-    busy = []
-    for a in appts:
-        busy.append((
-            datetime.fromisoformat(a["start_at"]).replace(tzinfo=tz),
-            datetime.fromisoformat(a["end_at"]).replace(tzinfo=tz),
-        ))
-
-    step = timedelta(minutes=SLOT_STEP_MINUTES)
-    dur = timedelta(minutes=duration_minutes)
-
-    pref_dt = datetime.combine(day, preferred_time, tzinfo=tz)
-
-    def is_valid(start: datetime) -> bool:
-        end = start + dur
-
-        if start < business_start_dt or end > business_end_dt:
-            return False
+    # Ocupação por minuto (expediente e almoço já mascarados)
+    mask = availability_index.get_mask(barber_id, day.isoformat())
 
-        if overlaps(start, end, lunch_start_dt, lunch_end_dt):
-            return False
-
-        for b_start, b_end in busy:
-            if overlaps(start, end, b_start, b_end):
-                return False
-
-        return True
+    step = SLOT_STEP_MINUTES
+    business_start = hhmm_to_minute(BUSINESS_START)
+    business_end = hhmm_to_minute(BUSINESS_END)
+    pref = preferred_time.hour * 60 + preferred_time.minute
 
     suggestions: list[datetime] = []
-    seen: set[str] = set()
+    seen: set[int] = set()
 
-    def add(dt: datetime):
-        key = dt.strftime("%H:%M")
-        if key in seen:
+    def add(minute: int):
+        if minute in seen:
             return
-        if is_valid(dt):
-            suggestions.append(dt)
-            seen.add(key)
+        if is_free(mask, minute, duration_minutes):
+            suggestions.append(
+                datetime.combine(day, time(minute // 60, minute % 60), tzinfo=tz)
+            )
+            seen.add(minute)
 
     # tenta exatamente na ordem:
     # 0, -30, -60, +30, +60, -90, +90, ...
-    add(pref_dt)
+    add(pref)
 
     k = 1
     while len(suggestions) < max_suggestions:
-        minus_dt = pref_dt - (step * k)
-        plus_dt = pref_dt + (step * k)
+        minus = pref - step * k
+        plus = pref + step * k
 
-        add(minus_dt)
+        add(minus)
         if len(suggestions) >= max_suggestions:
             break
 
-        add(plus_dt)
+        add(plus)
 
-        if minus_dt < business_start_dt and (plus_dt + dur) > business_end_dt:
+        if minus < business_start and (plus + duration_minutes) > business_end:
             break
 
         k += 1
 
     return suggestions[:max_suggestions]
+
+
+@traced("availability.search")
+def search_availability(
+    start_date: date,
+    days: int,
+    duration_minutes: int,
+    preferred_time: time,
+    tz,
+    barber_id: int | None = None,
+    limit: int = 5,
+    now: datetime | None = None,
+) -> list[dict]:
+    """
+    Busca os `limit` horários livres mais próximos do horário preferido em um
+    intervalo de dias, para um barbeiro ou para todos os barbeiros ativos.
+
+    A ocupação de todos os (barbeiro, dia) é carregada em lote pelo índice de
+    disponibilidade (no máximo duas consultas, independente do intervalo).
+
+    Args:
+        start_date: Primeiro dia da busca (o horário preferido é relativo a ele)
+        days: Quantidade de dias a partir de start_date
+        duration_minutes: Duração do serviço
+        preferred_time: Horário preferido
+        tz: Timezone da barbearia
+        barber_id: Restringe a um barbeiro (None = qualquer barbeiro ativo)
+        limit: Quantidade máxima de resultados
+        now: Horários anteriores a `now` são ignorados (default: agora)
+
+    Returns:
+        Lista ordenada por distância do horário preferido:
+        [{"barber_id", "barber_name", "start": datetime}, ...]
+    """
+    barbers = list_active_barbers()
+    if barber_id is not None:
+        barbers = [b for b in barbers if int(b["id"]) == int(barber_id)]
+    if not barbers or days <= 0 or limit <= 0:
+        return []
+
+    day_list = [start_date + timedelta(days=i) for i in range(days)]
+    keys = [(int(b["id"]), d.isoformat()) for b in barbers for d in day_list]
+    masks = availability_index.get_masks(keys)
+    names = {int(b["id"]): b["name"] for b in barbers}
+
+    now = now or datetime.now(tz)
+    pref_dt = datetime.combine(start_date, preferred_time, tzinfo=tz)
+    step = SLOT_STEP_MINUTES
+    business_start = hhmm_to_minute(BUSINESS_START)
+    business_end = hhmm_to_minute(BUSINESS_END)
+    # Grade de candidatos alinhada ao horário preferido (ex: 14:10 -> 9:10, 9:40, ...)
+    pref = preferred_time.hour * 60 + preferred_time.minute
+    first = business_start + (pref - business_start) % step
+
+    candidates: list[tuple[float, int, str, datetime]] = []
+    for (b_id, day_iso), mask in masks.items():
+        day = date.fromisoformat(day_iso)
+        for minute in range(first, business_end - duration_minutes + 1, step):
+            if not is_free(mask, minute, duration_minutes):
+                continue
+            start = datetime.combine(day, time(minute // 60, minute % 60), tzinfo=tz)
+            if start < now:
+                continue
+            distance = abs((start - pref_dt).total_seconds())
+            candidates.append((distance, b_id, day_iso, start))
+
+    candidates.sort(key=lambda c: (c[0], c[3], c[1]))
+    return [
+        {"barber_id": b_id, "barber_name": names[b_id], "start": start}
+        for _, b_id, _, start in candidates[:limit]
+    ]
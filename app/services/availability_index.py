@@ -0,0 +1,167 @@
+"""
+Índice de disponibilidade em memória.
+
+Mantém, por (barbeiro, dia), um bytearray de 1440 posições (uma por minuto do dia
+local): 0 = livre, 1 = ocupado. Fora do expediente e o almoço já vêm marcados como
+ocupados, então testar um slot vira uma busca de byte (`mask.find(1, ini, fim)`).
+
+Consistência:
+- create_appointment/cancel_appointment notificam o índice após o COMMIT
+  (atualização incremental da chave afetada)
+- Escritas de outros processos/conexões são detectadas pela versão por
+  (barbeiro, dia) mantida por triggers em appointment_day_versions
+"""
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, time
+
+from app.core.config import (
+    BUSINESS_START, BUSINESS_END,
+    LUNCH_START, LUNCH_END,
+    AVAILABILITY_INDEX_MAX_ENTRIES,
+)
+from app.core.timezone import TZ
+from app.repositories.appointments_repo import (
+    add_appointment_listener,
+    get_day_versions,
+    list_busy_intervals_for_days,
+)
+
+MINUTES_PER_DAY = 24 * 60
+FREE = 0
+BUSY = 1
+
+
+def hhmm_to_minute(hhmm: str) -> int:
+    h, m = hhmm.split(":")
+    return int(h) * 60 + int(m)
+
+
+def _base_mask() -> bytearray:
+    """Dia com tudo ocupado exceto o expediente, e almoço ocupado."""
+    mask = bytearray([BUSY]) * MINUTES_PER_DAY
+    start, end = hhmm_to_minute(BUSINESS_START), hhmm_to_minute(BUSINESS_END)
+    mask[start:end] = bytes(end - start)
+    lunch_start, lunch_end = hhmm_to_minute(LUNCH_START), hhmm_to_minute(LUNCH_END)
+    mask[lunch_start:lunch_end] = bytes([BUSY]) * (lunch_end - lunch_start)
+    return mask
+
+
+class _Entry:
+    __slots__ = ("mask", "version")
+
+    def __init__(self, mask: bytearray, version: int):
+        self.mask = mask
+        self.version = version
+
+
+class AvailabilityIndex:
+    """Cache LRU de ocupação por minuto, chaveado por (barber_id, day ISO)."""
+
+    def __init__(self, tz=TZ, max_entries: int = AVAILABILITY_INDEX_MAX_ENTRIES):
+        self.tz = tz
+        self.max_entries = max_entries
+        self._base = _base_mask()
+        self._entries: OrderedDict[tuple[int, str], _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _day_start_epoch(self, day: str) -> int:
+        return int(datetime.combine(date.fromisoformat(day), time.min, tzinfo=self.tz).timestamp())
+
+    def _build(self, day: str, intervals: list[tuple[int, int]]) -> bytearray:
+        mask = bytearray(self._base)
+        self._mark(mask, day, intervals, BUSY)
+        return mask
+
+    def _mark(self, mask: bytearray, day: str, intervals: list[tuple[int, int]], value: int) -> None:
+        day_start = self._day_start_epoch(day)
+        for start_epoch, end_epoch in intervals:
+            first = max(0, (start_epoch - day_start) // 60)
+            last = min(MINUTES_PER_DAY, -(-(end_epoch - day_start) // 60))
+            if last > first:
+                mask[first:last] = bytes([value]) * (last - first)
+
+    def get_masks(self, keys: list[tuple[int, str]]) -> dict[tuple[int, str], bytes]:
+        """
+        Máscaras de ocupação para várias chaves.
+
+        Faz no máximo duas consultas: as versões de todas as chaves e, para as
+        ausentes/desatualizadas, os intervalos ocupados em lote.
+        """
+        keys = list(dict.fromkeys(keys))
+        versions = get_day_versions(keys)
+
+        result: dict[tuple[int, str], bytes] = {}
+        stale: list[tuple[int, str]] = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry.version == versions[key]:
+                    self._entries.move_to_end(key)
+                    result[key] = bytes(entry.mask)
+                    self.hits += 1
+                else:
+                    stale.append(key)
+                    self.misses += 1
+
+        if stale:
+            busy = list_busy_intervals_for_days(
+                sorted({k[0] for k in stale}), sorted({k[1] for k in stale})
+            )
+            with self._lock:
+                for key in stale:
+                    mask = self._build(key[1], busy.get(key, []))
+                    self._entries[key] = _Entry(mask, versions[key])
+                    self._entries.move_to_end(key)
+                    result[key] = bytes(mask)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+        return result
+
+    def get_mask(self, barber_id: int, day: str) -> bytes:
+        """Máscara de ocupação de um barbeiro em um dia (YYYY-MM-DD)."""
+        key = (barber_id, day[:10])
+        return self.get_masks([key])[key]
+
+    def apply_change(self, change: dict) -> None:
+        """
+        Atualiza incrementalmente a chave afetada por um create/cancel já commitado.
+
+        Só aplica o delta se a entrada estava exatamente uma versão atrás
+        (nenhuma outra escrita no meio); caso contrário, descarta a entrada.
+        """
+        key = (int(change["barber_id"]), change["day"])
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            if change["event"] == "created" and entry.version == change["version"] - 1:
+                self._mark(entry.mask, key[1], [(change["start_epoch"], change["end_epoch"])], BUSY)
+                entry.version = change["version"]
+            else:
+                # Cancelamento: liberar minutos poderia apagar outro agendamento sobreposto;
+                # a entrada é reconstruída na próxima consulta.
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+def is_free(mask: bytes, start_minute: int, duration_minutes: int) -> bool:
+    """True se [start_minute, start_minute + duração) está livre na máscara."""
+    end = start_minute + duration_minutes
+    if start_minute < 0 or end > MINUTES_PER_DAY:
+        return False
+    return mask.find(BUSY, start_minute, end) == -1
+
+
+availability_index = AvailabilityIndex()
+add_appointment_listener(availability_index.apply_change)
@@ -1,814 +1,1105 @@
+import time
+from dataclasses import dataclass
 from datetime import datetime, timedelta
+from typing import Callable
 from zoneinfo import ZoneInfo
 
-from app.services.nlu import detect_intent
-from app.repositories.barbers_repo import list_active_barbers, find_barber_by_name, find_barber_by_id
+from app.services.nlu_engine import NLUResult, get_nlu_engine
+from app.repositories.barbers_repo import list_active_barbers, find_barber_by_name, find_barber_by_id, barber_short_name
 from app.repositories.services_repo import list_active_services, find_service_by_name, find_service_by_id
 from app.repositories.appointments_repo import create_appointment, list_appointments_for_client, cancel_appointment
 from app.repositories.clients_repo import get_client_by_key
 from app.domain.enums import State
 from app.domain.models import ConversationContext
 from app.services.parsers import parse_br_date, parse_br_time
-from app.services.availability import generate_suggestions
-from app.core.logging import get_logger
+from app.services.availability import generate_suggestions, search_availability
+from app.core.config import NEXT_FREE_SEARCH_DAYS
+from app.core.logging import get_logger, kv
+from app.core.metrics import histogram
+from app.core.tracing import add_span
 
 logger = get_logger(__name__)
 
+# Limite de caracteres do título de botão de resposta do WhatsApp
+BUTTON_LABEL_MAX = 20
 
-def handle_message(current_state: str, ctx: dict, message: str) -> tuple[str, str, dict, list]:
+
+def analyze_message(message: str) -> NLUResult:
+    """Intent + entidades pelo motor de NLU configurado (resultado em cache)."""
+    return get_nlu_engine().analyze(message)
+
+
+def detect_intent(message: str) -> str:
+    """Intent da mensagem pelo motor de NLU configurado (resultado em cache)."""
+    return analyze_message(message).intent
+
+
+def _next_free_with_anyone_buttons(ctx: ConversationContext, t, tz) -> list[dict]:
+    """
+    Botões com os próximos horários livres com qualquer barbeiro, a partir do dia
+    do contexto. Id: ANY_<barber_id>_<YYYY-MM-DD>_<HH:MM>.
+    """
+    results = search_availability(
+        start_date=datetime.fromisoformat(ctx.date).date(),
+        days=NEXT_FREE_SEARCH_DAYS,
+        duration_minutes=int(ctx.service_duration_minutes),
+        preferred_time=t,
+        tz=tz,
+        limit=3,
+    )
+    # Rótulo cabe nos 20 caracteres do botão do WhatsApp: nome curto sem ambiguidade
+    # e a data só quando os horários caem em dias diferentes
+    same_day = len({r["start"].date() for r in results}) == 1
+    buttons = []
+    for r in results:
+        when = r["start"].strftime("%H:%M" if same_day else "%d/%m %H:%M")
+        name = barber_short_name(r["barber_id"]) or r["barber_name"]
+        label = f"{when} · {name}"
+        if len(label) > BUTTON_LABEL_MAX:
+            label = f"{when} {name}"
+        buttons.append({
+            "id": f"ANY_{r['barber_id']}_{r['start'].date().isoformat()}_{r['start'].strftime('%H:%M')}",
+            "label": label,
+        })
+    return buttons
+
+
+def _parse_any_slot(msg: str) -> tuple[int, str, str] | None:
+    """Interpreta ANY_<barber_id>_<YYYY-MM-DD>_<HH:MM> -> (barber_id, date_iso, HH:MM)."""
+    parts = msg.strip().split("_")
+    if len(parts) != 4 or parts[0].upper() != "ANY":
+        return None
+    try:
+        barber_id = int(parts[1])
+        datetime.fromisoformat(parts[2])
+    except ValueError:
+        return None
+    return barber_id, parts[2], parts[3]
+
+
+# Botões de sim/não enviados pelo bot: <PREFIXO>_YES / <PREFIXO>_NO
+_YES_NO_BUTTONS = ("CONFIRM", "REMARK", "CANCEL")
+_BUTTON_ANSWERS = {"YES": "sim", "NO": "não"}
+
+
+def _button_text(msg: str) -> str:
+    """
+    Id de um botão enviado pelo bot -> texto que os handlers entendem.
+
+    O WhatsApp devolve o id do botão clicado, não o rótulo:
+    "SLOT_14:00" -> "14:00", "CONFIRM_YES" -> "sim", "CANCEL_NO" -> "não".
+    Outros textos (e BARBER_/SERVICE_/APPT_/ANY_, tratados nos handlers) passam inalterados.
+    """
+    prefix, sep, value = msg.partition("_")
+    if not sep:
+        return msg
+    prefix = prefix.upper()
+    if prefix == "SLOT" and parse_br_time(value):
+        return value
+    if prefix in _YES_NO_BUTTONS and value.upper() in _BUTTON_ANSWERS:
+        return _BUTTON_ANSWERS[value.upper()]
+    return msg
+
+
+def _button_row(msg: str, prefix: str, find_by_id: Callable[[int], dict | None]) -> dict | None:
+    """Linha do catálogo de um botão "<PREFIXO>_<id>" (ex: BARBER_2), ou None."""
+    head, sep, value = msg.partition("_")
+    if not sep or head.upper() != prefix or not value.isdigit():
+        return None
+    return find_by_id(int(value))
+
+
+# (reply, next_state, next_ctx_dict, buttons)
+Reply = tuple[str, str, dict, list]
+
+
+@dataclass(frozen=True)
+class StateHandler:
+    """
+    Handler de um estado da conversa.
+
+    needs_intent: se False, o dispatcher não roda o NLU antes do handler
+    (estados que só interpretam horário/data/ids de botão). O handler pode
+    chamar `detect_intent` sob demanda nos caminhos de fallback.
+    """
+    state: str
+    func: Callable[[ConversationContext, str, str | None], Reply]
+    needs_intent: bool = True
+
+
+# Registro estado -> handler (dispatch O(1))
+HANDLERS: dict[str, StateHandler] = {}
+
+# Hooks chamados com (state, elapsed_seconds) após cada handler
+_timing_hooks: list[Callable[[str, float], None]] = []
+
+
+def state_handler(state: str, needs_intent: bool = True):
+    """Decorator que registra a função como handler do estado."""
+    def register(func):
+        HANDLERS[state] = StateHandler(state=state, func=func, needs_intent=needs_intent)
+        return func
+    return register
+
+
+def add_state_timing_hook(hook: Callable[[str, float], None]) -> None:
+    """Registra um hook de tempo por estado (ex: métricas de latência)."""
+    if hook not in _timing_hooks:
+        _timing_hooks.append(hook)
+
+
+def remove_state_timing_hook(hook: Callable[[str, float], None]) -> None:
+    if hook in _timing_hooks:
+        _timing_hooks.remove(hook)
+
+
+STATE_HANDLER_SECONDS = histogram(
+    "barbershop_state_handler_duration_seconds",
+    "Duração do handler de cada estado em handle_message",
+    ("state",),
+)
+
+add_state_timing_hook(lambda state, elapsed: STATE_HANDLER_SECONDS.observe(elapsed, state))
+# Handler de cada estado como etapa do trace da requisição
+add_state_timing_hook(lambda state, elapsed: add_span(f"state.{state}", elapsed))
+
+
+def handle_message(current_state: str, ctx: dict, message: str) -> Reply:
     """
     Máquina de estados de conversação.
 
     Args:
         current_state: Estado atual (START, WAIT_BARBER, etc)
-        ctx_dict: Contexto em formato dict (será convertido para ConversationContext)
+        ctx: Contexto em formato dict (será convertido para ConversationContext)
         message: Mensagem do usuário
 
     Returns:
         (reply: str, next_state: str, next_ctx_dict: dict, buttons: list[dict])
     """
-    msg = message.strip()
-    logger.debug(f"State: {current_state} | Input: {msg}")
+    msg = _button_text(message.strip())
+    logger.debug("Input: %s", msg, extra=kv(state=current_state))
+
+    handler = HANDLERS.get(current_state)
+    if handler is None:
+        # === Estado desconhecido ===
+        return (
+            "Algo deu errado. Vamos começar de novo!",
+            State.START,
+            ConversationContext().to_dict(),
+            [],
+        )
 
     # Reconstrói contexto tipado
-    ctx = ConversationContext.from_dict(ctx)
+    context = ConversationContext.from_dict(ctx)
 
-    # Detecta intent genérico (pode ser usado em qualquer estado)
-    intent = detect_intent(msg)
-    logger.debug(f"Detected intent: {intent}")
+    # Detecta intent só para estados que precisam dela
+    intent = detect_intent(msg) if handler.needs_intent else None
+    if intent is not None:
+        logger.debug("Detected intent: %s", intent)
 
-    # === START ===
-    if current_state == State.START:
-        if intent == "GREETING":
-            return (
-                "Olá! 👋 Bem-vindo à barbearia! Posso te ajudar a agendar, remarcar ou cancelar um horário.",
-                State.START,
-                ctx.to_dict(),
-                [],
-            )
+    started = time.perf_counter()
+    try:
+        return handler.func(context, msg, intent)
+    finally:
+        elapsed = time.perf_counter() - started
+        for hook in _timing_hooks:
+            try:
+                hook(current_state, elapsed)
+            except Exception as e:
+                logger.error("Erro em hook de timing: %s", e)
 
-        if intent == "BOOK_APPOINTMENT":
-            barbers = list_active_barbers()
-            return (
-                "Perfeito! Com qual barbeiro você prefere agendar?",
-                State.WAIT_BARBER,
-                ctx.to_dict(),
-                [{"id": f"BARBER_{b['id']}", "label": b["name"]} for b in barbers],
-            )
 
-        if intent in ["CANCEL_APPOINTMENT", "REMARK_APPOINTMENT"]:
-            # Requer client_key para identificar cliente
-            client_key = getattr(ctx, "client_key", None) or (ctx.to_dict().get("client_key"))
-            if not client_key:
-                return (
-                    "Não consegui identificar você. Pode tentar novamente?",
-                    State.START,
-                    ctx.to_dict(),
-                    [],
-                )
+def _fill_booking_slots(ctx: ConversationContext, analysis: NLUResult) -> list[str]:
+    """
+    Preenche no contexto todos os dados de agendamento presentes na mensagem.
 
-            client_row = get_client_by_key(client_key)
-            if not client_row:
-                return (
-                    "Não encontrei seu cadastro. Vamos começar do zero?",
-                    State.START,
-                    ConversationContext().to_dict(),
-                    [],
-                )
+    Returns:
+        Slots preenchidos, em ordem: "barber", "service", "date", "time"
+    """
+    filled = []
+    if analysis.barber_id:
+        ctx.barber_id = analysis.barber_id
+        ctx.barber_name = analysis.barber_name
+        filled.append("barber")
+    if analysis.service_id:
+        service = find_service_by_id(analysis.service_id)
+        if service:
+            ctx.service_id = service["id"]
+            ctx.service_name = service["name"]
+            ctx.service_duration_minutes = service["duration_minutes"]
+            filled.append("service")
+    if analysis.date:
+        ctx.date = analysis.date.isoformat()
+        filled.append("date")
+    if analysis.time:
+        ctx.time_pref = analysis.time.strftime("%H:%M")
+        filled.append("time")
+    return filled
+
+
+def _booking_ack(ctx: ConversationContext, filled: list[str]) -> str:
+    """Confirmação do que acabou de ser preenchido (mensagens de um slot mantêm o texto de sempre)."""
+    if filled == ["barber"]:
+        return f"Show! {ctx.barber_name} escolhido 👍"
+    if filled == ["service"]:
+        return f"Fechado! Serviço: {ctx.service_name} ({ctx.service_duration_minutes}min)."
+    if filled == ["date"]:
+        return f"Show! Dia {datetime.fromisoformat(ctx.date).strftime('%d/%m')}."
+    labels = {
+        "barber": ctx.barber_name,
+        "service": ctx.service_name,
+        "date": ctx.date and datetime.fromisoformat(ctx.date).strftime("%d/%m"),
+        "time": ctx.time_pref,
+    }
+    return "Anotado 👍 " + ", ".join(labels[slot] for slot in filled) + "."
 
-            appts = list_appointments_for_client(int(client_row["id"]), status="scheduled")
-            # Filtra próximos (>= agora) quando possível
-            now_iso = datetime.now(ZoneInfo("America/Sao_Paulo")).isoformat()
-            upcoming = [a for a in appts if a["start_at"] >= now_iso]
-            if not upcoming:
-                return (
-                    "Você não tem agendamentos ativos para alterar/cancelar.",
-                    State.START,
-                    ctx.to_dict(),
-                    [],
-                )
-
-            # Botões de escolha quando > 1
-            def _label(a: dict) -> str:
-                # Monta label com data/hora e barbeiro
-                bname = None
-                try:
-                    b = find_barber_by_id(int(a["barber_id"]))
-                    bname = b["name"] if b else None
-                except Exception:
-                    bname = None
-                dt = a["start_at"][11:16]  # HH:MM
-                d = a["start_at"][8:10] + "/" + a["start_at"][5:7]
-                return f"{d} {dt}" + (f" · {bname}" if bname else "")
-
-            if len(upcoming) > 1:
-                buttons = [{"id": f"APPT_{a['id']}", "label": _label(a)} for a in upcoming]
-                ctx.operation = "cancel" if intent == "CANCEL_APPOINTMENT" else "remark"
-                return (
-                    "Qual agendamento você quer alterar?",
-                    State.WAIT_APPOINTMENT_PICK,
-                    ctx.to_dict(),
-                    buttons,
-                )
-
-            # Se houver só um, segue direto
-            target = upcoming[0]
-            if intent == "CANCEL_APPOINTMENT":
-                ctx.operation = "cancel"
-                ctx.cancel_appt_id = int(target["id"])
-                return (
-                    f"Confirmar cancelamento do horário de {target['start_at'][8:10]}/{target['start_at'][5:7]} às {target['start_at'][11:16]}?",
-                    State.WAIT_CANCEL_CONFIRMATION,
-                    ctx.to_dict(),
-                    [
-                        {"id": "CANCEL_YES", "label": "Sim, cancelar"},
-                        {"id": "CANCEL_NO", "label": "Não, voltar"},
-                    ],
-                )
-            else:
-                ctx.operation = "remark"
-                ctx.remark_appt_id = int(target["id"])
-                # Prefill barber/service
-                ctx.barber_id = int(target["barber_id"])
-                b = find_barber_by_id(ctx.barber_id)
-                ctx.barber_name = b["name"] if b else None
-                ctx.service_id = int(target["service_id"])
-                s = find_service_by_id(ctx.service_id)
-                if s:
-                    ctx.service_name = s["name"]
-                    ctx.service_duration_minutes = int(s["duration_minutes"])
-                return (
-                    "Certo, vamos remarcar. Me diga o novo dia (ex: 21/01).",
-                    State.WAIT_REMARK_DATE,
-                    ctx.to_dict(),
-                    [],
-                )
 
+def _continue_booking(ctx: ConversationContext, ack: str) -> Reply:
+    """
+    Pergunta o próximo dado que falta para agendar, pulando os já preenchidos.
+
+    Com barbeiro, serviço, data e horário, segue direto para as sugestões de
+    horário (mesmo caminho de WAIT_TIME_PREF).
+    """
+    if not ctx.barber_id:
+        barbers = list_active_barbers()
         return (
-            "Não entendi muito bem 😅\nVocê pode dizer se quer agendar, remarcar ou cancelar?",
+            f"{ack} Com qual barbeiro você prefere agendar?",
+            State.WAIT_BARBER,
+            ctx.to_dict(),
+            [{"id": f"BARBER_{b['id']}", "label": b["name"]} for b in barbers],
+        )
+    if not ctx.service_id:
+        services = list_active_services()
+        return (
+            f"{ack}\nAgora, qual serviço você deseja?",
+            State.WAIT_SERVICE,
+            ctx.to_dict(),
+            [{"id": f"SERVICE_{s['id']}", "label": f"{s['name']} ({s['duration_minutes']}min)"} for s in services],
+        )
+    if not ctx.date:
+        return (f"{ack}\nAgora me diga o dia que você quer (ex: 20/01).", State.WAIT_DATE, ctx.to_dict(), [])
+    if not ctx.time_pref:
+        return (f"{ack}\nAgora me diga um horário aproximado (ex: 14:00).", State.WAIT_TIME_PREF, ctx.to_dict(), [])
+
+    reply, next_state, next_ctx, buttons = _handle_wait_time_pref(ctx, ctx.time_pref, None)
+    return f"{ack}\n{reply}", next_state, next_ctx, buttons
+
+
+# === Handlers por estado ===
+
+@state_handler(State.START)
+def _handle_start(ctx: ConversationContext, msg: str, intent: str | None) -> Reply:
+    analysis = analyze_message(msg)
+    # Sem intent de agendar, só um pedido com serviço + outro dado vira agendamento:
+    # "oi, aqui é o Carlos", "obrigado, até amanhã às 10" e "faz barba?" não
+    looks_like_booking = bool(analysis.service_id) and any(
+        (analysis.barber_id, analysis.date, analysis.time)
+    )
+    if intent == "BOOK_APPOINTMENT" or (intent in (None, "UNKNOWN", "GREETING") and looks_like_booking):
+        # "corte com o Carlos amanhã 14h": preenche tudo e pula o que já veio
+        filled = _fill_booking_slots(ctx, analysis)
+        return _continue_booking(ctx, _booking_ack(ctx, filled) if filled else "Perfeito!")
+
+    if intent == "GREETING":
+        return (
+            "Olá! 👋 Bem-vindo à barbearia! Posso te ajudar a agendar, remarcar ou cancelar um horário.",
             State.START,
             ctx.to_dict(),
             [],
         )
 
-    # === WAIT_BARBER ===
-    if current_state == State.WAIT_BARBER:
-        # Permite atalho para voltar
-        if intent == "CANCEL_APPOINTMENT":
+    if intent in ["CANCEL_APPOINTMENT", "REMARK_APPOINTMENT"]:
+        # Requer client_key para identificar cliente
+        client_key = getattr(ctx, "client_key", None) or (ctx.to_dict().get("client_key"))
+        if not client_key:
             return (
-                "Tudo bem, voltamos ao início! 👋",
+                "Não consegui identificar você. Pode tentar novamente?",
+                State.START,
+                ctx.to_dict(),
+                [],
+            )
+
+        client_row = get_client_by_key(client_key)
+        if not client_row:
+            return (
+                "Não encontrei seu cadastro. Vamos começar do zero?",
                 State.START,
                 ConversationContext().to_dict(),
                 [],
             )
 
-        barber = find_barber_by_name(msg)
-        if not barber:
-            barbers = list_active_barbers()
+        appts = list_appointments_for_client(int(client_row["id"]), status="scheduled")
+        # Filtra próximos (>= agora) quando possível
+        now_iso = datetime.now(ZoneInfo("America/Sao_Paulo")).isoformat()
+        upcoming = [a for a in appts if a["start_at"] >= now_iso]
+        if not upcoming:
             return (
-                "Não encontrei esse barbeiro 😕\nEscolha uma das opções abaixo:",
-                State.WAIT_BARBER,
+                "Você não tem agendamentos ativos para alterar/cancelar.",
+                State.START,
                 ctx.to_dict(),
-                [{"id": f"BARBER_{b['id']}", "label": b["name"]} for b in barbers],
+                [],
             )
 
+        # Botões de escolha quando > 1
+        def _label(a: dict) -> str:
+            # Monta label com data/hora e barbeiro
+            bname = None
+            try:
+                b = find_barber_by_id(int(a["barber_id"]))
+                bname = b["name"] if b else None
+            except Exception:
+                bname = None
+            dt = a["start_at"][11:16]  # HH:MM
+            d = a["start_at"][8:10] + "/" + a["start_at"][5:7]
+            return f"{d} {dt}" + (f" · {bname}" if bname else "")
+
+        if len(upcoming) > 1:
+            buttons = [{"id": f"APPT_{a['id']}", "label": _label(a)} for a in upcoming]
+            ctx.operation = "cancel" if intent == "CANCEL_APPOINTMENT" else "remark"
+            return (
+                "Qual agendamento você quer alterar?",
+                State.WAIT_APPOINTMENT_PICK,
+                ctx.to_dict(),
+                buttons,
+            )
+
+        # Se houver só um, segue direto
+        target = upcoming[0]
+        if intent == "CANCEL_APPOINTMENT":
+            ctx.operation = "cancel"
+            ctx.cancel_appt_id = int(target["id"])
+            return (
+                f"Confirmar cancelamento do horário de {target['start_at'][8:10]}/{target['start_at'][5:7]} às {target['start_at'][11:16]}?",
+                State.WAIT_CANCEL_CONFIRMATION,
+                ctx.to_dict(),
+                [
+                    {"id": "CANCEL_YES", "label": "Sim, cancelar"},
+                    {"id": "CANCEL_NO", "label": "Não, voltar"},
+                ],
+            )
+        else:
+            ctx.operation = "remark"
+            ctx.remark_appt_id = int(target["id"])
+            # Prefill barber/service
+            ctx.barber_id = int(target["barber_id"])
+            b = find_barber_by_id(ctx.barber_id)
+            ctx.barber_name = b["name"] if b else None
+            ctx.service_id = int(target["service_id"])
+            s = find_service_by_id(ctx.service_id)
+            if s:
+                ctx.service_name = s["name"]
+                ctx.service_duration_minutes = int(s["duration_minutes"])
+            return (
+                "Certo, vamos remarcar. Me diga o novo dia (ex: 21/01).",
+                State.WAIT_REMARK_DATE,
+                ctx.to_dict(),
+                [],
+            )
+
+    return (
+        "Não entendi muito bem 😅\nVocê pode dizer se quer agendar, remarcar ou cancelar?",
+        State.START,
+        ctx.to_dict(),
+        [],
+    )
+
+
+@state_handler(State.WAIT_BARBER)
+def _handle_wait_barber(ctx: ConversationContext, msg: str, intent: str | None) -> Reply:
+    # Permite atalho para voltar
+    if intent == "CANCEL_APPOINTMENT":
+        return (
+            "Tudo bem, voltamos ao início! 👋",
+            State.START,
+            ConversationContext().to_dict(),
+            [],
+        )
+
+    barber = _button_row(msg, "BARBER", find_barber_by_id) or find_barber_by_name(msg)
+    analysis = analyze_message(msg)
+    if not barber and not analysis.barber_id:
+        barbers = list_active_barbers()
+        return (
+            "Não encontrei esse barbeiro 😕\nEscolha uma das opções abaixo:",
+            State.WAIT_BARBER,
+            ctx.to_dict(),
+            [{"id": f"BARBER_{b['id']}", "label": b["name"]} for b in barbers],
+        )
+
+    # A mesma mensagem pode trazer serviço, data e horário ("Carlos, corte amanhã 14h")
+    filled = _fill_booking_slots(ctx, analysis)
+    if barber:
         ctx.barber_id = barber["id"]
         ctx.barber_name = barber["name"]
+        if "barber" not in filled:
+            filled.insert(0, "barber")
+    return _continue_booking(ctx, _booking_ack(ctx, filled))
+
+
+@state_handler(State.WAIT_SERVICE)
+def _handle_wait_service(ctx: ConversationContext, msg: str, intent: str | None) -> Reply:
+    if intent == "CANCEL_APPOINTMENT":
+        return (
+            "Tudo bem, voltamos ao início! 👋",
+            State.START,
+            ConversationContext().to_dict(),
+            [],
+        )
 
+    service = _button_row(msg, "SERVICE", find_service_by_id) or find_service_by_name(msg)
+    analysis = analyze_message(msg)
+    if not service and not analysis.service_id:
         services = list_active_services()
         return (
-            f"Show! {barber['name']} escolhido 👍\nAgora, qual serviço você deseja?",
+            "Qual serviço você deseja?",
             State.WAIT_SERVICE,
             ctx.to_dict(),
             [{"id": f"SERVICE_{s['id']}", "label": f"{s['name']} ({s['duration_minutes']}min)"} for s in services],
         )
 
-    # === WAIT_SERVICE ===
-    if current_state == State.WAIT_SERVICE:
-        if intent == "CANCEL_APPOINTMENT":
-            return (
-                "Tudo bem, voltamos ao início! 👋",
-                State.START,
-                ConversationContext().to_dict(),
-                [],
-            )
-
-        service = find_service_by_name(msg)
-        if not service:
-            services = list_active_services()
-            return (
-                "Qual serviço você deseja?",
-                State.WAIT_SERVICE,
-                ctx.to_dict(),
-                [{"id": f"SERVICE_{s['id']}", "label": f"{s['name']} ({s['duration_minutes']}min)"} for s in services],
-            )
-
+    filled = _fill_booking_slots(ctx, analysis)
+    if service:
         ctx.service_id = service["id"]
         ctx.service_name = service["name"]
         ctx.service_duration_minutes = service["duration_minutes"]
+        if "service" not in filled:
+            filled.insert(len([slot for slot in filled if slot == "barber"]), "service")
+    return _continue_booking(ctx, _booking_ack(ctx, filled))
+
 
+@state_handler(State.WAIT_DATE, needs_intent=False)
+def _handle_wait_date(ctx: ConversationContext, msg: str, intent: str | None) -> Reply:
+    d = parse_br_date(msg)
+    if d:
+        ctx.date = d.isoformat()  # "YYYY-MM-DD"
+        return _continue_booking(ctx, _booking_ack(ctx, ["date"]))
+
+    # Data no meio do texto ou relativa ("amanhã às 14h", "sexta")
+    analysis = analyze_message(msg)
+    if analysis.date:
+        return _continue_booking(ctx, _booking_ack(ctx, _fill_booking_slots(ctx, analysis)))
+
+    # Não é data/horário: só então roda o NLU para ver se quer voltar
+    if detect_intent(msg) == "CANCEL_APPOINTMENT":
         return (
-            f"Fechado! Serviço: {service['name']} ({service['duration_minutes']}min).\nAgora me diga o dia que você quer (ex: 20/01).",
-            State.WAIT_DATE,
+            "Tudo bem, voltamos ao início! 👋",
+            State.START,
+            ConversationContext().to_dict(),
+            [],
+        )
+    return (
+        "Não consegui entender a data 😅\nMe diga assim: 20/01 (ou 20/01/2026).",
+        State.WAIT_DATE,
+        ctx.to_dict(),
+        [],
+    )
+
+
+@state_handler(State.WAIT_REMARK_DATE, needs_intent=False)
+def _handle_wait_remark_date(ctx: ConversationContext, msg: str, intent: str | None) -> Reply:
+    d = parse_br_date(msg)
+    if not d:
+        return (
+            "Não consegui entender a data 😅\nMe diga assim: 20/01 (ou 20/01/2026).",
+            State.WAIT_REMARK_DATE,
             ctx.to_dict(),
             [],
         )
+    ctx.date = d.isoformat()
+    return (
+        f"Show! Dia {d.strftime('%d/%m')}\nAgora me diga um horário aproximado (ex: 14:00).",
+        State.WAIT_REMARK_TIME_PREF,
+        ctx.to_dict(),
+        [],
+    )
 
-    # === WAIT_DATE ===
-    if current_state == State.WAIT_DATE:
-        if intent == "CANCEL_APPOINTMENT":
+
+@state_handler(State.WAIT_TIME_PREF, needs_intent=False)
+def _handle_wait_time_pref(ctx: ConversationContext, msg: str, intent: str | None) -> Reply:
+    # Suporta clique de botão (id: SLOT_HH:MM) ou entrada livre "HH:MM"
+    parsed_msg = msg.strip()
+    if parsed_msg.upper().startswith("SLOT_"):
+        parsed_msg = parsed_msg.split("_", 1)[1]
+    t = parse_br_time(parsed_msg)
+    if not t:
+        # Horário no meio do texto ("pode ser às 15h?"), talvez com outro dia
+        analysis = analyze_message(msg)
+        if analysis.time:
+            t = analysis.time
+            if analysis.date:
+                ctx.date = analysis.date.isoformat()
+    if not t:
+        # Não é data/horário: só então roda o NLU para ver se quer voltar
+        if detect_intent(msg) == "CANCEL_APPOINTMENT":
             return (
                 "Tudo bem, voltamos ao início! 👋",
                 State.START,
                 ConversationContext().to_dict(),
                 [],
             )
-
-        d = parse_br_date(msg)
-        if not d:
-            return (
-                "Não consegui entender a data 😅\nMe diga assim: 20/01 (ou 20/01/2026).",
-                State.WAIT_DATE,
-                ctx.to_dict(),
-                [],
-            )
-
-        ctx.date = d.isoformat()  # "YYYY-MM-DD"
         return (
-            f"Show! Dia {d.strftime('%d/%m')}.\nAgora me diga um horário aproximado (ex: 14:00).",
+            "Não entendi o horário 😅\nMe diga assim: 14:00 (ou 14h).",
             State.WAIT_TIME_PREF,
             ctx.to_dict(),
             [],
         )
 
-    # === WAIT_REMARK_DATE ===
-    if current_state == State.WAIT_REMARK_DATE:
-        d = parse_br_date(msg)
-        if not d:
+    # Valida contexto
+    if not ctx.date or not ctx.barber_id or not ctx.service_duration_minutes:
+        return (
+            "Ops, perdi o contexto do agendamento. Vamos começar de novo.",
+            State.START,
+            ConversationContext().to_dict(),
+            [],
+        )
+
+    # Gera sugestões de horários
+    tz = ZoneInfo("America/Sao_Paulo")
+    suggestions = generate_suggestions(
+        date_iso=ctx.date,
+        barber_id=int(ctx.barber_id),
+        duration_minutes=int(ctx.service_duration_minutes),
+        preferred_time=t,
+        tz=tz,
+        max_suggestions=3,
+    )
+
+    if not suggestions:
+        # Oferece, no mesmo turno, os próximos horários livres com qualquer barbeiro
+        ctx.time_pref = t.strftime("%H:%M")
+        any_buttons = _next_free_with_anyone_buttons(ctx, t, tz)
+        if any_buttons:
             return (
-                "Não consegui entender a data 😅\nMe diga assim: 20/01 (ou 20/01/2026).",
-                State.WAIT_REMARK_DATE,
+                "Não achei horários disponíveis nesse dia 😕\nEsses são os próximos livres com qualquer barbeiro:",
+                State.WAIT_SLOT_PICK,
                 ctx.to_dict(),
-                [],
+                any_buttons,
             )
-        ctx.date = d.isoformat()
         return (
-            f"Show! Dia {d.strftime('%d/%m')}\nAgora me diga um horário aproximado (ex: 14:00).",
+            "Não achei horários disponíveis nesse dia 😕\nQuer tentar outro dia? (ex: 21/01)",
+            State.WAIT_DATE,
+            ctx.to_dict(),
+            [],
+        )
+
+    # Verifica se o horário exato solicitado está disponível (é o primeiro sugerido)
+    ctx.time_pref = t.strftime("%H:%M")
+    date_obj = datetime.fromisoformat(ctx.date).date()
+    chosen_start = datetime.combine(date_obj, t, tzinfo=tz)
+
+    if suggestions[0].strftime("%H:%M") == chosen_start.strftime("%H:%M"):
+        # Horário exato disponível! Vai direto pra confirmação
+        ctx.selected_slot = t.strftime("%H:%M")
+        return (
+            f"Perfeito! Vou agendar para {ctx.barber_name}, {ctx.service_name} no dia {ctx.date} às {ctx.selected_slot}.\nConfirma? (sim/não)",
+            State.WAIT_CONFIRMATION,
+            ctx.to_dict(),
+            [
+                {"id": "CONFIRM_YES", "label": "Sim, confirmar"},
+                {"id": "CONFIRM_NO", "label": "Não, voltar"},
+            ],
+        )
+
+    # Horário não está disponível, oferece aproximados
+    buttons = [
+        {"id": f"SLOT_{s.strftime('%H:%M')}", "label": s.strftime("%H:%M")}
+        for s in suggestions
+    ]
+
+    return (
+        "Esse horário não está disponível. Posso sugerir estes:",
+        State.WAIT_SLOT_PICK,
+        ctx.to_dict(),
+        buttons,
+    )
+
+
+@state_handler(State.WAIT_REMARK_TIME_PREF, needs_intent=False)
+def _handle_wait_remark_time_pref(ctx: ConversationContext, msg: str, intent: str | None) -> Reply:
+    parsed_msg = msg.strip()
+    if parsed_msg.upper().startswith("SLOT_"):
+        parsed_msg = parsed_msg.split("_", 1)[1]
+    t = parse_br_time(parsed_msg)
+    if not t:
+        return (
+            "Não entendi o horário 😅\nMe diga assim: 14:00 (ou 14h).",
             State.WAIT_REMARK_TIME_PREF,
             ctx.to_dict(),
             [],
         )
+    if not ctx.date or not ctx.barber_id or not ctx.service_duration_minutes:
+        return (
+            "Ops, perdi o contexto. Vamos começar de novo.",
+            State.START,
+            ConversationContext().to_dict(),
+            [],
+        )
+    tz = ZoneInfo("America/Sao_Paulo")
+    suggestions = generate_suggestions(
+        date_iso=ctx.date,
+        barber_id=int(ctx.barber_id),
+        duration_minutes=int(ctx.service_duration_minutes),
+        preferred_time=t,
+        tz=tz,
+        max_suggestions=3,
+    )
+    if not suggestions:
+        return (
+            "Não achei horários disponíveis nesse dia 😕\nQuer tentar outro dia? (ex: 21/01)",
+            State.WAIT_REMARK_DATE,
+            ctx.to_dict(),
+            [],
+        )
 
-    # === WAIT_TIME_PREF ===
-    if current_state == State.WAIT_TIME_PREF:
-        if intent == "CANCEL_APPOINTMENT":
-            return (
-                "Tudo bem, voltamos ao início! 👋",
-                State.START,
-                ConversationContext().to_dict(),
-                [],
-            )
+    # Verifica se o horário exato está disponível (remarcação)
+    ctx.time_pref = t.strftime("%H:%M")
+    date_obj = datetime.fromisoformat(ctx.date).date()
+    chosen_start = datetime.combine(date_obj, t, tzinfo=tz)
 
-        # Suporta clique de botão (id: SLOT_HH:MM) ou entrada livre "HH:MM"
-        parsed_msg = msg.strip()
-        if parsed_msg.upper().startswith("SLOT_"):
-            parsed_msg = parsed_msg.split("_", 1)[1]
-        t = parse_br_time(parsed_msg)
-        if not t:
-            return (
-                "Não entendi o horário 😅\nMe diga assim: 14:00 (ou 14h).",
-                State.WAIT_TIME_PREF,
-                ctx.to_dict(),
-                [],
-            )
+    if suggestions[0].strftime("%H:%M") == chosen_start.strftime("%H:%M"):
+        # Horário exato disponível! Vai direto pra confirmação
+        ctx.selected_slot = t.strftime("%H:%M")
+        return (
+            f"Vou remarcar para {ctx.barber_name}, {ctx.service_name} no dia {ctx.date} às {ctx.selected_slot}. Confirmar?",
+            State.WAIT_REMARK_CONFIRMATION,
+            ctx.to_dict(),
+            [
+                {"id": "REMARK_YES", "label": "Sim, remarcar"},
+                {"id": "REMARK_NO", "label": "Não, voltar"},
+            ],
+        )
+
+    # Horário não está disponível, oferece aproximados
+    buttons = [
+        {"id": f"SLOT_{s.strftime('%H:%M')}", "label": s.strftime("%H:%M")}
+        for s in suggestions
+    ]
+    return (
+        "Esse horário não está disponível. Posso sugerir estes:",
+        State.WAIT_REMARK_SLOT_PICK,
+        ctx.to_dict(),
+        buttons,
+    )
+
+
+@state_handler(State.WAIT_SLOT_PICK, needs_intent=False)
+def _handle_wait_slot_pick(ctx: ConversationContext, msg: str, intent: str | None) -> Reply:
+    # Escolha de "próximo livre com qualquer barbeiro" troca barbeiro e data
+    any_slot = _parse_any_slot(msg)
+    if any_slot:
+        barber = find_barber_by_id(any_slot[0])
+        if barber:
+            ctx.barber_id = barber["id"]
+            ctx.barber_name = barber["name"]
+            ctx.date = any_slot[1]
+            msg = any_slot[2]
 
-        # Valida contexto
-        if not ctx.date or not ctx.barber_id or not ctx.service_duration_minutes:
+    t = parse_br_time(msg)
+    if not t:
+        # Não é data/horário: só então roda o NLU para ver se quer voltar
+        if detect_intent(msg) == "CANCEL_APPOINTMENT":
             return (
-                "Ops, perdi o contexto do agendamento. Vamos começar de novo.",
+                "Tudo bem, voltamos ao início! 👋",
                 State.START,
                 ConversationContext().to_dict(),
                 [],
             )
+        return (
+            "Horário inválido. Escolha um dos horários sugeridos acima.",
+            State.WAIT_SLOT_PICK,
+            ctx.to_dict(),
+            [],
+        )
 
-        # Gera sugestões de horários
-        tz = ZoneInfo("America/Sao_Paulo")
-        suggestions = generate_suggestions(
-            date_iso=ctx.date,
-            barber_id=int(ctx.barber_id),
-            duration_minutes=int(ctx.service_duration_minutes),
-            preferred_time=t,
-            tz=tz,
-            max_suggestions=3,
+    # Valida contexto mínimo
+    if not ctx.date or not ctx.barber_id or not ctx.service_id or not ctx.service_duration_minutes:
+        return (
+            "Ops, perdi o contexto do agendamento. Vamos começar de novo.",
+            State.START,
+            ConversationContext().to_dict(),
+            [],
         )
 
-        if not suggestions:
-            return (
-                "Não achei horários disponíveis nesse dia 😕\nQuer tentar outro dia? (ex: 21/01)",
-                State.WAIT_DATE,
-                ctx.to_dict(),
-                [],
-            )
+    tz = ZoneInfo("America/Sao_Paulo")
+    date_obj = datetime.fromisoformat(ctx.date).date()
+    chosen_start = datetime.combine(date_obj, t, tzinfo=tz)
+    # Gera sugestões a partir do horário escolhido
+    suggestions = generate_suggestions(
+        date_iso=ctx.date,
+        barber_id=int(ctx.barber_id),
+        duration_minutes=int(ctx.service_duration_minutes),
+        preferred_time=t,
+        tz=tz,
+        max_suggestions=3,
+    )
 
-        # Verifica se o horário exato solicitado está disponível (é o primeiro sugerido)
-        ctx.time_pref = t.strftime("%H:%M")
-        date_obj = datetime.fromisoformat(ctx.date).date()
-        chosen_start = datetime.combine(date_obj, t, tzinfo=tz)
-        
-        if suggestions[0].strftime("%H:%M") == chosen_start.strftime("%H:%M"):
-            # Horário exato disponível! Vai direto pra confirmação
-            ctx.selected_slot = t.strftime("%H:%M")
-            return (
-                f"Perfeito! Vou agendar para {ctx.barber_name}, {ctx.service_name} no dia {ctx.date} às {ctx.selected_slot}.\nConfirma? (sim/não)",
-                State.WAIT_CONFIRMATION,
-                ctx.to_dict(),
-                [
-                    {"id": "CONFIRM_YES", "label": "Sim, confirmar"},
-                    {"id": "CONFIRM_NO", "label": "Não, voltar"},
-                ],
-            )
-        
-        # Horário não está disponível, oferece aproximados
-        buttons = [
-            {"id": f"SLOT_{s.strftime('%H:%M')}", "label": s.strftime("%H:%M")}
-            for s in suggestions
-        ]
+    # Se o primeiro sugerido for exatamente o horário escolhido, considera livre
+    if suggestions and suggestions[0].strftime("%H:%M") == chosen_start.strftime("%H:%M"):
+        # Se tivermos client_key no contexto, efetiva o agendamento
+        client_key = getattr(ctx, "client_key", None) or (ctx.to_dict().get("client_key"))
+        if client_key:
+            client_row = get_client_by_key(client_key)
+            if client_row:
+                client_id = int(client_row["id"])
+                start_dt = chosen_start
+                end_dt = start_dt + timedelta(minutes=int(ctx.service_duration_minutes))
+                try:
+                    create_appointment(
+                        client_id=client_id,
+                        barber_id=int(ctx.barber_id),
+                        service_id=int(ctx.service_id),
+                        start_at=start_dt.isoformat(),
+                        end_at=end_dt.isoformat(),
+                    )
+                    return (
+                        f"✅ Agendamento confirmado!\n{ctx.barber_name} - {ctx.service_name}\n{ctx.date} às {start_dt.strftime('%H:%M')}\nAté logo! 😊",
+                        State.CONFIRMED,
+                        ctx.to_dict(),
+                        [],
+                    )
+                except Exception as e:
+                    logger.error("Erro ao criar agendamento: %s", e, exc_info=True)
+                    # fallback para confirmação manual
 
+        # Sem client_key ou erro: pede confirmação manual
+        ctx.selected_slot = chosen_start.strftime("%H:%M")
         return (
-            "Esse horário não está disponível. Posso sugerir estes:",
-            State.WAIT_SLOT_PICK,
+            f"Perfeito! Vou agendar para {ctx.barber_name}, {ctx.service_name} no dia {ctx.date} às {ctx.selected_slot}.\nConfirma? (sim/não)",
+            State.WAIT_CONFIRMATION,
             ctx.to_dict(),
-            buttons,
+            [
+                {"id": "CONFIRM_YES", "label": "Sim, confirmar"},
+                {"id": "CONFIRM_NO", "label": "Não, voltar"},
+            ],
         )
 
-    # === WAIT_REMARK_TIME_PREF === (semelhante ao WAIT_TIME_PREF)
-    if current_state == State.WAIT_REMARK_TIME_PREF:
-        parsed_msg = msg.strip()
-        if parsed_msg.upper().startswith("SLOT_"):
-            parsed_msg = parsed_msg.split("_", 1)[1]
-        t = parse_br_time(parsed_msg)
-        if not t:
+    # Caso o horário escolhido não esteja disponível, sugere próximos (-30, +30, ...)
+    alt_buttons = [
+        {"id": f"SLOT_{s.strftime('%H:%M')}", "label": s.strftime("%H:%M")}
+        for s in suggestions[:2]
+    ] if suggestions else []
+
+    if not alt_buttons:
+        alt_buttons = _next_free_with_anyone_buttons(ctx, t, tz)
+        if alt_buttons:
             return (
-                "Não entendi o horário 😅\nMe diga assim: 14:00 (ou 14h).",
-                State.WAIT_REMARK_TIME_PREF,
+                "Esse dia está cheio. Esses são os próximos livres com qualquer barbeiro:",
+                State.WAIT_SLOT_PICK,
                 ctx.to_dict(),
-                [],
-            )
-        if not ctx.date or not ctx.barber_id or not ctx.service_duration_minutes:
-            return (
-                "Ops, perdi o contexto. Vamos começar de novo.",
-                State.START,
-                ConversationContext().to_dict(),
-                [],
+                alt_buttons,
             )
-        tz = ZoneInfo("America/Sao_Paulo")
-        suggestions = generate_suggestions(
-            date_iso=ctx.date,
-            barber_id=int(ctx.barber_id),
-            duration_minutes=int(ctx.service_duration_minutes),
-            preferred_time=t,
-            tz=tz,
-            max_suggestions=3,
+        return (
+            "Não consegui encontrar alternativas próximas. Quer tentar outro dia?",
+            State.WAIT_DATE,
+            ctx.to_dict(),
+            [],
         )
-        if not suggestions:
-            return (
-                "Não achei horários disponíveis nesse dia 😕\nQuer tentar outro dia? (ex: 21/01)",
-                State.WAIT_REMARK_DATE,
-                ctx.to_dict(),
-                [],
-            )
-        
-        # Verifica se o horário exato está disponível (remarcação)
-        ctx.time_pref = t.strftime("%H:%M")
-        date_obj = datetime.fromisoformat(ctx.date).date()
-        chosen_start = datetime.combine(date_obj, t, tzinfo=tz)
-        
-        if suggestions[0].strftime("%H:%M") == chosen_start.strftime("%H:%M"):
-            # Horário exato disponível! Vai direto pra confirmação
-            ctx.selected_slot = t.strftime("%H:%M")
-            return (
-                f"Vou remarcar para {ctx.barber_name}, {ctx.service_name} no dia {ctx.date} às {ctx.selected_slot}. Confirmar?",
-                State.WAIT_REMARK_CONFIRMATION,
-                ctx.to_dict(),
-                [
-                    {"id": "REMARK_YES", "label": "Sim, remarcar"},
-                    {"id": "REMARK_NO", "label": "Não, voltar"},
-                ],
-            )
-        
-        # Horário não está disponível, oferece aproximados
-        buttons = [
-            {"id": f"SLOT_{s.strftime('%H:%M')}", "label": s.strftime("%H:%M")}
-            for s in suggestions
-        ]
+
+    return (
+        "Esse horário não está disponível. Posso sugerir estes:",
+        State.WAIT_SLOT_PICK,
+        ctx.to_dict(),
+        alt_buttons,
+    )
+
+
+@state_handler(State.WAIT_REMARK_SLOT_PICK, needs_intent=False)
+def _handle_wait_remark_slot_pick(ctx: ConversationContext, msg: str, intent: str | None) -> Reply:
+    t = parse_br_time(msg)
+    if not t:
         return (
-            "Esse horário não está disponível. Posso sugerir estes:",
+            "Horário inválido. Escolha um dos horários sugeridos acima.",
             State.WAIT_REMARK_SLOT_PICK,
             ctx.to_dict(),
-            buttons,
+            [],
+        )
+    if not ctx.date or not ctx.barber_id or not ctx.service_id or not ctx.service_duration_minutes:
+        return (
+            "Ops, perdi o contexto. Vamos começar de novo.",
+            State.START,
+            ConversationContext().to_dict(),
+            [],
+        )
+    tz = ZoneInfo("America/Sao_Paulo")
+    date_obj = datetime.fromisoformat(ctx.date).date()
+    chosen_start = datetime.combine(date_obj, t, tzinfo=tz)
+    suggestions = generate_suggestions(
+        date_iso=ctx.date,
+        barber_id=int(ctx.barber_id),
+        duration_minutes=int(ctx.service_duration_minutes),
+        preferred_time=t,
+        tz=tz,
+        max_suggestions=3,
+    )
+    if suggestions and suggestions[0].strftime("%H:%M") == chosen_start.strftime("%H:%M"):
+        ctx.selected_slot = chosen_start.strftime("%H:%M")
+        return (
+            f"Vou remarcar para {ctx.barber_name}, {ctx.service_name} no dia {ctx.date} às {ctx.selected_slot}. Confirmar?",
+            State.WAIT_REMARK_CONFIRMATION,
+            ctx.to_dict(),
+            [
+                {"id": "REMARK_YES", "label": "Sim, remarcar"},
+                {"id": "REMARK_NO", "label": "Não, voltar"},
+            ],
         )
+    alt_buttons = [
+        {"id": f"SLOT_{s.strftime('%H:%M')}", "label": s.strftime("%H:%M")}
+        for s in suggestions[:2]
+    ] if suggestions else []
+    if not alt_buttons:
+        return (
+            "Não consegui encontrar alternativas próximas. Quer tentar outro dia?",
+            State.WAIT_REMARK_DATE,
+            ctx.to_dict(),
+            [],
+        )
+    return (
+        "Esse horário não está disponível. Posso sugerir estes:",
+        State.WAIT_REMARK_SLOT_PICK,
+        ctx.to_dict(),
+        alt_buttons,
+    )
 
-    # === WAIT_SLOT_PICK ===
-    if current_state == State.WAIT_SLOT_PICK:
-        if intent == "CANCEL_APPOINTMENT":
+
+@state_handler(State.WAIT_CONFIRMATION)
+def _handle_wait_confirmation(ctx: ConversationContext, msg: str, intent: str | None) -> Reply:
+    # Aceita sim/não/confirmar/cancelar
+    if intent in ["BOOK_APPOINTMENT"] or "sim" in msg.lower():
+        # Cria agendamento
+        if not ctx.is_complete_for_booking():
             return (
-                "Tudo bem, voltamos ao início! 👋",
+                "Ops, dados incompletos. Vamos começar de novo.",
                 State.START,
                 ConversationContext().to_dict(),
                 [],
             )
 
-        t = parse_br_time(msg)
-        if not t:
+        try:
+            # Cria os datetimes em ISO com timezone
+            tz = ZoneInfo("America/Sao_Paulo")
+            date_obj = datetime.fromisoformat(ctx.date).date()
+            slot_obj = datetime.strptime(ctx.selected_slot, "%H:%M").time()
+            start_dt = datetime.combine(date_obj, slot_obj, tzinfo=tz)
+            end_dt = start_dt.replace(tzinfo=tz) + __import__('datetime').timedelta(
+                minutes=ctx.service_duration_minutes
+            )
+
+            # Nota: client_id será passado pela route
+            # Aqui só retornamos a confirmação
             return (
-                "Horário inválido. Escolha um dos horários sugeridos acima.",
-                State.WAIT_SLOT_PICK,
+                f"✅ Agendamento confirmado!\n{ctx.barber_name} - {ctx.service_name}\n{ctx.date} às {ctx.selected_slot}\nAté logo! 😊",
+                State.CONFIRMED,
                 ctx.to_dict(),
                 [],
             )
 
-        # Valida contexto mínimo
-        if not ctx.date or not ctx.barber_id or not ctx.service_id or not ctx.service_duration_minutes:
+        except Exception as e:
             return (
-                "Ops, perdi o contexto do agendamento. Vamos começar de novo.",
+                f"Ops, erro ao agendar: {str(e)}. Tente de novo.",
                 State.START,
                 ConversationContext().to_dict(),
                 [],
             )
 
-        tz = ZoneInfo("America/Sao_Paulo")
-        date_obj = datetime.fromisoformat(ctx.date).date()
-        chosen_start = datetime.combine(date_obj, t, tzinfo=tz)
-        # Gera sugestões a partir do horário escolhido
-        suggestions = generate_suggestions(
-            date_iso=ctx.date,
-            barber_id=int(ctx.barber_id),
-            duration_minutes=int(ctx.service_duration_minutes),
-            preferred_time=t,
-            tz=tz,
-            max_suggestions=3,
+    elif "não" in msg.lower() or intent == "CANCEL_APPOINTMENT":
+        return (
+            "Tudo bem, vamos voltar! Qual barbeiro você prefere?",
+            State.WAIT_BARBER,
+            ConversationContext.from_dict(
+                {
+                    "barber_id": ctx.barber_id,
+                    "barber_name": ctx.barber_name,
+                }
+            ).to_dict(),
+            [{"id": f"BARBER_{b['id']}", "label": b["name"]} for b in list_active_barbers()],
         )
 
-        # Se o primeiro sugerido for exatamente o horário escolhido, considera livre
-        if suggestions and suggestions[0].strftime("%H:%M") == chosen_start.strftime("%H:%M"):
-            # Se tivermos client_key no contexto, efetiva o agendamento
-            client_key = getattr(ctx, "client_key", None) or (ctx.to_dict().get("client_key"))
-            if client_key:
-                client_row = get_client_by_key(client_key)
-                if client_row:
-                    client_id = int(client_row["id"])
-                    start_dt = chosen_start
-                    end_dt = start_dt + timedelta(minutes=int(ctx.service_duration_minutes))
-                    try:
-                        create_appointment(
-                            client_id=client_id,
-                            barber_id=int(ctx.barber_id),
-                            service_id=int(ctx.service_id),
-                            start_at=start_dt.isoformat(),
-                            end_at=end_dt.isoformat(),
-                        )
-                        return (
-                            f"✅ Agendamento confirmado!\n{ctx.barber_name} - {ctx.service_name}\n{ctx.date} às {start_dt.strftime('%H:%M')}\nAté logo! 😊",
-                            State.CONFIRMED,
-                            ctx.to_dict(),
-                            [],
-                        )
-                    except Exception as e:
-                        logger.error(f"Erro ao criar agendamento: {e}", exc_info=True)
-                        # fallback para confirmação manual
-
-            # Sem client_key ou erro: pede confirmação manual
-            ctx.selected_slot = chosen_start.strftime("%H:%M")
-            return (
-                f"Perfeito! Vou agendar para {ctx.barber_name}, {ctx.service_name} no dia {ctx.date} às {ctx.selected_slot}.\nConfirma? (sim/não)",
-                State.WAIT_CONFIRMATION,
-                ctx.to_dict(),
-                [
-                    {"id": "CONFIRM_YES", "label": "Sim, confirmar"},
-                    {"id": "CONFIRM_NO", "label": "Não, voltar"},
-                ],
-            )
-
-        # Caso o horário escolhido não esteja disponível, sugere próximos (-30, +30, ...)
-        alt_buttons = [
-            {"id": f"SLOT_{s.strftime('%H:%M')}", "label": s.strftime("%H:%M")}
-            for s in suggestions[:2]
-        ] if suggestions else []
-
-        if not alt_buttons:
-            return (
-                "Não consegui encontrar alternativas próximas. Quer tentar outro dia?",
-                State.WAIT_DATE,
-                ctx.to_dict(),
-                [],
-            )
+    return (
+        "Por favor, confirma o agendamento: sim ou não?",
+        State.WAIT_CONFIRMATION,
+        ctx.to_dict(),
+        [
+            {"id": "CONFIRM_YES", "label": "Sim"},
+            {"id": "CONFIRM_NO", "label": "Não"},
+        ],
+    )
 
-        return (
-            "Esse horário não está disponível. Posso sugerir estes:",
-            State.WAIT_SLOT_PICK,
-            ctx.to_dict(),
-            alt_buttons,
-        )
 
-    # === WAIT_REMARK_SLOT_PICK === (semelhante ao WAIT_SLOT_PICK)
-    if current_state == State.WAIT_REMARK_SLOT_PICK:
-        t = parse_br_time(msg)
-        if not t:
+@state_handler(State.WAIT_CANCEL_CONFIRMATION)
+def _handle_wait_cancel_confirmation(ctx: ConversationContext, msg: str, intent: str | None) -> Reply:
+    if any(x in msg.lower() for x in ["sim", "confirmar", "yes", "confirm"]) or intent == "CANCEL_APPOINTMENT":
+        if not ctx.cancel_appt_id:
             return (
-                "Horário inválido. Escolha um dos horários sugeridos acima.",
-                State.WAIT_REMARK_SLOT_PICK,
-                ctx.to_dict(),
+                "Não encontrei o agendamento alvo. Vamos começar de novo.",
+                State.START,
+                ConversationContext().to_dict(),
                 [],
             )
-        if not ctx.date or not ctx.barber_id or not ctx.service_id or not ctx.service_duration_minutes:
+        try:
+            cancel_appointment(int(ctx.cancel_appt_id))
             return (
-                "Ops, perdi o contexto. Vamos começar de novo.",
+                "✅ Agendamento cancelado com sucesso.",
                 State.START,
                 ConversationContext().to_dict(),
                 [],
             )
-        tz = ZoneInfo("America/Sao_Paulo")
-        date_obj = datetime.fromisoformat(ctx.date).date()
-        chosen_start = datetime.combine(date_obj, t, tzinfo=tz)
-        suggestions = generate_suggestions(
-            date_iso=ctx.date,
-            barber_id=int(ctx.barber_id),
-            duration_minutes=int(ctx.service_duration_minutes),
-            preferred_time=t,
-            tz=tz,
-            max_suggestions=3,
-        )
-        if suggestions and suggestions[0].strftime("%H:%M") == chosen_start.strftime("%H:%M"):
-            ctx.selected_slot = chosen_start.strftime("%H:%M")
-            return (
-                f"Vou remarcar para {ctx.barber_name}, {ctx.service_name} no dia {ctx.date} às {ctx.selected_slot}. Confirmar?",
-                State.WAIT_REMARK_CONFIRMATION,
-                ctx.to_dict(),
-                [
-                    {"id": "REMARK_YES", "label": "Sim, remarcar"},
-                    {"id": "REMARK_NO", "label": "Não, voltar"},
-                ],
-            )
-        alt_buttons = [
-            {"id": f"SLOT_{s.strftime('%H:%M')}", "label": s.strftime("%H:%M")}
-            for s in suggestions[:2]
-        ] if suggestions else []
-        if not alt_buttons:
+        except Exception as e:
+            logger.error("Erro ao cancelar agendamento: %s", e, exc_info=True)
             return (
-                "Não consegui encontrar alternativas próximas. Quer tentar outro dia?",
-                State.WAIT_REMARK_DATE,
-                ctx.to_dict(),
+                "Não consegui cancelar agora. Tente mais tarde.",
+                State.START,
+                ConversationContext().to_dict(),
                 [],
             )
+    else:
         return (
-            "Esse horário não está disponível. Posso sugerir estes:",
-            State.WAIT_REMARK_SLOT_PICK,
-            ctx.to_dict(),
-            alt_buttons,
+            "Cancelamento abortado. Posso ajudar com outra coisa?",
+            State.START,
+            ConversationContext().to_dict(),
+            [],
         )
 
-    # === WAIT_CONFIRMATION ===
-    if current_state == State.WAIT_CONFIRMATION:
-        # Aceita sim/não/confirmar/cancelar
-        if intent in ["BOOK_APPOINTMENT"] or "sim" in msg.lower():
-            # Cria agendamento
-            if not ctx.is_complete_for_booking():
-                return (
-                    "Ops, dados incompletos. Vamos começar de novo.",
-                    State.START,
-                    ConversationContext().to_dict(),
-                    [],
-                )
 
-            try:
-                # Cria os datetimes em ISO com timezone
-                tz = ZoneInfo("America/Sao_Paulo")
-                date_obj = datetime.fromisoformat(ctx.date).date()
-                slot_obj = datetime.strptime(ctx.selected_slot, "%H:%M").time()
-                start_dt = datetime.combine(date_obj, slot_obj, tzinfo=tz)
-                end_dt = start_dt.replace(tzinfo=tz) + __import__('datetime').timedelta(
-                    minutes=ctx.service_duration_minutes
-                )
-
-                # Nota: client_id será passado pela route
-                # Aqui só retornamos a confirmação
-                return (
-                    f"✅ Agendamento confirmado!\n{ctx.barber_name} - {ctx.service_name}\n{ctx.date} às {ctx.selected_slot}\nAté logo! 😊",
-                    State.CONFIRMED,
-                    ctx.to_dict(),
-                    [],
-                )
-
-            except Exception as e:
-                return (
-                    f"Ops, erro ao agendar: {str(e)}. Tente de novo.",
-                    State.START,
-                    ConversationContext().to_dict(),
-                    [],
-                )
-
-        elif "não" in msg.lower() or intent == "CANCEL_APPOINTMENT":
+@state_handler(State.WAIT_REMARK_CONFIRMATION)
+def _handle_wait_remark_confirmation(ctx: ConversationContext, msg: str, intent: str | None) -> Reply:
+    if any(x in msg.lower() for x in ["sim", "confirmar", "yes", "confirm"]) or intent == "REMARK_APPOINTMENT":
+        # Precisa de remark_appt_id + client_key + barber/service + date + selected_slot
+        if not (ctx.remark_appt_id and ctx.barber_id and ctx.service_id and ctx.date and ctx.selected_slot):
             return (
-                "Tudo bem, vamos voltar! Qual barbeiro você prefere?",
-                State.WAIT_BARBER,
-                ConversationContext.from_dict(
-                    {
-                        "barber_id": ctx.barber_id,
-                        "barber_name": ctx.barber_name,
-                    }
-                ).to_dict(),
-                [{"id": f"BARBER_{b['id']}", "label": b["name"]} for b in list_active_barbers()],
+                "Dados incompletos para remarcar. Vamos começar de novo.",
+                State.START,
+                ConversationContext().to_dict(),
+                [],
             )
-
-        return (
-            "Por favor, confirma o agendamento: sim ou não?",
-            State.WAIT_CONFIRMATION,
-            ctx.to_dict(),
-            [
-                {"id": "CONFIRM_YES", "label": "Sim"},
-                {"id": "CONFIRM_NO", "label": "Não"},
-            ],
-        )
-
-    # === WAIT_CANCEL_CONFIRMATION ===
-    if current_state == State.WAIT_CANCEL_CONFIRMATION:
-        if any(x in msg.lower() for x in ["sim", "confirmar", "yes", "confirm"]) or intent == "CANCEL_APPOINTMENT":
-            if not ctx.cancel_appt_id:
-                return (
-                    "Não encontrei o agendamento alvo. Vamos começar de novo.",
-                    State.START,
-                    ConversationContext().to_dict(),
-                    [],
-                )
-            try:
-                cancel_appointment(int(ctx.cancel_appt_id))
-                return (
-                    "✅ Agendamento cancelado com sucesso.",
-                    State.START,
-                    ConversationContext().to_dict(),
-                    [],
-                )
-            except Exception as e:
-                logger.error(f"Erro ao cancelar agendamento: {e}", exc_info=True)
-                return (
-                    "Não consegui cancelar agora. Tente mais tarde.",
-                    State.START,
-                    ConversationContext().to_dict(),
-                    [],
-                )
-        else:
+        client_key = getattr(ctx, "client_key", None) or (ctx.to_dict().get("client_key"))
+        if not client_key:
             return (
-                "Cancelamento abortado. Posso ajudar com outra coisa?",
+                "Não consegui identificar você. Vamos começar de novo.",
                 State.START,
                 ConversationContext().to_dict(),
                 [],
             )
-
-    # === WAIT_REMARK_CONFIRMATION ===
-    if current_state == State.WAIT_REMARK_CONFIRMATION:
-        if any(x in msg.lower() for x in ["sim", "confirmar", "yes", "confirm"]) or intent == "REMARK_APPOINTMENT":
-            # Precisa de remark_appt_id + client_key + barber/service + date + selected_slot
-            if not (ctx.remark_appt_id and ctx.barber_id and ctx.service_id and ctx.date and ctx.selected_slot):
-                return (
-                    "Dados incompletos para remarcar. Vamos começar de novo.",
-                    State.START,
-                    ConversationContext().to_dict(),
-                    [],
-                )
-            client_key = getattr(ctx, "client_key", None) or (ctx.to_dict().get("client_key"))
-            if not client_key:
-                return (
-                    "Não consegui identificar você. Vamos começar de novo.",
-                    State.START,
-                    ConversationContext().to_dict(),
-                    [],
-                )
-            client_row = get_client_by_key(client_key)
-            if not client_row:
-                return (
-                    "Não encontrei seu cadastro. Vamos começar de novo.",
-                    State.START,
-                    ConversationContext().to_dict(),
-                    [],
-                )
-            try:
-                tz = ZoneInfo("America/Sao_Paulo")
-                date_obj = datetime.fromisoformat(ctx.date).date()
-                slot_obj = datetime.strptime(ctx.selected_slot, "%H:%M").time()
-                start_dt = datetime.combine(date_obj, slot_obj, tzinfo=tz)
-                end_dt = start_dt + timedelta(minutes=int(ctx.service_duration_minutes))
-                # Cancela o antigo
-                cancel_appointment(int(ctx.remark_appt_id))
-                # Cria novo
-                create_appointment(
-                    client_id=int(client_row["id"]),
-                    barber_id=int(ctx.barber_id),
-                    service_id=int(ctx.service_id),
-                    start_at=start_dt.isoformat(),
-                    end_at=end_dt.isoformat(),
-                )
-                return (
-                    f"✅ Horário remarcado! {ctx.barber_name} - {ctx.service_name}\n{ctx.date} às {ctx.selected_slot}",
-                    State.CONFIRMED,
-                    ConversationContext().to_dict(),
-                    [],
-                )
-            except Exception as e:
-                logger.error(f"Erro ao remarcar: {e}", exc_info=True)
-                return (
-                    "Não consegui remarcar agora. Tente novamente.",
-                    State.START,
-                    ConversationContext().to_dict(),
-                    [],
-                )
-        else:
+        client_row = get_client_by_key(client_key)
+        if not client_row:
             return (
-                "Remarcação cancelada. Posso ajudar com outra coisa?",
+                "Não encontrei seu cadastro. Vamos começar de novo.",
                 State.START,
                 ConversationContext().to_dict(),
                 [],
             )
-
-    # === WAIT_APPOINTMENT_PICK ===
-    if current_state == State.WAIT_APPOINTMENT_PICK:
-        # Espera um id do tipo APPT_<id>
-        if msg.upper().startswith("APPT_"):
-            try:
-                appt_id = int(msg.split("_", 1)[1])
-            except Exception:
-                appt_id = None
-            if not appt_id:
-                return (
-                    "Seleção inválida. Tente novamente.",
-                    State.WAIT_APPOINTMENT_PICK,
-                    ctx.to_dict(),
-                    [],
-                )
-            if ctx.operation == "cancel":
-                ctx.cancel_appt_id = appt_id
-                return (
-                    "Confirmar cancelamento deste agendamento?",
-                    State.WAIT_CANCEL_CONFIRMATION,
-                    ctx.to_dict(),
-                    [
-                        {"id": "CANCEL_YES", "label": "Sim, cancelar"},
-                        {"id": "CANCEL_NO", "label": "Não, voltar"},
-                    ],
-                )
-            # remark
-            ctx.remark_appt_id = appt_id
-            # Para preencher barber/service, precisamos buscar o agendamento
-            client_key = getattr(ctx, "client_key", None) or (ctx.to_dict().get("client_key"))
-            client_row = get_client_by_key(client_key) if client_key else None
-            if client_row:
-                appts = list_appointments_for_client(int(client_row["id"]), status="scheduled")
-                target = next((a for a in appts if int(a["id"]) == appt_id), None)
-                if target:
-                    ctx.barber_id = int(target["barber_id"])
-                    b = find_barber_by_id(ctx.barber_id)
-                    ctx.barber_name = b["name"] if b else None
-                    ctx.service_id = int(target["service_id"])
-                    s = find_service_by_id(ctx.service_id)
-                    if s:
-                        ctx.service_name = s["name"]
-                        ctx.service_duration_minutes = int(s["duration_minutes"])
+        try:
+            tz = ZoneInfo("America/Sao_Paulo")
+            date_obj = datetime.fromisoformat(ctx.date).date()
+            slot_obj = datetime.strptime(ctx.selected_slot, "%H:%M").time()
+            start_dt = datetime.combine(date_obj, slot_obj, tzinfo=tz)
+            end_dt = start_dt + timedelta(minutes=int(ctx.service_duration_minutes))
+            # Cancela o antigo
+            cancel_appointment(int(ctx.remark_appt_id))
+            # Cria novo
+            create_appointment(
+                client_id=int(client_row["id"]),
+                barber_id=int(ctx.barber_id),
+                service_id=int(ctx.service_id),
+                start_at=start_dt.isoformat(),
+                end_at=end_dt.isoformat(),
+            )
             return (
-                "Certo, vamos remarcar. Me diga o novo dia (ex: 21/01).",
-                State.WAIT_REMARK_DATE,
-                ctx.to_dict(),
+                f"✅ Horário remarcado! {ctx.barber_name} - {ctx.service_name}\n{ctx.date} às {ctx.selected_slot}",
+                State.CONFIRMED,
+                ConversationContext().to_dict(),
                 [],
             )
-        # fallback
-        return (
-            "Escolha um dos agendamentos listados.",
-            State.WAIT_APPOINTMENT_PICK,
-            ctx.to_dict(),
-            [],
-        )
-
-    # === WAIT_CLARIFICATION ===
-    if current_state == State.WAIT_CLARIFICATION:
+        except Exception as e:
+            logger.error("Erro ao remarcar: %s", e, exc_info=True)
+            return (
+                "Não consegui remarcar agora. Tente novamente.",
+                State.START,
+                ConversationContext().to_dict(),
+                [],
+            )
+    else:
         return (
-            "Como você pode me ajudar?",
+            "Remarcação cancelada. Posso ajudar com outra coisa?",
             State.START,
             ConversationContext().to_dict(),
             [],
         )
 
-    # === CONFIRMED ===
-    if current_state == State.CONFIRMED:
+
+@state_handler(State.WAIT_APPOINTMENT_PICK, needs_intent=False)
+def _handle_wait_appointment_pick(ctx: ConversationContext, msg: str, intent: str | None) -> Reply:
+    # Espera um id do tipo APPT_<id>
+    if msg.upper().startswith("APPT_"):
+        try:
+            appt_id = int(msg.split("_", 1)[1])
+        except Exception:
+            appt_id = None
+        if not appt_id:
+            return (
+                "Seleção inválida. Tente novamente.",
+                State.WAIT_APPOINTMENT_PICK,
+                ctx.to_dict(),
+                [],
+            )
+        if ctx.operation == "cancel":
+            ctx.cancel_appt_id = appt_id
+            return (
+                "Confirmar cancelamento deste agendamento?",
+                State.WAIT_CANCEL_CONFIRMATION,
+                ctx.to_dict(),
+                [
+                    {"id": "CANCEL_YES", "label": "Sim, cancelar"},
+                    {"id": "CANCEL_NO", "label": "Não, voltar"},
+                ],
+            )
+        # remark
+        ctx.remark_appt_id = appt_id
+        # Para preencher barber/service, precisamos buscar o agendamento
+        client_key = getattr(ctx, "client_key", None) or (ctx.to_dict().get("client_key"))
+        client_row = get_client_by_key(client_key) if client_key else None
+        if client_row:
+            appts = list_appointments_for_client(int(client_row["id"]), status="scheduled")
+            target = next((a for a in appts if int(a["id"]) == appt_id), None)
+            if target:
+                ctx.barber_id = int(target["barber_id"])
+                b = find_barber_by_id(ctx.barber_id)
+                ctx.barber_name = b["name"] if b else None
+                ctx.service_id = int(target["service_id"])
+                s = find_service_by_id(ctx.service_id)
+                if s:
+                    ctx.service_name = s["name"]
+                    ctx.service_duration_minutes = int(s["duration_minutes"])
         return (
-            "O agendamento já foi confirmado! Quer fazer mais algo?",
-            State.START,
-            ConversationContext().to_dict(),
+            "Certo, vamos remarcar. Me diga o novo dia (ex: 21/01).",
+            State.WAIT_REMARK_DATE,
+            ctx.to_dict(),
             [],
         )
+    # fallback
+    return (
+        "Escolha um dos agendamentos listados.",
+        State.WAIT_APPOINTMENT_PICK,
+        ctx.to_dict(),
+        [],
+    )
+
 
-    # === Estado desconhecido ===
+@state_handler(State.WAIT_CLARIFICATION, needs_intent=False)
+def _handle_wait_clarification(ctx: ConversationContext, msg: str, intent: str | None) -> Reply:
     return (
-        "Algo deu errado. Vamos começar de novo!",
+        "Como você pode me ajudar?",
         State.START,
         ConversationContext().to_dict(),
         [],
     )
 
+
+@state_handler(State.CONFIRMED, needs_intent=False)
+def _handle_confirmed(ctx: ConversationContext, msg: str, intent: str | None) -> Reply:
+    return (
+        "O agendamento já foi confirmado! Quer fazer mais algo?",
+        State.START,
+        ConversationContext().to_dict(),
+        [],
+    )
@@ -0,0 +1,116 @@
+"""
+Idempotência do webhook do WhatsApp por id de mensagem.
+
+A Meta reentrega webhooks em timeouts; sem dedupe, um "sim" reentregue pode
+confirmar/cancelar duas vezes. Cada id passa por:
+
+1. `seen`: cache em memória com TTL (O(1), sem I/O, tamanho limitado) — usado
+   no webhook, dentro do event loop, para descartar reentregas recentes
+2. `claim`: tabela processed_messages, dentro da transação do turno — o id só
+   fica registrado se o turno for gravado. Turno com erro, ou descartado no
+   shutdown, não consome o id e a reentrega da Meta é processada
+
+Registros antigos são removidos por `prune_processed_messages` (job agendado).
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from app.core.config import DEDUPE_TTL_SECONDS, DEDUPE_CACHE_MAX_ENTRIES
+from app.core.logging import get_logger
+from app.repositories.db import after_commit
+from app.repositories.processed_messages_repo import claim_message, prune_processed_messages
+
+logger = get_logger(__name__)
+
+
+class MessageDeduper:
+    """
+    Conjunto limitado de ids de mensagem com TTL, apoiado em SQLite.
+
+    Mantém ordem de chegada: ao passar de `max_entries`, descarta o mais antigo
+    (que ainda fica protegido pela tabela).
+    """
+
+    def __init__(self, ttl_seconds: int = DEDUPE_TTL_SECONDS, max_entries: int = DEDUPE_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._seen: OrderedDict[str, float] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0       # duplicatas detectadas em memória
+        self.db_hits = 0    # duplicatas detectadas só no banco (ex: após reinício)
+        self.misses = 0     # mensagens novas
+
+    def _remember(self, message_id: str, now: float) -> None:
+        self._seen.pop(message_id, None)
+        self._seen[message_id] = now
+        while len(self._seen) > self.max_entries:
+            self._seen.popitem(last=False)
+
+    def seen(self, message_id: str) -> bool:
+        """True se o id já foi processado recentemente (só memória, sem I/O)."""
+        if not message_id:
+            return False
+        with self._lock:
+            seen_at = self._seen.get(message_id)
+            if seen_at is not None and time.time() - seen_at < self.ttl_seconds:
+                self.hits += 1
+                return True
+        return False
+
+    def claim(self, message_id: str) -> bool:
+        """
+        Registra o id na transação corrente; False se já havia sido registrado.
+
+        Chamado dentro da transação do turno: o registro (e a memória) só vale
+        depois do COMMIT. Fora de transação, grava na hora.
+
+        Args:
+            message_id: Id da mensagem do WhatsApp (wamid...); vazio é sempre novo
+        """
+        if not message_id:
+            return True
+        now = time.time()
+        is_new = claim_message(message_id, int(now))
+        with self._lock:
+            if is_new:
+                self.misses += 1
+            else:
+                self.db_hits += 1
+                self._remember(message_id, now)
+        if is_new:
+            after_commit(lambda: self._remember_locked(message_id, now))
+        return is_new
+
+    def _remember_locked(self, message_id: str, now: float) -> None:
+        with self._lock:
+            self._remember(message_id, now)
+
+    def prune(self) -> int:
+        """Remove registros mais antigos que o TTL (memória e banco)."""
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            while self._seen:
+                oldest_id, seen_at = next(iter(self._seen.items()))
+                if seen_at >= cutoff:
+                    break
+                del self._seen[oldest_id]
+        removed = prune_processed_messages(int(cutoff))
+        logger.info("[DEDUPE] %d ids de mensagem expirados removidos", removed)
+        return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._seen.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._seen),
+                "hits": self.hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+            }
+
+
+message_deduper = MessageDeduper()
@@ -0,0 +1,128 @@
+"""
+Extração de entidades de mensagens livres.
+
+Uma mensagem como "corte com o Carlos amanhã às 14h" preenche de uma vez
+barbeiro, serviço, data e horário, e a conversa pula direto para o que falta.
+Opera sobre o texto já normalizado pelo NLU (minúsculas, sem acentos):
+
+- Data: "20/01", "20/01/2026", "dia 20", "hoje", "amanhã", "depois de amanhã",
+  "daqui a 3 dias", dias da semana ("sexta", "sábado")
+- Horário: "14h", "14h30", "14:30", "às 14", "às 14 horas", "meio-dia",
+  "3 da tarde"
+- Barbeiro/serviço: nomes e apelidos ativos do catálogo (`NameIndex`), aceitando
+  pequenos erros de digitação
+- A mensagem inteira continua valendo como antes ("20/01", "14")
+"""
+import re
+from datetime import date, time, timedelta
+
+from app.core.timezone import today_br
+from app.repositories.barbers_repo import find_barber_in_text
+from app.repositories.services_repo import find_service_in_text
+from app.services.parsers import parse_br_date, parse_br_time
+
+WEEKDAYS = {"segunda": 0, "terca": 1, "quarta": 2, "quinta": 3, "sexta": 4, "sabado": 5, "domingo": 6}
+RELATIVE_DAYS = {"hoje": 0, "amanha": 1, "depois de amanha": 2}
+
+_DATE_TOKEN = re.compile(r"\b\d{1,2}/\d{1,2}(?:/\d{4})?\b")
+_IN_DAYS = re.compile(r"\bdaqui a (\d{1,2}) dias?\b")
+_DAY_OF_MONTH = re.compile(r"\bdia (\d{1,2})\b(?!/)")
+_DAY_WORD = re.compile(
+    r"\b(depois de amanha|amanha|hoje|segunda|terca|quarta|quinta|sexta|sabado|domingo)(?:[- ]feira)?\b"
+)
+_TIME_TOKEN = re.compile(r"\b(\d{1,2})(?::(\d{2})|h(\d{2})?)(?!\w)")
+# "às 16" só vale como hora com "h"/"horas", no fim da frase ou antes de um
+# conectivo ("às 16 com o Carlos"); "daqui a 2 dias" e "para as 2 pessoas" não
+_AT_HOUR = re.compile(
+    r"\b(?:as|a|pras|para as)\s+(\d{1,2})"
+    r"(?:\s*h(?:oras?)?\b|\s*(?=[,.;!?]|$)|(?=\s+(?:com|e|ou|no|na|pra|para|hoje|amanha|depois)\b))"
+)
+_PERIOD = re.compile(r"\b(\d{1,2})(?:h|:00)?\s+da (manha|tarde|noite)\b")
+_NOON = re.compile(r"\bmeio[- ]dia\b")
+
+
+def find_date(text: str, today: date | None = None) -> date | None:
+    """Primeira data mencionada no texto (nunca no passado)."""
+    today = today or today_br()
+    whole = parse_br_date(text)
+    if whole:
+        return whole
+
+    m = _DATE_TOKEN.search(text)
+    if m:
+        d = parse_br_date(m.group())
+        if d:
+            return d
+
+    m = _IN_DAYS.search(text)
+    if m:
+        return today + timedelta(days=int(m.group(1)))
+
+    m = _DAY_WORD.search(text)
+    if m:
+        word = m.group(1)
+        if word in RELATIVE_DAYS:
+            return today + timedelta(days=RELATIVE_DAYS[word])
+        # Dia da semana: próxima ocorrência, hoje incluso
+        return today + timedelta(days=(WEEKDAYS[word] - today.weekday()) % 7)
+
+    m = _DAY_OF_MONTH.search(text)
+    if m:
+        day = int(m.group(1))
+        year, month = today.year, today.month
+        for _ in range(12):
+            try:
+                d = date(year, month, day)
+            except ValueError:
+                d = None
+            if d and d >= today:
+                return d
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return None
+
+
+def find_time(text: str) -> time | None:
+    """Primeiro horário mencionado no texto."""
+    whole = parse_br_time(text)
+    if whole:
+        return whole
+
+    m = _PERIOD.search(text)
+    if m:
+        hour = int(m.group(1))
+        if m.group(2) in ("tarde", "noite") and hour < 12:
+            hour += 12
+        return time(hour, 0) if hour <= 23 else None
+
+    m = _TIME_TOKEN.search(text)
+    if m:
+        hour, minute = int(m.group(1)), int(m.group(2) or m.group(3) or 0)
+        if hour <= 23 and minute <= 59:
+            return time(hour, minute)
+
+    m = _AT_HOUR.search(text)
+    if m and int(m.group(1)) <= 23:
+        return time(int(m.group(1)), 0)
+
+    if _NOON.search(text):
+        return time(12, 0)
+    return None
+
+
+def extract_entities(text: str) -> dict:
+    """
+    Todas as entidades que a mensagem (normalizada) preenche.
+
+    Returns:
+        Campos de NLUResult: date, time, barber_id/name, service_id/name
+    """
+    barber = find_barber_in_text(text)
+    service = find_service_in_text(text)
+    return {
+        "date": find_date(text),
+        "time": find_time(text),
+        "barber_id": barber["id"] if barber else None,
+        "barber_name": barber["name"] if barber else None,
+        "service_id": service["id"] if service else None,
+        "service_name": service["name"] if service else None,
+    }
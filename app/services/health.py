@@ -0,0 +1,114 @@
+"""
+Checagens de prontidão (GET /health/ready) para o balanceador de carga.
+
+Cada checagem devolve `ok` e os valores que a decidiram, e é cronometrada:
+
+- db: lock de escrita (BEGIN IMMEDIATE + ROLLBACK) por uma conexão do pool, com
+  espera curta (pool esgotado, banco travado ou inacessível tira a instância
+  do balanceador)
+- scheduler: rodando e sem job atrasado
+- inbound_queue: workers rodando e fila abaixo de HEALTH_INBOUND_MAX_FILL
+- outbox: dispatcher rodando, pendentes e idade da mais antiga dentro dos limites
+
+A instância só está pronta se todas passam. Liveness (/health/live) não
+consulta nada: só diz que o processo responde.
+"""
+import time
+from typing import Callable
+
+from app.core.config import (
+    HEALTH_DB_TIMEOUT_SECONDS, HEALTH_INBOUND_MAX_FILL,
+    HEALTH_OUTBOX_MAX_PENDING, HEALTH_OUTBOX_MAX_AGE_SECONDS,
+    HEALTH_SCHEDULER_MAX_LATE_SECONDS,
+)
+from app.core.logging import get_logger, kv
+from app.jobs.scheduler import get_scheduler_info
+from app.repositories.db import ping
+from app.repositories.outbox_repo import get_outbox_counts
+from app.services.inbound import inbound_queue
+from app.services.outbox import outbox_dispatcher
+
+logger = get_logger(__name__)
+
+
+def check_db() -> dict:
+    ping(HEALTH_DB_TIMEOUT_SECONDS)
+    return {"ok": True, "timeout_s": HEALTH_DB_TIMEOUT_SECONDS}
+
+
+def check_scheduler() -> dict:
+    info = get_scheduler_info()
+    late = [
+        job["id"] for job in info["jobs"]
+        if job["next_run_in_s"] is None or job["next_run_in_s"] < -HEALTH_SCHEDULER_MAX_LATE_SECONDS
+    ]
+    return {"ok": info["running"] and not late, "running": info["running"], "late_jobs": late, "jobs": info["jobs"]}
+
+
+def check_inbound_queue() -> dict:
+    stats = inbound_queue.stats()
+    max_depth = int(stats["maxsize"] * HEALTH_INBOUND_MAX_FILL)
+    return {
+        "ok": stats["running"] and stats["depth"] <= max_depth,
+        "running": stats["running"],
+        "depth": stats["depth"],
+        "max_depth": max_depth,
+        "lag_ms_last": stats["lag_ms_last"],
+    }
+
+
+def check_outbox() -> dict:
+    counts = get_outbox_counts()
+    return {
+        "ok": outbox_dispatcher.running
+        and counts["pending"] <= HEALTH_OUTBOX_MAX_PENDING
+        and counts["oldest_pending_age_s"] <= HEALTH_OUTBOX_MAX_AGE_SECONDS,
+        "running": outbox_dispatcher.running,
+        "pending": counts["pending"],
+        "max_pending": HEALTH_OUTBOX_MAX_PENDING,
+        "oldest_pending_age_s": counts["oldest_pending_age_s"],
+        "max_age_s": HEALTH_OUTBOX_MAX_AGE_SECONDS,
+    }
+
+
+READINESS_CHECKS: dict[str, Callable[[], dict]] = {
+    "db": check_db,
+    "scheduler": check_scheduler,
+    "inbound_queue": check_inbound_queue,
+    "outbox": check_outbox,
+}
+
+
+def check_readiness() -> dict:
+    """
+    Roda as checagens de prontidão, cada uma com sua latência.
+
+    Com o banco fora, as checagens que dependem dele (outbox) não são
+    executadas: falham na hora em vez de esperar o timeout do pool.
+
+    Returns:
+        {"ready": bool, "duration_ms": float, "checks": {nome: {"ok", "latency_ms", ...}}}
+    """
+    started = time.perf_counter()
+    checks: dict[str, dict] = {}
+    for name, check in READINESS_CHECKS.items():
+        check_started = time.perf_counter()
+        if name == "outbox" and not checks.get("db", {}).get("ok", True):
+            result = {"ok": False, "error": "banco indisponível"}
+        else:
+            try:
+                result = check()
+            except Exception as e:
+                result = {"ok": False, "error": repr(e)[:200]}
+        result["latency_ms"] = round((time.perf_counter() - check_started) * 1000, 3)
+        checks[name] = result
+
+    ready = all(result["ok"] for result in checks.values())
+    if not ready:
+        failing = [name for name, result in checks.items() if not result["ok"]]
+        logger.warning("Instância não está pronta", extra=kv(failing=",".join(failing)))
+    return {
+        "ready": ready,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+        "checks": checks,
+    }
@@ -0,0 +1,258 @@
+"""
+Processamento de mensagens recebidas.
+
+- `run_conversation_turn`: um turno completo (carrega sessão, máquina de estados,
+  persiste o novo estado) em uma única transação; compartilhado pelos canais
+- `InboundQueue`: fila asyncio em processo com N workers, usada pelo webhook do
+  WhatsApp para responder 200 imediatamente e processar em segundo plano
+
+Ordem por cliente:
+- A fila é particionada por hash do client_key (uma partição por worker), então
+  mensagens de um mesmo cliente são processadas em ordem de chegada e clientes
+  diferentes em paralelo
+- `run_conversation_turn` também segura um lock por chave (striped), cobrindo o
+  web chat
+- O webhook nunca processa fora da fila: sem vaga na partição, responde 503 e a
+  Meta reenvia (uma mensagem nova nunca passa na frente das enfileiradas)
+- O lock de escrita do SQLite só é pego nas escritas do turno (agendamento, id
+  da mensagem, estado, outbox); sessão, NLU e disponibilidade são lidas sem
+  ele. Se outra conexão ou processo gravou o estado no meio, state_version não
+  confere ao salvar e o turno é refeito
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+from app.core.config import (
+    INBOUND_WORKERS, INBOUND_QUEUE_MAXSIZE, INBOUND_DRAIN_TIMEOUT_SECONDS, INBOUND_SUBMIT_TIMEOUT_SECONDS,
+    CONVERSATION_LOCK_STRIPES, CONVERSATION_STALE_RETRIES,
+)
+from app.core.locks import StripedLock, key_shard
+from app.core.logging import get_logger, kv
+from app.core.metrics import counter, histogram
+from app.repositories.clients_repo import client_session, StaleSessionError
+from app.services.conversation import handle_message
+from app.services.dedupe import message_deduper
+
+logger = get_logger(__name__)
+
+conversation_locks = StripedLock(CONVERSATION_LOCK_STRIPES)
+
+TURN_SECONDS = histogram(
+    "barbershop_turn_duration_seconds",
+    "Duração de um turno de conversa (lock + sessão + máquina de estados + persistência)",
+    ("channel",),
+)
+STATE_TRANSITIONS = counter(
+    "barbershop_state_transitions_total",
+    "Transições de estado da conversa",
+    ("state", "next_state"),
+)
+
+
+def run_conversation_turn(
+    client_key: str,
+    message: str,
+    on_reply: Callable[[str, list[dict]], None] | None = None,
+    message_id: str | None = None,
+) -> tuple[str, str, str, list[dict]] | None:
+    """
+    Processa uma mensagem do cliente e persiste o novo estado.
+
+    Args:
+        client_key: Identificador do cliente (web: client_id; WhatsApp: wa:<phone>)
+        message: Texto recebido
+        on_reply: Chamado com (reply, buttons) dentro da transação do turno
+            (ex: gravar a resposta na outbox junto com o novo estado)
+        message_id: Id da mensagem no canal (WhatsApp); registrado na mesma
+            transação do turno, então só conta como processado se o turno gravar
+
+    Returns:
+        (reply, state anterior, próximo state, buttons), ou None se `message_id`
+        já tinha sido processado (reentrega)
+    """
+    started = time.perf_counter()
+    with conversation_locks.lock_for(client_key):
+        for attempt in range(CONVERSATION_STALE_RETRIES + 1):
+            try:
+                result = _conversation_turn(client_key, message, on_reply, message_id)
+                break
+            except StaleSessionError:
+                if attempt == CONVERSATION_STALE_RETRIES:
+                    raise
+                # A transação foi desfeita (inclusive agendamentos e outbox do turno)
+                logger.warning("Estado desatualizado; refazendo turno", extra=kv(client_key=client_key, attempt=attempt + 1))
+    if result is None:
+        return None
+
+    _, state, next_state, _ = result
+    STATE_TRANSITIONS.inc(state, next_state)
+    TURN_SECONDS.observe(time.perf_counter() - started, "whatsapp" if client_key.startswith("wa:") else "web")
+    return result
+
+
+class _AlreadyProcessed(Exception):
+    """O id da mensagem já foi registrado por outro turno (desfaz o turno atual)."""
+
+
+def _conversation_turn(
+    client_key: str,
+    message: str,
+    on_reply: Callable[[str, list[dict]], None] | None,
+    message_id: str | None,
+) -> tuple[str, str, str, list[dict]] | None:
+    # Reentrega recente: descarta sem rodar o turno
+    if message_id and message_deduper.seen(message_id):
+        return None
+    try:
+        with client_session(client_key) as session:
+            state, ctx = session.state, session.ctx
+            # Injeta client_key no contexto para permitir criação de appointment na service layer
+            if isinstance(ctx, dict) and "client_key" not in ctx:
+                ctx["client_key"] = client_key
+
+            reply, next_state, next_ctx, buttons = handle_message(
+                current_state=state,
+                ctx=ctx,
+                message=message,
+            )
+
+            # O id da mensagem é gravado no mesmo COMMIT do novo estado
+            if message_id and not message_deduper.claim(message_id):
+                raise _AlreadyProcessed(message_id)
+            session.state, session.ctx = next_state, next_ctx
+            if on_reply is not None:
+                on_reply(reply, buttons)
+    except _AlreadyProcessed:
+        return None
+
+    return reply, state, next_state, buttons
+
+
+class InboundQueue:
+    """
+    Fila de trabalho assíncrona com workers em processo, particionada por chave.
+
+    Cada item é uma corrotina (função + argumentos) associada a uma chave; cada
+    worker consome uma partição, então itens da mesma chave rodam em ordem.
+    `submit` nunca bloqueia: retorna False se a fila não estiver rodando ou a
+    partição estiver cheia. `put` espera um pouco por vaga na partição; o
+    webhook usa `put` e responde 503 quando não consegue enfileirar.
+    """
+
+    def __init__(self, workers: int = INBOUND_WORKERS, maxsize: int = INBOUND_QUEUE_MAXSIZE):
+        self.workers = workers
+        self.maxsize = maxsize
+        self._queues: list[asyncio.Queue] | None = None
+        self._tasks: list[asyncio.Task] = []
+        self.submitted = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.lag_last = 0.0
+        self.lag_max = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._queues is not None
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        shard_size = max(1, -(-self.maxsize // self.workers))
+        self._queues = [asyncio.Queue(maxsize=shard_size) for _ in range(self.workers)]
+        self._tasks = [
+            asyncio.create_task(self._worker(i, queue), name=f"inbound-worker-{i}")
+            for i, queue in enumerate(self._queues)
+        ]
+        logger.info("Fila de entrada iniciada", extra=kv(workers=self.workers, maxsize=self.maxsize))
+
+    def submit(self, key: str, func: Callable[..., Awaitable[None]], *args) -> bool:
+        """Enfileira `func(*args)` na partição de `key`; False se não foi possível enfileirar."""
+        queues = self._queues
+        if queues is None:
+            return False
+        try:
+            queues[key_shard(key, len(queues))].put_nowait((time.monotonic(), func, args))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            logger.warning("Fila de entrada cheia")
+            return False
+        self.submitted += 1
+        return True
+
+    async def put(
+        self,
+        key: str,
+        func: Callable[..., Awaitable[None]],
+        *args,
+        timeout: float = INBOUND_SUBMIT_TIMEOUT_SECONDS,
+    ) -> bool:
+        """Como `submit`, mas com a partição cheia espera até `timeout` por vaga."""
+        queues = self._queues
+        if queues is None:
+            return False
+        queue = queues[key_shard(key, len(queues))]
+        try:
+            # Quem espera na partição entra em ordem de chegada (FIFO do asyncio.Queue)
+            await asyncio.wait_for(queue.put((time.monotonic(), func, args)), timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            logger.warning("Fila de entrada cheia", extra=kv(key=key))
+            return False
+        self.submitted += 1
+        return True
+
+    async def join(self) -> None:
+        """Espera os itens já enfileirados terminarem (a fila continua rodando)."""
+        if self._queues is not None:
+            await asyncio.gather(*(q.join() for q in self._queues))
+
+    async def _worker(self, index: int, queue: asyncio.Queue) -> None:
+        while True:
+            enqueued_at, func, args = await queue.get()
+            lag = time.monotonic() - enqueued_at
+            self.lag_last = lag
+            self.lag_max = max(self.lag_max, lag)
+            try:
+                await func(*args)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error("Erro no worker de entrada: %s", e, exc_info=True, extra=kv(worker=index))
+            finally:
+                queue.task_done()
+
+    async def stop(self, timeout: float = INBOUND_DRAIN_TIMEOUT_SECONDS) -> None:
+        """Para de aceitar itens, espera a fila esvaziar (até `timeout`) e encerra os workers."""
+        if self._queues is None:
+            return
+        queues, self._queues = self._queues, None
+        try:
+            await asyncio.wait_for(asyncio.gather(*(q.join() for q in queues)), timeout)
+        except asyncio.TimeoutError:
+            pending = sum(q.qsize() for q in queues)
+            logger.warning("Fila de entrada encerrada com itens pendentes", extra=kv(pending=pending))
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("Fila de entrada encerrada")
+
+    def stats(self) -> dict:
+        """Gauges: profundidade da fila e atraso (enfileirado -> início do processamento)."""
+        return {
+            "running": self.running,
+            "workers": self.workers,
+            "depth": sum(q.qsize() for q in self._queues) if self._queues is not None else 0,
+            "maxsize": self.maxsize,
+            "submitted": self.submitted,
+            "processed": self.processed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "lag_ms_last": round(self.lag_last * 1000, 3),
+            "lag_ms_max": round(self.lag_max * 1000, 3),
+        }
+
+
+inbound_queue = InboundQueue()
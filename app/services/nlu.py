@@ -1,52 +1,179 @@
-def detect_intent(message: str) -> str:
-    """
-    Detecta a intenção do usuário na mensagem.
-    
-    Intents suportadas:
-    - BOOKING: Agendar novo horário
-    - CANCEL: Cancelar agendamento
-    - REMARK: Remarcar agendamento existente
-    - GREETING: Saudação
-    - UNKNOWN: Não compreendido
-    """
-    msg = message.lower().strip()
+"""
+Detecção de intenção por palavras-chave.
+
+As palavras-chave de todas as intents são compiladas uma única vez (no import)
+em uma regex de alternação de literais com fronteiras de palavra (cada
+palavra-chave com e sem acentos), aplicada à mensagem em minúsculas:
+
+- "oi" não casa dentro de "noite"/"horário" e "marcar" não casa dentro de "remarcar"
+- Uma única passada encontra todas as palavras-chave (inclusive sobrepostas,
+  ex: "outro horário" e "horário"), e `match_intents` devolve todas as intents
+  encontradas ordenadas por prioridade
+- `detect_intent` mantém a regra de sempre: a intent de maior prioridade
+  (BOOK > CANCEL > REMARK > GREETING) ou UNKNOWN
+"""
+import re
+from typing import NamedTuple
+
+from app.core.text import normalize_text
 
-    # === BOOK_APPOINTMENT ===
-    book_keywords = [
+# Intent -> palavras-chave, em ordem de prioridade (a primeira vence)
+INTENT_KEYWORDS: dict[str, tuple[str, ...]] = {
+    "BOOK_APPOINTMENT": (
         "agendar", "marcar", "marcação", "marcar horário", "horário", "horario",
         "quero agendar", "preciso agendar", "quer agendar", "quer marcar",
         "gostaria de marcar", "gostaria de agendar", "novo agendamento",
-    ]
-    if any(k in msg for k in book_keywords):
-        return "BOOK_APPOINTMENT"
-
-    # === CANCEL_APPOINTMENT ===
-    cancel_keywords = [
+    ),
+    "CANCEL_APPOINTMENT": (
         "cancelar", "desmarcar", "desmarcar horário", "cancelamento",
         "não vou", "não posso", "não dá", "nem vou", "esqueci",
         "marcar diferente", "outra data", "outro horário", "outro dia",
         "voltar", "recomeçar", "começar de novo",
-    ]
-    if any(k in msg for k in cancel_keywords):
-        return "CANCEL_APPOINTMENT"
-
-    # === REMARK_APPOINTMENT ===
-    remark_keywords = [
+    ),
+    "REMARK_APPOINTMENT": (
         "remarcar", "mudar", "trocar", "alterar", "modificar", "adiar",
         "antecipar", "outra hora", "outro horário", "não é possível",
         "precisa mudar", "posso mudar", "acha que muda",
-    ]
-    if any(k in msg for k in remark_keywords):
-        return "REMARK_APPOINTMENT"
-
-    # === GREETING ===
-    greeting_keywords = [
+    ),
+    "GREETING": (
         "oi", "olá", "ola", "bom dia", "boa tarde", "boa noite",
         "e aí", "eae", "tudo bem", "tudo certo", "opa", "oopa",
         "hey", "opa blz", "blz", "e ai", "tudo bem com você",
-    ]
-    if any(k in msg for k in greeting_keywords):
-        return "GREETING"
+    ),
+}
+
+INTENT_PRIORITY: dict[str, int] = {intent: i for i, intent in enumerate(INTENT_KEYWORDS)}
+
+class IntentMatch(NamedTuple):
+    intent: str
+    priority: int  # 0 = maior prioridade
+    keyword: str  # palavra-chave (sem acentos) da primeira ocorrência
+    start: int  # posição na mensagem
+
+
+def _build_matcher():
+    # Cada palavra-chave entra com e sem acentos ("não vou" e "nao vou"): a
+    # mensagem só precisa de lower(), e a alternação continua só de literais
+    # (o `re` acha candidatos bem mais rápido que com classes de caracteres)
+    canonical: dict[str, str] = {}
+    keyword_intents: dict[str, set[str]] = {}
+    for intent, keywords in INTENT_KEYWORDS.items():
+        for keyword in keywords:
+            folded = normalize_text(keyword)
+            keyword_intents.setdefault(folded, set()).add(intent)
+            canonical[keyword.lower()] = folded
+            canonical[folded] = folded
+
+    # A varredura não sobrepõe ocorrências. Cada palavra-chave herda as intents
+    # das palavras-chave que contém ("marcar" em "marcar diferente"); onde outra
+    # pode começar dentro dela e passar do fim ("posso mudar" em "nao posso
+    # mudar"), guarda o deslocamento para conferir à parte.
+    closure: dict[str, frozenset[str]] = {}
+    for keyword, intents in keyword_intents.items():
+        contained = set(intents)
+        for other, other_intents in keyword_intents.items():
+            if other != keyword and f" {other} " in f" {keyword} ":
+                contained |= other_intents
+        closure[keyword] = frozenset(contained)
+
+    variant_intents: dict[str, frozenset[str]] = {}
+    inner_starts: dict[str, tuple[int, ...]] = {}
+    for variant, folded in canonical.items():
+        variant_intents[variant] = closure[folded]
+        words = folded.split(" ")
+        offsets = tuple(
+            len(" ".join(words[:i])) + 1
+            for i in range(1, len(words))
+            if any(other.startswith(" ".join(words[i:]) + " ") for other in keyword_intents)
+        )
+        if offsets:
+            inner_starts[variant] = offsets
+
+    alternation = _trie_regex(list(canonical))
+    scan = re.compile(r"\b" + alternation + r"\b")
+    at = re.compile(alternation + r"\b")
+    return scan, at, canonical, variant_intents, inner_starts
+
+
+def _trie_regex(words: list[str]) -> str:
+    """
+    Alternação fatorada por prefixo comum ("marca(?:r(?: horario)?|cao)").
 
-    # === UNKNOWN ===
-    return "UNKNOWN"
+    Em cada posição o `re` testa no máximo um ramo por caractere, em vez de
+    todas as palavras-chave. Os quantificadores são gulosos: casa a maior
+    palavra-chave possível naquela posição.
+    """
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def _render(node: dict) -> str:
+        branches = [re.escape(ch) + _render(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            return ("(?:" + body + ")?") if len(branches) == 1 else body + "?"
+        return body
+
+    return "(?:" + _render(trie) + ")"
+
+
+_KEYWORD_SCAN, _KEYWORD_AT, _CANONICAL, _VARIANT_INTENTS, _INNER_STARTS = _build_matcher()
+_INTENTS = tuple(INTENT_KEYWORDS)
+# Palavra-chave -> prioridade da melhor intent que ela indica
+_VARIANT_BEST = {k: min(INTENT_PRIORITY[i] for i in intents) for k, intents in _VARIANT_INTENTS.items()}
+
+
+def _iter_keywords(text: str):
+    """(palavra-chave, posição) de todas as ocorrências na mensagem (já em minúsculas)."""
+    for m in _KEYWORD_SCAN.finditer(text):
+        keyword = m.group()
+        yield keyword, m.start()
+        for offset in _INNER_STARTS.get(keyword, ()):
+            inner = _KEYWORD_AT.match(text, m.start() + offset)
+            if inner:
+                yield inner.group(), inner.start()
+
+
+def match_intents(message: str) -> list[IntentMatch]:
+    """
+    Encontra todas as intents presentes na mensagem (uma passada pela regex).
+
+    Returns:
+        Uma IntentMatch por intent, da maior para a menor prioridade
+    """
+    found: dict[str, IntentMatch] = {}
+    for keyword, start in _iter_keywords(message.lower()):
+        for intent in _VARIANT_INTENTS[keyword]:
+            if intent not in found:
+                found[intent] = IntentMatch(intent, INTENT_PRIORITY[intent], _CANONICAL[keyword], start)
+    return sorted(found.values(), key=lambda match: match.priority)
+
+
+def detect_intent(message: str) -> str:
+    """
+    Detecta a intenção do usuário na mensagem.
+
+    Intents suportadas:
+    - BOOKING: Agendar novo horário
+    - CANCEL: Cancelar agendamento
+    - REMARK: Remarcar agendamento existente
+    - GREETING: Saudação
+    - UNKNOWN: Não compreendido
+    """
+    text = message.lower()
+    best = len(_INTENTS)
+    for m in _KEYWORD_SCAN.finditer(text):
+        keyword = m.group()
+        if keyword in _INNER_STARTS:
+            # Pode esconder uma palavra-chave sobreposta: caminho completo
+            best = min(best, min(_VARIANT_BEST[k] for k, _ in _iter_keywords(text)))
+            break
+        best = min(best, _VARIANT_BEST[keyword])
+        if best == 0:
+            break
+    return _INTENTS[best] if best < len(_INTENTS) else "UNKNOWN"
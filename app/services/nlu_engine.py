@@ -0,0 +1,228 @@
+"""
+Motores de NLU: intent + entidades (data, horário, barbeiro, serviço).
+
+O orquestrador só conhece a interface `NLUEngine`, então o motor por
+palavras-chave pode ser trocado por um modelo (ou LLM) sem mexer na máquina de
+estados:
+
+- `analyze(message)` -> NLUResult
+- `analyze_batch(messages)` -> um NLUResult por mensagem; textos repetidos no
+  lote são analisados uma única vez e motores de modelo recebem o lote inteiro
+
+Resultados ficam num cache LRU chaveado pelo texto normalizado (minúsculas, sem
+acentos e sem pontuação nas pontas: "Sim!" e "sim" são a mesma chave), pela
+versão do catálogo (nomes de barbeiros/serviços) e pelo dia (datas sem ano).
+O motor é escolhido por NLU_ENGINE.
+"""
+import datetime as dt
+import importlib
+import re
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from app.core.config import NLU_ENGINE, NLU_CACHE_MAX_ENTRIES
+from app.core.logging import get_logger
+from app.core.timezone import today_br
+from app.core.tracing import traced
+from app.repositories.catalog_cache import get_catalog_version
+from app.services.entities import extract_entities
+from app.services.nlu import INTENT_KEYWORDS, INTENT_PRIORITY, match_intents, normalize_text
+
+logger = get_logger(__name__)
+
+_EDGE_PUNCTUATION = " .,;:!?¡¿\"'()"
+_WORDS = re.compile(r"\w+")
+
+
+@dataclass(frozen=True)
+class NLUResult:
+    intent: str  # intent de maior prioridade (ou UNKNOWN)
+    intents: tuple[str, ...] = ()  # todas as intents encontradas, por prioridade
+    date: dt.date | None = None
+    time: dt.time | None = None
+    barber_id: int | None = None
+    barber_name: str | None = None
+    service_id: int | None = None
+    service_name: str | None = None
+
+
+def normalize_message(message: str) -> str:
+    """Chave de cache/análise: texto normalizado sem pontuação nas pontas ("Sim!" -> "sim")."""
+    return normalize_text(message).strip(_EDGE_PUNCTUATION)
+
+
+class NLUEngine(ABC):
+    """
+    Interface dos motores de NLU, com cache LRU de resultados.
+
+    Subclasses implementam `classify` (intents de um lote de textos
+    normalizados) e podem sobrescrever `extract` (entidades).
+    """
+
+    name = "base"
+
+    def __init__(self, cache_max_entries: int = NLU_CACHE_MAX_ENTRIES):
+        self.cache_max_entries = cache_max_entries
+        self._cache: OrderedDict[tuple, NLUResult] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @abstractmethod
+    def classify(self, texts: list[str]) -> list[tuple[str, ...]]:
+        """Intents de cada texto normalizado, da maior para a menor prioridade."""
+
+    def extract(self, text: str) -> dict:
+        """Entidades de um texto normalizado (campos de NLUResult)."""
+        return extract_entities(text)
+
+    def analyze(self, message: str) -> NLUResult:
+        return self.analyze_batch([message])[0]
+
+    @traced("nlu.analyze")
+    def analyze_batch(self, messages: list[str]) -> list[NLUResult]:
+        """
+        Analisa um lote de mensagens.
+
+        Returns:
+            Um NLUResult por mensagem, na mesma ordem
+        """
+        # Nomes do catálogo e datas relativas mudam o resultado de um mesmo texto
+        scope = (get_catalog_version(), today_br())
+        texts = [normalize_message(m) for m in messages]
+
+        found: dict[str, NLUResult] = {}
+        with self._lock:
+            for text in texts:
+                if text in found:
+                    continue
+                result = self._cache.get((scope, text))
+                if result is not None:
+                    self._cache.move_to_end((scope, text))
+                    found[text] = result
+                    self.hits += 1
+
+        missing = [text for text in dict.fromkeys(texts) if text not in found]
+        if missing:
+            for text, intents in zip(missing, self.classify(missing)):
+                found[text] = NLUResult(
+                    intent=intents[0] if intents else "UNKNOWN",
+                    intents=tuple(intents),
+                    **self.extract(text),
+                )
+            with self._lock:
+                self.misses += len(missing)
+                for text in missing:
+                    self._cache[(scope, text)] = found[text]
+                while len(self._cache) > self.cache_max_entries:
+                    self._cache.popitem(last=False)
+
+        return [found[text] for text in texts]
+
+    def clear_cache(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"engine": self.name, "entries": len(self._cache), "hits": self.hits, "misses": self.misses}
+
+
+class RuleBasedEngine(NLUEngine):
+    """Motor padrão: palavras-chave com fronteiras de palavra (`nlu.match_intents`)."""
+
+    name = "rules"
+
+    def classify(self, texts: list[str]) -> list[tuple[str, ...]]:
+        return [tuple(m.intent for m in match_intents(text)) for text in texts]
+
+
+def _trigrams(word: str) -> frozenset[str]:
+    padded = f" {word} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class TrigramModelEngine(NLUEngine):
+    """
+    Modelo local de trigramas de caracteres (substituto de um modelo/LLM).
+
+    Uma palavra-chave é reconhecida quando cada uma de suas palavras tem, na
+    mensagem, uma palavra com pelo menos `threshold` dos seus trigramas.
+    Palavras que já são do vocabulário só casam com elas mesmas ("remarcar" não
+    vira "marcar"). Tolera erros de digitação ("cancelr", "agenda") ao custo de
+    alguns falsos positivos a mais que o motor de regras.
+    """
+
+    name = "trigram"
+
+    def __init__(self, threshold: float = 0.6, **kwargs):
+        super().__init__(**kwargs)
+        self.threshold = threshold
+        self._keywords = {
+            (intent, tuple((w, _trigrams(w)) for w in normalize_text(k).split()))
+            for intent, keywords in INTENT_KEYWORDS.items()
+            for k in keywords
+        }
+        self._vocabulary = {w for _, words in self._keywords for w, _ in words}
+
+    def _word_matches(self, keyword_word: str, grams: frozenset[str], word: str, word_grams: frozenset[str]) -> bool:
+        if word == keyword_word:
+            return True
+        return word not in self._vocabulary and len(grams & word_grams) >= self.threshold * len(grams)
+
+    def classify(self, texts: list[str]) -> list[tuple[str, ...]]:
+        results = []
+        for text in texts:
+            words = [(w, _trigrams(w)) for w in _WORDS.findall(text)]
+            intents = {
+                intent for intent, keyword in self._keywords
+                if all(any(self._word_matches(kw, grams, w, wg) for w, wg in words) for kw, grams in keyword)
+            }
+            results.append(tuple(sorted(intents, key=INTENT_PRIORITY.__getitem__)))
+        return results
+
+
+ENGINES: dict[str, type[NLUEngine]] = {
+    RuleBasedEngine.name: RuleBasedEngine,
+    TrigramModelEngine.name: TrigramModelEngine,
+}
+
+_engine: NLUEngine | None = None
+_engine_lock = threading.Lock()
+
+
+def load_nlu_engine(spec: str) -> NLUEngine:
+    """
+    Instancia um motor pelo nome registrado ("rules", "trigram") ou por
+    caminho "pacote.modulo:Classe".
+
+    Raises:
+        ValueError: Motor desconhecido ou classe que não é um NLUEngine
+    """
+    cls = ENGINES.get(spec)
+    if cls is None and ":" in spec:
+        module_name, _, attr = spec.partition(":")
+        cls = getattr(importlib.import_module(module_name), attr, None)
+    if not (isinstance(cls, type) and issubclass(cls, NLUEngine)):
+        raise ValueError(f"Motor de NLU desconhecido: {spec}")
+    return cls()
+
+
+def get_nlu_engine() -> NLUEngine:
+    """Motor configurado em NLU_ENGINE (criado no primeiro uso)."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = load_nlu_engine(NLU_ENGINE)
+                logger.info("Motor de NLU: %s", _engine.name)
+    return _engine
+
+
+def set_nlu_engine(engine: NLUEngine | None) -> None:
+    """Troca o motor em uso (None volta ao configurado em NLU_ENGINE no próximo uso)."""
+    global _engine
+    with _engine_lock:
+        _engine = engine
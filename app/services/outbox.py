@@ -0,0 +1,230 @@
+"""
+Dispatcher da outbox (fila de saída persistente).
+
+Mensagens são gravadas em `outbox` na mesma transação da mudança de estado que
+as gerou (resposta do turno, lembrete marcado como enviado). O dispatcher:
+
+- Busca lotes de mensagens devidas, no máximo uma por destinatário (a mais
+  antiga pendente), preservando a ordem de entrega por destinatário
+- Envia respeitando um limite global de taxa (token bucket)
+- Em falha, reagenda com backoff exponencial; após OUTBOX_MAX_ATTEMPTS,
+  move para dead-letter (status 'dead')
+- Mede cada envio (p95 em `stats()` e `barbershop_outbox_send_duration_seconds`)
+  e conta as retentativas (envios de mensagens que já falharam antes)
+- Acorda após o COMMIT de novas mensagens e, sem novidades, a cada OUTBOX_POLL_SECONDS
+"""
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Awaitable, Callable
+
+from app.core.config import (
+    OUTBOX_BATCH_SIZE, OUTBOX_POLL_SECONDS,
+    OUTBOX_RATE_PER_SECOND, OUTBOX_RATE_BURST,
+    OUTBOX_MAX_ATTEMPTS, OUTBOX_RETRY_BASE_SECONDS, OUTBOX_RETRY_MAX_SECONDS,
+    WHATSAPP_ACCESS_TOKEN, WHATSAPP_PHONE_ID,
+)
+from app.core.logging import get_logger, kv
+from app.core.metrics import histogram
+from app.core.rate_limit import TokenBucket
+from app.core.tracing import trace, traced
+from app.integrations.channels.whatsapp import send_message_via_graph_api
+from app.repositories.outbox_repo import (
+    add_outbox_listener,
+    list_due_messages,
+    mark_outbox_sent,
+    mark_outbox_failed,
+    get_outbox_counts,
+)
+
+logger = get_logger(__name__)
+
+# Transporte por canal: (destinatário, payload) -> enviado?
+Transport = Callable[[str, dict], Awaitable[bool]]
+
+SEND_SECONDS = histogram(
+    "barbershop_outbox_send_duration_seconds",
+    "Duração de cada tentativa de envio da outbox pelo transporte do canal",
+    ("channel",),
+)
+
+
+async def _send_whatsapp(recipient: str, payload: dict) -> bool:
+    return await send_message_via_graph_api(
+        phone=recipient,
+        text=payload["text"],
+        buttons=payload.get("buttons") or [],
+        access_token=WHATSAPP_ACCESS_TOKEN,
+        phone_id=WHATSAPP_PHONE_ID,
+    )
+
+
+@traced("channel.web")
+async def _send_web(recipient: str, payload: dict) -> bool:
+    # Web chat não tem push: a mensagem fica registrada (mock)
+    logger.info("[OUTBOX] Mensagem (web): %.50s...", payload["text"], extra=kv(recipient=recipient))
+    return True
+
+
+def _p95(values) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(len(ordered) * 0.95) - 1)] if ordered else 0.0
+
+
+def retry_delay(attempts: int) -> float:
+    """Backoff exponencial após `attempts` tentativas falhas (1, 2, ...)."""
+    return min(OUTBOX_RETRY_MAX_SECONDS, OUTBOX_RETRY_BASE_SECONDS * (2 ** (attempts - 1)))
+
+
+class OutboxDispatcher:
+    """Loop assíncrono que entrega as mensagens pendentes da outbox."""
+
+    def __init__(
+        self,
+        transports: dict[str, Transport] | None = None,
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        rate_per_second: float = OUTBOX_RATE_PER_SECOND,
+        max_attempts: int = OUTBOX_MAX_ATTEMPTS,
+        poll_seconds: float = OUTBOX_POLL_SECONDS,
+    ):
+        self.transports = transports or {"whatsapp": _send_whatsapp, "web": _send_web}
+        self.batch_size = batch_size
+        self.rate_per_second = rate_per_second
+        self.max_attempts = max_attempts
+        self.poll_seconds = poll_seconds
+        self._task: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._stopping = False
+        self.sent = 0
+        self.failed_attempts = 0
+        self.retried = 0
+        self.dead = 0
+        self._latencies: deque[float] = deque(maxlen=1000)  # criação -> envio (s)
+        self._send_latencies: deque[float] = deque(maxlen=1000)  # chamada ao transporte (s)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run(), name="outbox-dispatcher")
+        logger.info("Dispatcher da outbox iniciado")
+
+    def wake(self) -> None:
+        """Acorda o dispatcher (thread-safe; chamado após o COMMIT de novas mensagens)."""
+        loop, event = self._loop, self._wakeup
+        if loop is None or event is None or loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(event.set)
+        except RuntimeError:
+            pass  # loop encerrado
+
+    async def stop(self) -> None:
+        """Termina o lote em andamento e para; pendentes continuam persistidos."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+        self._loop = None
+        logger.info("Dispatcher da outbox parado")
+
+    async def _run(self) -> None:
+        bucket = TokenBucket(self.rate_per_second, burst=OUTBOX_RATE_BURST)
+        while not self._stopping:
+            # Limpa antes de buscar: um wake() durante o lote não se perde
+            self._wakeup.clear()
+            try:
+                processed = await self.dispatch_once(bucket)
+            except Exception as e:
+                logger.error("[OUTBOX] Erro no dispatcher: %s", e, exc_info=True)
+                processed = 0
+            if processed >= self.batch_size:
+                continue  # ainda há fila: próximo lote sem esperar
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    async def dispatch_once(self, bucket: TokenBucket | None = None) -> int:
+        """
+        Envia um lote de mensagens devidas.
+
+        Returns:
+            Quantidade de mensagens processadas (enviadas ou com falha)
+        """
+        batch = await asyncio.to_thread(list_due_messages, time.time(), self.batch_size)
+        if not batch:
+            return 0
+        bucket = bucket or TokenBucket(self.rate_per_second, burst=OUTBOX_RATE_BURST)
+        with trace("outbox.dispatch", batch=len(batch)) as current:
+            results = await asyncio.gather(*(self._deliver(msg, bucket) for msg in batch))
+
+            now = time.time()
+            sent_ids = [msg["id"] for msg, (ok, _) in zip(batch, results) if ok]
+            await asyncio.to_thread(mark_outbox_sent, sent_ids, now)
+            if current is not None:
+                current.attrs["sent"] = len(sent_ids)
+
+        for msg, (ok, error) in zip(batch, results):
+            if ok:
+                self.sent += 1
+                self._latencies.append(now - msg["created_at"])
+                continue
+            self.failed_attempts += 1
+            attempts = msg["attempts"] + 1
+            if attempts >= self.max_attempts:
+                self.dead += 1
+                logger.error("[OUTBOX] Mensagem em dead-letter: %s", error, extra=kv(id=msg["id"], recipient=msg["recipient"]))
+                await asyncio.to_thread(mark_outbox_failed, msg["id"], error, None)
+            else:
+                await asyncio.to_thread(mark_outbox_failed, msg["id"], error, now + retry_delay(attempts))
+        return len(batch)
+
+    async def _deliver(self, msg: dict, bucket: TokenBucket) -> tuple[bool, str]:
+        transport = self.transports.get(msg["channel"])
+        if transport is None:
+            return False, f"canal desconhecido: {msg['channel']}"
+        await bucket.acquire()
+        if msg["attempts"] > 0:
+            self.retried += 1
+        started = time.perf_counter()
+        try:
+            if await transport(msg["recipient"], msg["payload"]):
+                return True, ""
+            return False, "envio recusado"
+        except Exception as e:
+            return False, repr(e)[:500]
+        finally:
+            elapsed = time.perf_counter() - started
+            self._send_latencies.append(elapsed)
+            SEND_SECONDS.observe(elapsed, msg["channel"])
+
+    def stats(self) -> dict:
+        """
+        Profundidade da fila (banco), latência de entrega (criação -> envio) e
+        de cada envio (chamada ao transporte).
+        """
+        return {
+            "running": self.running,
+            **get_outbox_counts(),
+            "sent": self.sent,
+            "failed_attempts": self.failed_attempts,
+            "retried": self.retried,
+            "dead_lettered": self.dead,
+            "latency_ms_p95": round(_p95(self._latencies) * 1000, 3),
+            "send_ms_p95": round(_p95(self._send_latencies) * 1000, 3),
+        }
+
+
+outbox_dispatcher = OutboxDispatcher()
+add_outbox_listener(outbox_dispatcher.wake)
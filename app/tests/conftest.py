@@ -0,0 +1,39 @@
+"""
+Fixtures compartilhadas pelos testes que semeiam o banco.
+"""
+import pytest
+
+from app.repositories.db import init_db, get_conn
+
+# Tabelas semeadas pelos testes (ordem respeita as chaves estrangeiras)
+SEEDED_TABLES = ("outbox", "appointments", "clients", "services", "barbers")
+
+
+def _reset_tables() -> None:
+    """Remove os dados semeados e zera os AUTOINCREMENT para os próximos módulos."""
+    conn = get_conn()
+    try:
+        for table in SEEDED_TABLES:
+            conn.execute(f"DELETE FROM {table}")
+        conn.execute("DELETE FROM sqlite_sequence")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def clean_db():
+    """Banco sem dados semeados antes e depois de cada teste."""
+    init_db()
+    _reset_tables()
+    yield
+    _reset_tables()
+
+
+@pytest.fixture(scope="module")
+def clean_db_module():
+    """Banco sem dados semeados no início e no fim do módulo."""
+    init_db()
+    _reset_tables()
+    yield
+    _reset_tables()
@@ -0,0 +1,269 @@
+"""
+Testes para cálculo de disponibilidade e consultas sargáveis por dia/epoch.
+"""
+import pytest
+from datetime import date, datetime, timedelta, time
+from zoneinfo import ZoneInfo
+
+from app.services.availability import generate_suggestions
+from app.services.availability_index import BUSY, availability_index, hhmm_to_minute
+from app.repositories.appointments_repo import BUSY_INTERVALS_SQL
+from app.repositories.db import get_conn
+
+TZ = ZoneInfo("America/Sao_Paulo")
+DAY = (datetime.now(TZ) + timedelta(days=7)).date()
+
+
+@pytest.fixture(scope="module")
+def barber_id(clean_db_module):
+    conn = get_conn()
+    try:
+        b_id = conn.execute("INSERT INTO barbers(name, is_active) VALUES('Disp', 1)").lastrowid
+        s_id = conn.execute(
+            "INSERT INTO services(name, duration_minutes, price_cents, is_active) VALUES('Corte', 30, 5000, 1)"
+        ).lastrowid
+        c_id = conn.execute("INSERT INTO clients(client_key) VALUES('user_disp')").lastrowid
+        # Ocupa 14:00-15:00 (gravado no fuso local, com offset)
+        start = datetime.combine(DAY, time(14, 0), tzinfo=TZ)
+        conn.execute(
+            """
+            INSERT INTO appointments(client_id, barber_id, service_id, start_at, end_at, status)
+            VALUES(?, ?, ?, ?, ?, 'scheduled')
+            """,
+            (c_id, b_id, s_id, start.isoformat(), (start + timedelta(minutes=60)).isoformat()),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    return b_id
+
+
+def test_index_marks_busy_minutes_from_epoch_columns(barber_id):
+    # O índice é montado a partir de start_epoch/end_epoch (UTC) do BUSY_INTERVALS_SQL
+    availability_index.clear()
+    mask = availability_index.get_mask(barber_id, DAY.isoformat())
+    busy = [m for m in range(hhmm_to_minute("13:00"), hhmm_to_minute("19:00")) if mask[m] == BUSY]
+    assert busy == list(range(hhmm_to_minute("14:00"), hhmm_to_minute("15:00")))
+
+
+def test_busy_query_uses_day_index(barber_id):
+    conn = get_conn()
+    try:
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN " + BUSY_INTERVALS_SQL.format(barber_ids="?", days="?"),
+            (barber_id, DAY.isoformat()),
+        ).fetchall()
+    finally:
+        conn.close()
+    details = " ".join(r[3] for r in plan)
+    assert "idx_appointments_barber_status_day" in details
+    assert "day=?" in details
+    assert "SCAN appointments" not in details
+
+
+def test_reminder_query_uses_status_day_index(barber_id):
+    from app.jobs.reminders_24h import REMINDER_CANDIDATES_SQL
+
+    conn = get_conn()
+    try:
+        plan = conn.execute("EXPLAIN QUERY PLAN " + REMINDER_CANDIDATES_SQL, (DAY.isoformat(),)).fetchall()
+    finally:
+        conn.close()
+    details = " ".join(r[3] for r in plan)
+    assert "idx_appointments_status_day" in details
+    assert "SCAN appointments" not in details
+
+
+def test_suggestions_skip_busy_interval(barber_id):
+    suggestions = generate_suggestions(
+        date_iso=DAY.isoformat(),
+        barber_id=barber_id,
+        duration_minutes=30,
+        preferred_time=time(14, 0),
+        tz=TZ,
+        max_suggestions=3,
+    )
+    labels = [s.strftime("%H:%M") for s in suggestions]
+    assert "14:00" not in labels and "14:30" not in labels
+    assert labels == ["13:30", "13:00", "15:00"]
+
+
+def test_suggestions_respect_lunch_and_business_hours(barber_id):
+    suggestions = generate_suggestions(
+        date_iso=DAY.isoformat(),
+        barber_id=barber_id,
+        duration_minutes=60,
+        preferred_time=time(8, 0),
+        tz=TZ,
+        max_suggestions=3,
+    )
+    for s in suggestions:
+        assert time(9, 0) <= s.time()
+        assert not (time(11, 30) < s.time() < time(13, 0))
+
+
+def test_index_tracks_create_cancel_and_external_writes(barber_id):
+    from app.services.availability_index import availability_index, is_free
+    from app.repositories.appointments_repo import create_appointment, cancel_appointment
+
+    day = (DAY + timedelta(days=1)).isoformat()
+    mask = availability_index.get_mask(barber_id, day)
+    assert is_free(mask, 10 * 60, 30)
+    assert not is_free(mask, 12 * 60, 30)  # almoço
+    assert not is_free(mask, 18 * 60 + 45, 30)  # passa do expediente
+
+    conn = get_conn()
+    try:
+        row = conn.execute("SELECT id FROM clients WHERE client_key = 'user_disp'").fetchone()
+        s_id = conn.execute("SELECT id FROM services LIMIT 1").fetchone()["id"]
+    finally:
+        conn.close()
+
+    # Criação via repositório: atualização incremental (sem reconstruir)
+    start = datetime.combine(date.fromisoformat(day), time(10, 0), tzinfo=TZ)
+    appt_id = create_appointment(
+        client_id=row["id"], barber_id=barber_id, service_id=s_id,
+        start_at=start.isoformat(), end_at=(start + timedelta(minutes=30)).isoformat(),
+    )
+    misses = availability_index.stats()["misses"]
+    assert not is_free(availability_index.get_mask(barber_id, day), 10 * 60, 30)
+    assert availability_index.stats()["misses"] == misses
+
+    # Cancelamento libera o horário
+    cancel_appointment(appt_id)
+    assert is_free(availability_index.get_mask(barber_id, day), 10 * 60, 30)
+
+    # Escrita "de fora" (outra conexão/processo) é detectada pela versão do dia
+    conn = get_conn()
+    try:
+        start = datetime.combine(date.fromisoformat(day), time(16, 0), tzinfo=TZ)
+        conn.execute(
+            """
+            INSERT INTO appointments(client_id, barber_id, service_id, start_at, end_at, status)
+            VALUES(?, ?, ?, ?, ?, 'scheduled')
+            """,
+            (row["id"], barber_id, s_id, start.isoformat(), (start + timedelta(minutes=30)).isoformat()),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    assert not is_free(availability_index.get_mask(barber_id, day), 16 * 60, 30)
+
+
+def _insert_raw(barber_id: int, day, start: time, minutes: int) -> None:
+    conn = get_conn()
+    try:
+        c_id = conn.execute("SELECT id FROM clients WHERE client_key = 'user_disp'").fetchone()["id"]
+        s_id = conn.execute("SELECT id FROM services LIMIT 1").fetchone()["id"]
+        start_dt = datetime.combine(day, start, tzinfo=TZ)
+        conn.execute(
+            """
+            INSERT INTO appointments(client_id, barber_id, service_id, start_at, end_at, status)
+            VALUES(?, ?, ?, ?, ?, 'scheduled')
+            """,
+            (c_id, barber_id, s_id, start_dt.isoformat(), (start_dt + timedelta(minutes=minutes)).isoformat()),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+@pytest.fixture(scope="module")
+def full_day(barber_id):
+    """Dia lotado para o barbeiro 'Disp' e um segundo barbeiro livre."""
+    day = DAY + timedelta(days=3)
+    _insert_raw(barber_id, day, time(9, 0), 10 * 60)
+    conn = get_conn()
+    try:
+        other_id = conn.execute("INSERT INTO barbers(name, is_active) VALUES('Livre', 1)").lastrowid
+        conn.commit()
+    finally:
+        conn.close()
+    return day, other_id
+
+
+def test_search_availability_across_barbers_and_days(barber_id, full_day):
+    from app.services.availability import search_availability
+
+    day, other_id = full_day
+    now = datetime.combine(day - timedelta(days=1), time(0, 0), tzinfo=TZ)
+
+    only_disp = search_availability(day, 2, 30, time(14, 0), TZ, barber_id=barber_id, limit=2, now=now)
+    # Dia lotado: próximos horários do 'Disp' ficam no dia seguinte
+    assert [r["start"].date() for r in only_disp] == [day + timedelta(days=1)] * 2
+
+    anyone = search_availability(day, 2, 30, time(14, 0), TZ, limit=3, now=now)
+    assert anyone[0]["barber_id"] == other_id
+    assert anyone[0]["start"] == datetime.combine(day, time(14, 0), tzinfo=TZ)
+    assert [r["start"].strftime("%H:%M") for r in anyone] == ["14:00", "13:30", "14:30"]
+
+
+def test_availability_endpoint(barber_id, full_day):
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    day, other_id = full_day
+    response = TestClient(app).get(
+        "/availability",
+        params={"date": day.isoformat(), "days": 2, "time": "14h", "duration_minutes": 30, "limit": 2},
+    )
+    assert response.status_code == 200
+    slots = response.json()["slots"]
+    assert slots[0] == {
+        "barber_id": other_id,
+        "barber_name": "Livre",
+        "date": day.isoformat(),
+        "time": "14:00",
+        "start_at": datetime.combine(day, time(14, 0), tzinfo=TZ).isoformat(),
+    }
+
+    bad = TestClient(app).get("/availability", params={"time": "25:99"})
+    assert bad.status_code == 400
+
+
+def test_conversation_offers_next_free_with_anyone(barber_id, full_day):
+    from app.services.conversation import handle_message
+    from app.domain.enums import State
+
+    day, other_id = full_day
+    ctx = {
+        "client_key": "user_disp",
+        "barber_id": barber_id,
+        "barber_name": "Disp",
+        "service_id": 1,
+        "service_name": "Corte",
+        "service_duration_minutes": 30,
+        "date": day.isoformat(),
+    }
+    reply, state, ctx, buttons = handle_message(State.WAIT_TIME_PREF, ctx, "14:00")
+    assert state == State.WAIT_SLOT_PICK
+    assert buttons[0]["id"] == f"ANY_{other_id}_{day.isoformat()}_14:00"
+
+    reply, state, ctx, buttons = handle_message(State.WAIT_SLOT_PICK, ctx, buttons[0]["id"])
+    assert ctx["barber_id"] == other_id
+    assert ctx["barber_name"] == "Livre"
+    assert state in (State.CONFIRMED, State.WAIT_CONFIRMATION)
+
+
+def test_next_free_labels_fit_whatsapp_buttons(barber_id, full_day):
+    from app.domain.models import ConversationContext
+    from app.repositories.catalog_cache import invalidate_catalog
+    from app.services.conversation import BUTTON_LABEL_MAX, _next_free_with_anyone_buttons
+
+    day, _ = full_day
+    conn = get_conn()
+    try:
+        conn.execute("UPDATE barbers SET is_active = 0")
+        conn.execute("INSERT INTO barbers(name, is_active) VALUES('Carlos Silva', 1)")
+        conn.execute("INSERT INTO barbers(name, is_active) VALUES('Carlos Souza', 1)")
+        conn.commit()
+    finally:
+        conn.close()
+    invalidate_catalog()
+
+    ctx = ConversationContext.from_dict({"date": day.isoformat(), "service_duration_minutes": 30})
+    labels = [b["label"] for b in _next_free_with_anyone_buttons(ctx, time(14, 0), TZ)]
+    # Mesmo dia: data omitida; primeiro nome repetido: inicial + sobrenome
+    assert labels[:2] == ["14:00 · C. Silva", "14:00 · C. Souza"]
+    assert len(set(labels)) == len(labels)
+    assert all(len(label) <= BUTTON_LABEL_MAX for label in labels)
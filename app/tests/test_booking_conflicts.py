@@ -0,0 +1,99 @@
+"""
+Testes para detecção de conflitos de horário na criação de agendamentos.
+"""
+import pytest
+from datetime import datetime, timedelta, time
+from zoneinfo import ZoneInfo
+
+from app.repositories.appointments_repo import CONFLICT_SQL, create_appointment, cancel_appointment
+from app.repositories.db import get_conn
+
+TZ = ZoneInfo("America/Sao_Paulo")
+DAY = (datetime.now(TZ) + timedelta(days=8)).date()
+
+
+@pytest.fixture(scope="module")
+def ids(clean_db_module):
+    conn = get_conn()
+    try:
+        b_id = conn.execute("INSERT INTO barbers(name, is_active) VALUES('Conflito', 1)").lastrowid
+        s_id = conn.execute(
+            "INSERT INTO services(name, duration_minutes, price_cents, is_active) VALUES('Corte', 30, 5000, 1)"
+        ).lastrowid
+        c_id = conn.execute("INSERT INTO clients(client_key) VALUES('user_conflict')").lastrowid
+        conn.commit()
+    finally:
+        conn.close()
+    return {"client_id": c_id, "barber_id": b_id, "service_id": s_id}
+
+
+def _slot(hh: int, mm: int, minutes: int = 30, tz=TZ) -> tuple[str, str]:
+    start = datetime.combine(DAY, time(hh, mm), tzinfo=tz)
+    return start.isoformat(), (start + timedelta(minutes=minutes)).isoformat()
+
+
+def test_overlapping_appointment_is_rejected(ids):
+    start, end = _slot(10, 0)
+    appt_id = create_appointment(start_at=start, end_at=end, **ids)
+    assert appt_id > 0
+
+    start, end = _slot(10, 15)
+    with pytest.raises(ValueError, match="Conflito"):
+        create_appointment(start_at=start, end_at=end, **ids)
+
+    # Adjacente não conflita
+    start, end = _slot(10, 30)
+    assert create_appointment(start_at=start, end_at=end, **ids) > 0
+
+
+def test_cancelled_appointment_frees_slot(ids):
+    start, end = _slot(16, 0)
+    appt_id = create_appointment(start_at=start, end_at=end, **ids)
+    cancel_appointment(appt_id)
+    assert create_appointment(start_at=start, end_at=end, **ids) > appt_id
+
+
+def test_overlap_is_detected_across_offsets_and_midnight(ids):
+    from datetime import timezone
+
+    # 11:00 local gravado como UTC (14:00Z) conflita com 11:15 local
+    start, end = _slot(14, 0, tz=timezone.utc)
+    appt_id = create_appointment(start_at=start, end_at=end, **ids)
+    start, end = _slot(11, 15)
+    with pytest.raises(ValueError, match="Conflito"):
+        create_appointment(start_at=start, end_at=end, **ids)
+
+    # Gravado no fuso da barbearia: `day` é o dia local
+    conn = get_conn()
+    try:
+        row = conn.execute("SELECT start_at, day FROM appointments WHERE id = ?", (appt_id,)).fetchone()
+    finally:
+        conn.close()
+    assert row["start_at"] == datetime.combine(DAY, time(11, 0), tzinfo=TZ).isoformat()
+    assert row["day"] == DAY.isoformat()
+
+    # 23:45 local + 50 min invade o dia seguinte
+    start, end = _slot(23, 45, minutes=50)
+    create_appointment(start_at=start, end_at=end, **ids)
+    next_day = datetime.combine(DAY + timedelta(days=1), time(0, 15), tzinfo=TZ)
+    with pytest.raises(ValueError, match="Conflito"):
+        create_appointment(
+            start_at=next_day.isoformat(), end_at=(next_day + timedelta(minutes=30)).isoformat(), **ids
+        )
+
+
+def test_invalid_range_is_rejected(ids):
+    start, end = _slot(18, 0)
+    with pytest.raises(ValueError, match="inválido"):
+        create_appointment(start_at=end, end_at=start, **ids)
+
+
+def test_conflict_query_uses_barber_epoch_index(ids):
+    conn = get_conn()
+    try:
+        plan = conn.execute("EXPLAIN QUERY PLAN " + CONFLICT_SQL, (ids["barber_id"], 0, 0, 0)).fetchall()
+    finally:
+        conn.close()
+    details = " ".join(r[3] for r in plan)
+    assert "idx_appointments_barber_status_start" in details
+    assert "start_epoch>? AND start_epoch<?" in details
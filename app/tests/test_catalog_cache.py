@@ -0,0 +1,59 @@
+"""
+Testes para o cache do catálogo (barbeiros e serviços).
+"""
+import pytest
+
+from app.repositories.barbers_repo import list_active_barbers, find_barber_by_id, find_barber_by_name
+from app.repositories.services_repo import find_service_by_id
+from app.repositories.catalog_cache import barbers_cache, invalidate_catalog, get_catalog_version
+from app.repositories.db import get_conn, pooled_conn
+
+
+@pytest.fixture(scope="module", autouse=True)
+def seed(clean_db_module):
+    conn = get_conn()
+    try:
+        conn.execute("INSERT INTO barbers(name, is_active) VALUES('Cache', 1)")
+        conn.execute(
+            "INSERT INTO services(name, duration_minutes, price_cents, is_active) VALUES('Corte', 30, 5000, 1)"
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def test_lookups_served_from_cache_within_a_borrow():
+    invalidate_catalog()
+    with pooled_conn():
+        barber = list_active_barbers()[0]
+        misses = barbers_cache.stats()["misses"]
+        for _ in range(20):
+            assert find_barber_by_id(barber["id"])["name"] == "Cache"
+            assert find_barber_by_name("Cache")["id"] == barber["id"]
+        assert barbers_cache.stats()["misses"] == misses
+
+    assert find_barber_by_id(str(barber["id"]))["name"] == "Cache"
+    assert find_barber_by_id("abc") is None
+    assert find_service_by_id(1)["duration_minutes"] == 30
+
+
+def test_write_from_another_connection_is_detected():
+    list_active_barbers()
+    before = get_catalog_version()
+
+    conn = get_conn()
+    try:
+        conn.execute("UPDATE barbers SET is_active = 0 WHERE name = 'Cache'")
+        conn.execute("INSERT INTO barbers(name, is_active) VALUES('Novo', 1)")
+        conn.commit()
+    finally:
+        conn.close()
+
+    assert [b["name"] for b in list_active_barbers()] == ["Novo"]
+    assert find_barber_by_name("Cache") is None
+    assert get_catalog_version() != before
+
+
+def test_returned_rows_are_copies():
+    list_active_barbers()[0]["name"] = "Alterado"
+    assert find_barber_by_name("Alterado") is None
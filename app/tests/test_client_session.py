@@ -0,0 +1,185 @@
+"""
+Testes para o turno de conversa transacional (client_session).
+"""
+import pytest
+
+from app.repositories.db import init_db, get_conn, pooled_conn, transaction
+from app.repositories.clients_repo import (
+    client_session,
+    get_client_state_and_ctx,
+    get_client_by_key,
+)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup_db_session():
+    init_db()
+    conn = get_conn()
+    try:
+        conn.execute("DELETE FROM clients WHERE client_key LIKE 'session_%'")
+        conn.commit()
+    finally:
+        conn.close()
+    yield
+
+
+def test_session_creates_client_and_persists_state():
+    with client_session("session_new") as session:
+        assert session.client_id > 0
+        assert session.state == "START"
+        assert session.ctx == {}
+        session.state, session.ctx = "WAIT_BARBER", {"client_key": "session_new"}
+
+    state, ctx = get_client_state_and_ctx("session_new")
+    assert state == "WAIT_BARBER"
+    assert ctx == {"client_key": "session_new"}
+
+    # Segundo turno reaproveita o mesmo cliente
+    with client_session("session_new") as session:
+        assert session.state == "WAIT_BARBER"
+        assert session.client_id == get_client_by_key("session_new")["id"]
+
+
+def test_session_rolls_back_on_error():
+    with pytest.raises(RuntimeError):
+        with client_session("session_rollback") as session:
+            session.state = "WAIT_DATE"
+            raise RuntimeError("falha no meio do turno")
+
+    assert get_client_by_key("session_rollback") is None
+
+
+def test_nested_repository_calls_share_the_turn_connection():
+    with client_session("session_shared") as session:
+        with pooled_conn() as conn:
+            row = conn.execute(
+                "SELECT id FROM clients WHERE client_key = ?", ("session_shared",)
+            ).fetchone()
+            assert row["id"] == session.client_id
+
+
+def test_nested_transaction_failure_only_rolls_back_savepoint():
+    with client_session("session_savepoint") as session:
+        with pytest.raises(ValueError):
+            with transaction() as conn:
+                conn.execute(
+                    "UPDATE clients SET name = 'x' WHERE id = ?", (session.client_id,)
+                )
+                raise ValueError("erro na escrita aninhada")
+        session.state = "WAIT_SERVICE"
+
+    row = get_client_by_key("session_savepoint")
+    assert row["name"] is None
+    assert row["conversation_state"] == "WAIT_SERVICE"
+
+
+def test_after_commit_callbacks_run_only_on_commit():
+    from app.repositories.db import after_commit
+
+    calls = []
+    with transaction():
+        after_commit(lambda: calls.append("committed"))
+        assert calls == []
+    assert calls == ["committed"]
+
+    with pytest.raises(RuntimeError):
+        with transaction():
+            after_commit(lambda: calls.append("rolled back"))
+            raise RuntimeError("desfaz")
+    assert calls == ["committed"]
+
+
+def test_save_rejects_stale_state_version():
+    from app.repositories.clients_repo import StaleSessionError, set_client_state_and_ctx
+
+    with pytest.raises(StaleSessionError):
+        with client_session("session_stale") as session:
+            # Outra escrita do estado no meio do turno (ex: código legado)
+            set_client_state_and_ctx("session_stale", "WAIT_DATE", {})
+            session.state = "WAIT_BARBER"
+
+    # Tudo desfeito: o cliente nem chegou a ser criado
+    assert get_client_by_key("session_stale") is None
+
+
+def test_concurrent_turns_for_one_client_are_serialized():
+    import threading
+    from app.services.inbound import run_conversation_turn
+
+    def turn():
+        run_conversation_turn("session_concurrent", "oi")
+
+    threads = [threading.Thread(target=turn) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    conn = get_conn()
+    try:
+        version = conn.execute(
+            "SELECT state_version FROM clients WHERE client_key = 'session_concurrent'"
+        ).fetchone()[0]
+    finally:
+        conn.close()
+    # Nenhuma transição perdida: uma versão por turno
+    assert version == 8
+
+
+def _set_up_client(client_key: str) -> None:
+    with client_session(client_key) as session:
+        session.state = "START"
+
+
+def test_turn_reads_without_holding_the_write_lock(monkeypatch):
+    from app.services import inbound
+
+    _set_up_client("session_deferred")
+    probes = []
+
+    def probing_handle_message(current_state, ctx, message):
+        # Outra conexão consegue o lock de escrita enquanto o turno lê
+        other = get_conn()
+        try:
+            other.execute("PRAGMA busy_timeout = 0")
+            other.execute("BEGIN IMMEDIATE")
+            other.rollback()
+            probes.append("free")
+        finally:
+            other.close()
+        return "Olá!", "WAIT_BARBER", ctx, []
+
+    monkeypatch.setattr(inbound, "handle_message", probing_handle_message)
+    inbound.run_conversation_turn("session_deferred", "oi")
+
+    assert probes == ["free"]
+    assert get_client_state_and_ctx("session_deferred")[0] == "WAIT_BARBER"
+
+
+def test_turn_is_redone_when_another_connection_saves_meanwhile(monkeypatch):
+    from app.services import inbound
+
+    _set_up_client("session_conflict")
+    calls = []
+
+    def racing_handle_message(current_state, ctx, message):
+        calls.append(current_state)
+        if len(calls) == 1:
+            # Outro processo salva um turno do mesmo cliente depois da leitura
+            other = get_conn()
+            try:
+                other.execute(
+                    "UPDATE clients SET conversation_state = 'WAIT_DATE', state_version = state_version + 1 "
+                    "WHERE client_key = 'session_conflict'"
+                )
+                other.commit()
+            finally:
+                other.close()
+        return "Olá!", "WAIT_BARBER", ctx, []
+
+    monkeypatch.setattr(inbound, "handle_message", racing_handle_message)
+    inbound.run_conversation_turn("session_conflict", "oi")
+
+    # Refeito a partir do estado gravado pelo outro turno
+    assert calls == ["START", "WAIT_DATE"]
+    assert get_client_state_and_ctx("session_conflict")[0] == "WAIT_BARBER"
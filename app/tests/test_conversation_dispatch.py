@@ -0,0 +1,74 @@
+"""
+Testes para o dispatcher de estados da conversa.
+"""
+from app.domain.enums import State
+from app.services import conversation
+from app.services.conversation import (
+    HANDLERS,
+    handle_message,
+    add_state_timing_hook,
+    remove_state_timing_hook,
+    STATE_HANDLER_SECONDS,
+)
+
+
+def test_every_state_has_a_handler():
+    states = [v for k, v in vars(State).items() if not k.startswith("_")]
+    assert set(states) == set(HANDLERS)
+
+
+def test_button_ids_map_to_handler_text():
+    assert conversation._button_text("SLOT_14:00") == "14:00"
+    assert conversation._button_text("CONFIRM_YES") == "sim"
+    assert conversation._button_text("cancel_no") == "não"
+    assert conversation._button_text("REMARK_YES") == "sim"
+    # Não são botões de sim/não ou horário: passam inalterados
+    for text in ("APPT_5", "BARBER_2", "SLOT_x", "minha_barba", "sim"):
+        assert conversation._button_text(text) == text
+
+    # Botões de sim/não valem nos estados de confirmação
+    _, state, _, _ = handle_message(State.WAIT_CANCEL_CONFIRMATION, {}, "CANCEL_NO")
+    assert state == State.START
+    _, state, _, _ = handle_message(State.WAIT_CONFIRMATION, {}, "CONFIRM_NO")
+    assert state == State.WAIT_BARBER
+
+
+def test_unknown_state_restarts():
+    reply, state, ctx, buttons = handle_message("NOPE", {"barber_id": 1}, "oi")
+    assert state == State.START
+    assert ctx == {}
+
+
+def test_nlu_skipped_for_time_only_states(monkeypatch):
+    calls = []
+    real = conversation.detect_intent
+    monkeypatch.setattr(conversation, "detect_intent", lambda m: calls.append(m) or real(m))
+
+    # Horário válido: NLU não roda (contexto incompleto -> recomeça)
+    handle_message(State.WAIT_SLOT_PICK, {}, "14:00")
+    handle_message(State.WAIT_REMARK_DATE, {}, "20/01")
+    assert calls == []
+
+    # Fallback: texto que não é horário ainda reconhece "cancelar"
+    reply, state, _, _ = handle_message(State.WAIT_SLOT_PICK, {}, "Cancelar")
+    assert state == State.START
+    assert calls == ["Cancelar"]
+
+    # Estados que dependem de intent continuam rodando o NLU
+    handle_message(State.WAIT_CANCEL_CONFIRMATION, {}, "não")
+    assert calls == ["Cancelar", "não"]
+
+
+def test_timing_hook_receives_state_and_elapsed():
+    seen = []
+    hook = lambda state, elapsed: seen.append((state, elapsed))
+    observed = STATE_HANDLER_SECONDS.count(State.CONFIRMED)
+    add_state_timing_hook(hook)
+    try:
+        handle_message(State.CONFIRMED, {}, "ok")
+    finally:
+        remove_state_timing_hook(hook)
+
+    assert seen and seen[0][0] == State.CONFIRMED and seen[0][1] >= 0
+    # O histograma do /metrics é alimentado pelo mesmo hook
+    assert STATE_HANDLER_SECONDS.count(State.CONFIRMED) == observed + 1
@@ -0,0 +1,87 @@
+"""
+Testes para o pool de conexões SQLite.
+"""
+import threading
+import pytest
+
+from app.repositories.db import ConnectionPool, DB_PATH, init_db
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup_db_pool():
+    init_db()
+    yield
+
+
+def test_pool_reuses_connections():
+    pool = ConnectionPool(DB_PATH, max_size=2, timeout=1)
+    try:
+        conn = pool.acquire()
+        pool.release(conn)
+        assert pool.acquire() is conn
+
+        stats = pool.stats()
+        assert stats["checkouts"] == 2
+        assert stats["size"] == 1
+        assert stats["in_use"] == 1
+    finally:
+        pool.close()
+
+
+def test_pool_is_bounded_and_times_out():
+    pool = ConnectionPool(DB_PATH, max_size=1, timeout=0.05)
+    try:
+        conn = pool.acquire()
+        with pytest.raises(TimeoutError):
+            pool.acquire()
+        pool.release(conn)
+    finally:
+        pool.close()
+
+
+def test_pool_waiter_gets_released_connection():
+    pool = ConnectionPool(DB_PATH, max_size=1, timeout=2)
+    try:
+        conn = pool.acquire()
+        borrowed = []
+        t = threading.Thread(target=lambda: borrowed.append(pool.acquire()))
+        t.start()
+        threading.Timer(0.05, pool.release, args=(conn,)).start()
+        t.join(timeout=2)
+        assert borrowed == [conn]
+        assert pool.stats()["waits"] == 1
+    finally:
+        pool.close()
+
+
+def test_release_rolls_back_pending_transaction():
+    pool = ConnectionPool(DB_PATH, max_size=1, timeout=1)
+    try:
+        conn = pool.acquire()
+        conn.execute("INSERT INTO barbers(name, is_active) VALUES('Pool Temp', 1)")
+        assert conn.in_transaction
+        pool.release(conn)
+
+        conn = pool.acquire()
+        row = conn.execute("SELECT id FROM barbers WHERE name = 'Pool Temp'").fetchone()
+        assert row is None
+        pool.release(conn)
+    finally:
+        pool.close()
+
+
+def test_storage_profile_applied_on_new_connections(tmp_path):
+    pool = ConnectionPool(tmp_path / "profile.sqlite3", max_size=1, timeout=1, profile="wal")
+    try:
+        conn = pool.acquire()
+        assert conn.execute("PRAGMA journal_mode;").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA busy_timeout;").fetchone()[0] == 5000
+        assert conn.execute("PRAGMA synchronous;").fetchone()[0] == 1  # NORMAL
+        pool.release(conn)
+    finally:
+        pool.close()
+
+
+def test_unknown_storage_profile_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        ConnectionPool(tmp_path / "x.sqlite3", profile="turbo")
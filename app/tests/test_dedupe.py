@@ -0,0 +1,129 @@
+"""
+Testes para a idempotência do webhook (dedupe por id de mensagem).
+"""
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.repositories.db import init_db, get_conn, transaction
+from app.services.dedupe import MessageDeduper, message_deduper
+from app.services.inbound import inbound_queue
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup_db_dedupe():
+    init_db()
+    conn = get_conn()
+    try:
+        conn.execute("DELETE FROM processed_messages")
+        conn.commit()
+    finally:
+        conn.close()
+    yield
+
+
+def _claim(deduper: MessageDeduper, message_id: str) -> bool:
+    # Como no turno: o claim vale a partir do COMMIT
+    with transaction():
+        return deduper.claim(message_id)
+
+
+def test_claim_is_seen_after_commit_and_after_restart():
+    deduper = MessageDeduper(ttl_seconds=3600, max_entries=100)
+    with transaction():
+        assert deduper.claim("wamid.A") is True
+        assert deduper.seen("wamid.A") is False
+    assert deduper.seen("wamid.A") is True
+    assert _claim(deduper, "wamid.A") is False
+    assert _claim(deduper, "") is True
+    assert deduper.stats() == {"entries": 1, "hits": 1, "db_hits": 1, "misses": 1}
+
+    # "Reinício": memória vazia, o banco ainda conhece o id
+    restarted = MessageDeduper(ttl_seconds=3600, max_entries=100)
+    assert restarted.seen("wamid.A") is False
+    assert _claim(restarted, "wamid.A") is False
+    assert restarted.seen("wamid.A") is True
+    assert restarted.stats()["db_hits"] == 1
+
+
+def test_rolled_back_claim_is_not_consumed():
+    deduper = MessageDeduper(ttl_seconds=3600, max_entries=100)
+    with pytest.raises(RuntimeError):
+        with transaction():
+            assert deduper.claim("wamid.rollback") is True
+            raise RuntimeError("turno falhou")
+    assert deduper.seen("wamid.rollback") is False
+    assert _claim(deduper, "wamid.rollback") is True
+
+
+def test_memory_is_bounded():
+    deduper = MessageDeduper(ttl_seconds=3600, max_entries=10)
+    for i in range(50):
+        _claim(deduper, f"wamid.bounded.{i}")
+    assert deduper.stats()["entries"] == 10
+    # Evictado da memória, mas ainda registrado no banco
+    assert deduper.seen("wamid.bounded.0") is False
+    assert _claim(deduper, "wamid.bounded.0") is False
+
+
+def test_prune_removes_expired_ids():
+    deduper = MessageDeduper(ttl_seconds=60, max_entries=100)
+    from app.repositories.processed_messages_repo import claim_message
+
+    assert claim_message("wamid.old", int(time.time()) - 3600) is True
+    _claim(deduper, "wamid.fresh")
+    assert deduper.prune() >= 1
+    assert _claim(deduper, "wamid.old") is True   # expirado: tratado como novo
+    assert deduper.seen("wamid.fresh") is True
+    assert _claim(deduper, "wamid.fresh") is False
+
+
+def test_redelivered_webhook_is_processed_once():
+    payload = {"entry": [{"changes": [{"value": {"messages": [{
+        "id": "wamid.redelivery", "from": "5511922223333", "type": "text", "text": {"body": "oi"},
+    }]}}]}]}
+    before = message_deduper.stats()
+
+    with TestClient(app) as client:
+        for _ in range(3):
+            assert client.post("/webhook/whatsapp", json=payload).status_code == 200
+            # Depois do COMMIT do turno a reentrega é descartada já no webhook
+            client.portal.call(inbound_queue.join)
+
+    after = message_deduper.stats()
+    assert after["misses"] == before["misses"] + 1
+    assert after["hits"] == before["hits"] + 2
+
+    conn = get_conn()
+    try:
+        version = conn.execute(
+            "SELECT state_version FROM clients WHERE client_key = 'wa:5511922223333'"
+        ).fetchone()[0]
+    finally:
+        conn.close()
+    assert version == 1
+
+
+def test_failed_turn_does_not_consume_message_id(monkeypatch):
+    from app.services import inbound
+
+    calls = []
+
+    def flaky_handle_message(current_state, ctx, message):
+        calls.append(message)
+        if len(calls) == 1:
+            raise RuntimeError("falha no turno")
+        return "Olá!", "START", ctx, []
+
+    monkeypatch.setattr(inbound, "handle_message", flaky_handle_message)
+    with pytest.raises(RuntimeError):
+        inbound.run_conversation_turn("wa:5511944445555", "oi", message_id="wamid.retry")
+
+    # Turno desfeito: o id não ficou registrado e a reentrega é processada
+    assert message_deduper.seen("wamid.retry") is False
+    assert inbound.run_conversation_turn("wa:5511944445555", "oi", message_id="wamid.retry") is not None
+    assert message_deduper.seen("wamid.retry") is True
+    assert inbound.run_conversation_turn("wa:5511944445555", "oi", message_id="wamid.retry") is None
+    assert len(calls) == 2
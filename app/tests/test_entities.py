@@ -0,0 +1,145 @@
+"""
+Testes da extração de entidades em uma única mensagem (vários slots por turno).
+"""
+from datetime import date, time, timedelta
+
+import pytest
+
+from app.core.timezone import today_br
+from app.domain.enums import State
+from app.repositories.db import init_db, get_conn
+from app.repositories.catalog_cache import barbers_cache, services_cache, invalidate_catalog
+from app.services.conversation import handle_message
+from app.services.entities import find_date, find_time
+from app.services.nlu_engine import get_nlu_engine, normalize_message
+
+SATURDAY = date(2026, 10, 17)
+
+
+@pytest.fixture(autouse=True)
+def catalog():
+    init_db()
+    conn = get_conn()
+    try:
+        conn.execute("DELETE FROM appointments")
+        conn.execute("DELETE FROM services")
+        conn.execute("DELETE FROM barbers")
+        conn.execute("INSERT INTO barbers(name, is_active) VALUES('Carlos', 1)")
+        conn.execute("INSERT INTO barbers(name, is_active) VALUES('João', 1)")
+        conn.execute("INSERT INTO services(name, duration_minutes, is_active) VALUES('Corte', 30, 1)")
+        conn.execute("INSERT INTO services(name, duration_minutes, is_active) VALUES('Corte e barba', 50, 1)")
+        conn.commit()
+    finally:
+        conn.close()
+    invalidate_catalog()
+    get_nlu_engine().clear_cache()
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("amanhã às 14h", SATURDAY + timedelta(days=1)),
+    ("depois de amanhã", SATURDAY + timedelta(days=2)),
+    ("hoje", SATURDAY),
+    ("na terça-feira", SATURDAY + timedelta(days=3)),
+    ("sábado", SATURDAY),
+    ("dia 20 de manhã", date(2026, 10, 20)),
+    ("dia 5", date(2026, 11, 5)),
+    ("pode ser 25/12?", date(2026, 12, 25)),
+    ("daqui a 2 dias", SATURDAY + timedelta(days=2)),
+    ("quero 2 cortes", None),
+])
+def test_find_date(message, expected):
+    assert find_date(normalize_message(message), today=SATURDAY) == expected
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("14", time(14, 0)),
+    ("amanhã 14h", time(14, 0)),
+    ("pode ser às 9h30?", time(9, 30)),
+    ("lá pelas 15:45", time(15, 45)),
+    ("sexta às 16", time(16, 0)),
+    ("às 16 com o Carlos", time(16, 0)),
+    ("pode ser às 10 horas?", time(10, 0)),
+    ("3 da tarde", time(15, 0)),
+    ("meio-dia", time(12, 0)),
+    ("dia 20/10", None),
+    ("quero 2 cortes", None),
+])
+def test_find_time(message, expected):
+    assert find_time(normalize_message(message)) == expected
+
+
+@pytest.mark.parametrize("message", [
+    "daqui a 2 dias",
+    "vou a 2 lugares",
+    "corte para as 2 pessoas",
+    "chego a 3 quadras daí",
+])
+def test_numbers_after_a_are_not_hours(message):
+    assert find_time(normalize_message(message)) is None
+
+
+def test_relative_days_do_not_fill_time():
+    _, state, ctx, _ = handle_message(State.START, {}, "corte com o Carlos daqui a 2 dias")
+    assert state == State.WAIT_TIME_PREF
+    assert ctx["date"] == (today_br() + timedelta(days=2)).isoformat()
+    assert not ctx.get("time_pref")
+
+
+def test_catalog_names_exact_longest_and_typos():
+    assert barbers_cache.search_name("com o joao")["name"] == "João"
+    assert barbers_cache.search_name("com o calros")["name"] == "Carlos"
+    assert services_cache.search_name("corte e barba amanha")["name"] == "Corte e barba"
+    assert services_cache.search_name("so o corte")["name"] == "Corte"
+    assert barbers_cache.search_name("com o pedro") is None
+
+
+def test_single_message_fills_every_slot():
+    reply, state, ctx, buttons = handle_message(State.START, {}, "Corte com o Carlos amanhã 14h")
+    tomorrow = today_br() + timedelta(days=1)
+    assert state == State.WAIT_CONFIRMATION
+    assert ctx["barber_name"] == "Carlos"
+    assert ctx["service_name"] == "Corte"
+    assert ctx["date"] == tomorrow.isoformat()
+    assert ctx["selected_slot"] == "14:00"
+    assert reply.startswith("Anotado 👍 Carlos, Corte")
+
+
+@pytest.mark.parametrize("message", [
+    "bom dia! sou cliente, meu nome é João",
+    "oi, aqui é o Carlos",
+    "obrigado, até amanhã às 10",
+    "oi, faz barba?",
+    "valeu Carlos!",
+])
+def test_greetings_and_thanks_do_not_start_booking(message):
+    _, state, ctx, _ = handle_message(State.START, {}, message)
+    assert state == State.START
+    assert not any(ctx.get(slot) for slot in ("barber_id", "service_id", "date", "time_pref"))
+
+
+def test_skips_slots_already_given():
+    # Data e horário vêm primeiro; barbeiro e serviço são perguntados depois
+    reply, state, ctx, _ = handle_message(State.START, {}, "quero agendar amanhã às 15h")
+    assert state == State.WAIT_BARBER
+    assert ctx["time_pref"] == "15:00"
+
+    reply, state, ctx, _ = handle_message(State.WAIT_BARBER, ctx, "Carlos")
+    assert state == State.WAIT_SERVICE
+    assert reply.startswith("Show! Carlos escolhido 👍")
+
+    reply, state, ctx, _ = handle_message(State.WAIT_SERVICE, ctx, "corte e barba")
+    assert state == State.WAIT_CONFIRMATION
+    assert ctx["selected_slot"] == "15:00"
+
+
+def test_step_by_step_replies_unchanged():
+    _, state, ctx, _ = handle_message(State.START, {}, "Quero agendar")
+    _, state, ctx, _ = handle_message(State.WAIT_BARBER, ctx, "João")
+    reply, state, ctx, _ = handle_message(State.WAIT_SERVICE, ctx, "Corte")
+    assert state == State.WAIT_DATE
+    assert reply == "Fechado! Serviço: Corte (30min).\nAgora me diga o dia que você quer (ex: 20/01)."
+
+    # Data relativa também é aceita no estado de data
+    reply, state, ctx, _ = handle_message(State.WAIT_DATE, ctx, "amanhã")
+    assert state == State.WAIT_TIME_PREF
+    assert reply.endswith("Agora me diga um horário aproximado (ex: 14:00).")
@@ -0,0 +1,117 @@
+"""
+Testes do envio pela Graph API contra um servidor HTTP local (stub).
+"""
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.integrations.channels import whatsapp
+from app.integrations.channels.whatsapp import (
+    send_message_via_graph_api,
+    start_graph_client,
+    close_graph_client,
+)
+
+
+class _StubGraphHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True
+    requests: list = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.requests.append({
+            "path": self.path,
+            "auth": self.headers.get("Authorization"),
+            "body": body,
+            "port": self.client_address[1],
+        })
+        status = 500 if body.get("to") == "500" else 200
+        data = json.dumps({"messages": [{"id": "wamid.stub"}]}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def stub_server():
+    _StubGraphHandler.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubGraphHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v18.0", _StubGraphHandler.requests
+    server.shutdown()
+    server.server_close()
+
+
+def test_replies_reuse_one_connection(stub_server):
+    base_url, requests = stub_server
+
+    async def run():
+        await start_graph_client(base_url)
+        try:
+            results = []
+            for i in range(5):
+                results.append(await send_message_via_graph_api(
+                    phone="5511999990000", text=f"msg {i}", buttons=[],
+                    access_token="tok", phone_id="123",
+                ))
+            results.append(await send_message_via_graph_api(
+                phone="5511999990000", text="Escolha", buttons=[{"id": "A", "label": "Opção A"}],
+                access_token="tok", phone_id="123",
+            ))
+            return results
+        finally:
+            await close_graph_client()
+
+    assert asyncio.run(run()) == [True] * 6
+    assert len(requests) == 6
+    assert {r["path"] for r in requests} == {"/v18.0/123/messages"}
+    assert {r["auth"] for r in requests} == {"Bearer tok"}
+    assert requests[-1]["body"]["type"] == "interactive"
+    # Keep-alive: todas as requisições sequenciais pela mesma conexão TCP
+    assert len({r["port"] for r in requests}) == 1
+    assert whatsapp._graph_client is None
+
+
+def test_error_status_returns_false(stub_server):
+    base_url, requests = stub_server
+
+    async def run():
+        await start_graph_client(base_url)
+        try:
+            return await send_message_via_graph_api(
+                phone="500", text="oi", buttons=[], access_token="tok", phone_id="123",
+            )
+        finally:
+            await close_graph_client()
+
+    assert asyncio.run(run()) is False
+    assert len(requests) == 1
+
+
+def test_connection_error_returns_false():
+    async def run():
+        await start_graph_client("http://127.0.0.1:9")  # porta fechada
+        try:
+            return await send_message_via_graph_api(
+                phone="5511", text="oi", buttons=[], access_token="tok", phone_id="123",
+            )
+        finally:
+            await close_graph_client()
+
+    assert asyncio.run(run()) is False
+
+
+def test_without_token_only_logs():
+    assert asyncio.run(send_message_via_graph_api(
+        phone="5511", text="oi", buttons=[], access_token="", phone_id="",
+    )) is True
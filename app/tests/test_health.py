@@ -0,0 +1,73 @@
+"""
+Testes de liveness/readiness (/health/live, /health/ready).
+"""
+import sqlite3
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.repositories.db import DB_PATH, get_pool, init_db
+from app.services import health
+from app.services.health import check_readiness
+
+
+def test_ready_when_app_is_running():
+    with TestClient(app) as client:
+        assert client.get("/health/live").json() == {"status": "ok"}
+
+        response = client.get("/health/ready")
+        body = response.json()
+        assert response.status_code == 200, body
+        assert body["status"] == "ready"
+        assert set(body["checks"]) == {"db", "scheduler", "inbound_queue", "outbox"}
+        assert all(check["ok"] and check["latency_ms"] >= 0 for check in body["checks"].values())
+        assert all(job["next_run_in_s"] > 0 for job in body["checks"]["scheduler"]["jobs"])
+
+
+def test_outbox_backlog_drains_instance(monkeypatch):
+    monkeypatch.setattr(health, "HEALTH_OUTBOX_MAX_PENDING", -1)
+    with TestClient(app) as client:
+        response = client.get("/health/ready")
+    assert response.status_code == 503
+    checks = response.json()["checks"]
+    assert not checks["outbox"]["ok"]
+    assert checks["db"]["ok"] and checks["inbound_queue"]["ok"]
+
+
+def test_exhausted_pool_fails_fast_without_workers(monkeypatch):
+    init_db()
+    monkeypatch.setattr(health, "HEALTH_DB_TIMEOUT_SECONDS", 0.05)
+    pool = get_pool()
+    borrowed = [pool.acquire() for _ in range(pool.max_size)]
+    try:
+        result = check_readiness()
+    finally:
+        for conn in borrowed:
+            pool.release(conn)
+
+    checks = result["checks"]
+    assert not result["ready"]
+    assert "TimeoutError" in checks["db"]["error"]
+    assert checks["outbox"] == {"ok": False, "error": "banco indisponível", "latency_ms": checks["outbox"]["latency_ms"]}
+    # Sem startup, scheduler e fila de entrada não estão rodando
+    assert not checks["scheduler"]["ok"] and not checks["inbound_queue"]["ok"]
+    assert result["duration_ms"] < 1000
+
+
+def test_locked_database_is_not_ready(monkeypatch):
+    monkeypatch.setattr(health, "HEALTH_DB_TIMEOUT_SECONDS", 0.05)
+    with TestClient(app) as client:
+        # Outro processo segurando o lock de escrita: SELECT 1 ainda funcionaria
+        other = sqlite3.connect(DB_PATH, isolation_level=None)
+        try:
+            other.execute("BEGIN EXCLUSIVE")
+            response = client.get("/health/ready")
+        finally:
+            other.rollback()
+            other.close()
+        assert client.get("/health/ready").status_code == 200
+
+    assert response.status_code == 503
+    checks = response.json()["checks"]
+    assert "locked" in checks["db"]["error"]
+    assert checks["db"]["latency_ms"] < 1000
@@ -0,0 +1,128 @@
+"""
+Testes para a fila de entrada (processamento do webhook em segundo plano).
+"""
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.inbound import InboundQueue, inbound_queue
+
+
+def test_queue_processes_items_and_drains_on_stop():
+    done = []
+
+    async def job(i):
+        await asyncio.sleep(0.005)
+        done.append(i)
+
+    async def failing():
+        raise RuntimeError("boom")
+
+    async def run():
+        queue = InboundQueue(workers=3, maxsize=100)
+        assert queue.submit("k", job, 0) is False  # não iniciada
+        await queue.start()
+        for i in range(20):
+            assert queue.submit(f"client-{i}", job, i)
+        queue.submit("x", failing)
+        assert queue.stats()["depth"] > 0
+        await queue.stop()
+        return queue.stats()
+
+    stats = asyncio.run(run())
+    assert sorted(done) == list(range(20))
+    assert stats["running"] is False and stats["depth"] == 0
+    assert stats["processed"] == 20 and stats["failed"] == 1
+    assert stats["lag_ms_max"] > 0
+
+
+def test_items_for_one_key_run_in_order():
+    seen: dict[str, list[int]] = {}
+
+    async def job(key, i):
+        # Itens mais antigos demoram mais: sem partição por chave a ordem se inverteria
+        await asyncio.sleep(0.002 * (5 - i % 5))
+        seen.setdefault(key, []).append(i)
+
+    async def run():
+        queue = InboundQueue(workers=4, maxsize=100)
+        await queue.start()
+        for i in range(10):
+            for key in ("wa:1", "wa:2", "wa:3"):
+                queue.submit(key, job, key, i)
+        await queue.stop()
+
+    asyncio.run(run())
+    assert seen == {key: list(range(10)) for key in ("wa:1", "wa:2", "wa:3")}
+
+
+def test_full_queue_rejects():
+    async def run():
+        queue = InboundQueue(workers=1, maxsize=1)
+        await queue.start()
+        blocker = asyncio.Event()
+        queue.submit("same", blocker.wait)
+        await asyncio.sleep(0)  # worker retira o primeiro item
+        accepted = [queue.submit("same", blocker.wait) for _ in range(3)]
+        blocker.set()
+        await queue.stop()
+        return accepted, queue.stats()
+
+    accepted, stats = asyncio.run(run())
+    assert accepted == [True, False, False]
+    assert stats["rejected"] == 2
+
+
+def test_put_waits_for_room_in_the_partition():
+    order = []
+
+    async def job(i):
+        await asyncio.sleep(0.01)
+        order.append(i)
+
+    async def run():
+        queue = InboundQueue(workers=1, maxsize=1)
+        await queue.start()
+        accepted = [await queue.put("same", job, i, timeout=1.0) for i in range(4)]
+        blocker = asyncio.Event()
+        await queue.put("same", blocker.wait)
+        await asyncio.sleep(0)
+        await queue.put("same", blocker.wait)
+        rejected = await queue.put("same", job, 99, timeout=0.01)
+        blocker.set()
+        await queue.stop()
+        return accepted, rejected
+
+    accepted, rejected = asyncio.run(run())
+    assert accepted == [True] * 4 and order == [0, 1, 2, 3]
+    assert rejected is False
+
+
+def test_webhook_asks_for_redelivery_without_queue():
+    payload = {"entry": [{"changes": [{"value": {"messages": [{
+        "id": "wamid.no-queue", "from": "5511900002222", "text": {"body": "oi"}, "type": "text",
+    }]}}]}]}
+    # Sem startup a fila não está rodando: nada é processado fora dela
+    response = TestClient(app).post("/webhook/whatsapp", json=payload)
+    assert response.status_code == 503
+    assert response.json() == {"status": "unavailable"}
+
+
+def test_webhook_enqueues_when_workers_are_running():
+    payload = {
+        "entry": [{"changes": [{"value": {"messages": [{
+            "from": "5511900001111", "text": {"body": "oi"}, "type": "text",
+        }]}}]}]
+    }
+    # Com startup/shutdown (context manager) a fila está ativa e é drenada no shutdown
+    with TestClient(app) as client:
+        assert inbound_queue.running
+        before = inbound_queue.submitted
+        response = client.post("/webhook/whatsapp", json=payload)
+        assert response.status_code == 200
+        assert response.json() == {"status": "ok"}
+        assert inbound_queue.submitted == before + 1
+        assert "inbound_queue" in client.get("/health").json()
+    assert not inbound_queue.running
+    assert inbound_queue.processed >= 1
@@ -0,0 +1,62 @@
+"""
+Testes do pipeline de logging (fila + thread, campos chave=valor).
+"""
+import logging
+import queue
+from logging.handlers import QueueListener
+
+from app.core.logging import _InlineQueueHandler, _build_handlers, kv
+
+
+class _CountingArg:
+    formatted = 0
+
+    def __str__(self):
+        _CountingArg.formatted += 1
+        return "payload"
+
+
+def _queued_logger(name: str, level: int, tmp_path, stream):
+    logger = logging.getLogger(name)
+    logger.handlers.clear()
+    logger.propagate = False
+    logger.setLevel(level)
+    q = queue.SimpleQueue()
+    logger.addHandler(_InlineQueueHandler(q))
+    listener = QueueListener(q, *_build_handlers(tmp_path / "app.log", stream), respect_handler_level=True)
+    listener.start()
+    return logger, listener
+
+
+def test_records_written_by_listener_with_fields(tmp_path):
+    with open(tmp_path / "console.log", "w") as console:
+        logger, listener = _queued_logger("test.logging.fields", logging.INFO, tmp_path, console)
+        logger.info("Mensagem recebida: %s", "oi", extra=kv(phone="5511999", text="bom dia"))
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logger.exception("Falhou", extra=kv(attempt=2))
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+    lines = (tmp_path / "app.log").read_text(encoding="utf-8").splitlines()
+    assert lines[0].endswith("[INFO] Mensagem recebida: oi phone=5511999 text='bom dia'")
+    assert lines[1].endswith("[ERROR] Falhou attempt=2")
+    assert "ValueError: boom" in lines[-1]
+    assert (tmp_path / "console.log").read_text(encoding="utf-8").count("\n") == len(lines)
+
+
+def test_disabled_level_does_not_format_arguments(tmp_path):
+    with open(tmp_path / "console.log", "w") as console:
+        logger, listener = _queued_logger("test.logging.lazy", logging.INFO, tmp_path, console)
+        before = _CountingArg.formatted
+        logger.debug("Webhook payload: %s", _CountingArg())
+        logger.info("Webhook payload: %s", _CountingArg())
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+    assert _CountingArg.formatted == before + 1
+    assert (tmp_path / "app.log").read_text(encoding="utf-8").count("[INFO] Webhook payload: payload") == 1
+    assert "DEBUG" not in (tmp_path / "app.log").read_text(encoding="utf-8")
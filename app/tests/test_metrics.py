@@ -0,0 +1,69 @@
+"""
+Testes das métricas no formato de texto do Prometheus (GET /metrics).
+"""
+import threading
+
+from fastapi.testclient import TestClient
+
+from app.core import metrics
+from app.core.metrics import Counter, Histogram, render_metrics
+from app.main import app
+from app.repositories.db import init_db
+
+
+def _histogram_lines(hist: Histogram) -> list[str]:
+    name, _, _, samples = next(hist.collect())
+    return [f"{name}{suffix} {labels} {value}" for labels, value, suffix in samples]
+
+
+def test_counter_sums_thread_shards():
+    counter = Counter("test_total", "Teste", ("kind",))
+    threads = [threading.Thread(target=lambda: [counter.inc("a") for _ in range(1000)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counter.inc("b", value=2.5)
+    assert counter.value("a") == 4000
+    assert counter.value("b") == 2.5
+
+
+def test_histogram_buckets_are_cumulative():
+    hist = Histogram("test_seconds", "Teste", ("op",), buckets=(0.01, 0.1))
+    for value in (0.005, 0.05, 0.05, 3.0):
+        hist.observe(value, "SELECT")
+    assert hist.count("SELECT") == 4
+    assert _histogram_lines(hist) == [
+        "test_seconds_bucket {'op': 'SELECT', 'le': '0.01'} 1",
+        "test_seconds_bucket {'op': 'SELECT', 'le': '0.1'} 3",
+        "test_seconds_bucket {'op': 'SELECT', 'le': '+Inf'} 4",
+        "test_seconds_sum {'op': 'SELECT'} 3.105",
+        "test_seconds_count {'op': 'SELECT'} 4",
+    ]
+
+
+def test_render_escapes_label_values(monkeypatch):
+    init_db()  # coletores de fila leem o outbox
+    counter = Counter("test_escape_total", "Teste", ("path",))
+    counter.inc('a"b\\c\nd')
+    monkeypatch.setattr(metrics, "_metrics", [counter])
+    text = render_metrics()
+    assert "# TYPE test_escape_total counter\n" in text
+    assert 'test_escape_total{path="a\\"b\\\\c\\nd"} 1\n' in text
+
+
+def test_metrics_endpoint_after_chat_turn():
+    init_db()
+    client = TestClient(app)
+    assert client.post("/chat/web", json={"client_id": "metrics-test", "message": "oi"}).status_code == 200
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "text/plain; version=0.0.4; charset=utf-8"
+    text = response.text
+    assert 'barbershop_http_request_duration_seconds_count{method="POST",route="/chat/web",status="200"}' in text
+    assert 'barbershop_turn_duration_seconds_bucket{channel="web",le="+Inf"}' in text
+    assert "barbershop_state_transitions_total{" in text
+    assert 'barbershop_db_query_duration_seconds_count{op="SELECT"}' in text
+    assert 'barbershop_cache_hits_total{cache="nlu"}' in text
+    assert "barbershop_inbound_queue_depth " in text
@@ -0,0 +1,99 @@
+"""
+Testes do índice de nomes do catálogo (acentos, erros de digitação, apelidos).
+"""
+import pytest
+
+from app.repositories.db import init_db, get_conn
+from app.repositories.catalog_cache import barbers_cache, services_cache, invalidate_catalog
+from app.repositories.barbers_repo import find_barber_by_name, find_barber_in_text
+from app.repositories.name_index import NameIndex
+from app.repositories.services_repo import find_service_by_name, find_service_in_text
+
+
+@pytest.fixture(autouse=True)
+def catalog():
+    init_db()
+    conn = get_conn()
+    try:
+        conn.execute("DELETE FROM appointments")
+        conn.execute("DELETE FROM services")
+        conn.execute("DELETE FROM barbers")
+        conn.execute("INSERT INTO barbers(name, is_active) VALUES('Carlos Silva', 1)")
+        conn.execute("INSERT INTO barbers(name, aliases, is_active) VALUES('João', 'jota', 1)")
+        conn.execute("INSERT INTO services(name, duration_minutes, is_active) VALUES('Corte', 30, 1)")
+        conn.execute(
+            "INSERT INTO services(name, aliases, duration_minutes, is_active) "
+            "VALUES('Corte e barba', 'cabelo e barba, combo', 50, 1)"
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    invalidate_catalog()
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("João", "João"),
+    ("JOAO", "João"),
+    ("jota", "João"),
+    ("carlos", "Carlos Silva"),  # primeiro nome sem ambiguidade
+    ("Calros Silva", "Carlos Silva"),
+    ("joaõ", "João"),
+])
+def test_barber_by_name_tolerates_accents_typos_and_aliases(name, expected):
+    assert find_barber_by_name(name)["name"] == expected
+
+
+def test_service_aliases_and_threshold():
+    assert find_service_by_name("cabelo e barba")["name"] == "Corte e barba"
+    assert find_service_by_name("Corte e barab")["name"] == "Corte e barba"
+    assert find_service_by_name("COMBO")["name"] == "Corte e barba"
+    assert find_service_by_name("sobrancelha") is None
+    assert find_barber_by_name("Pedro") is None
+
+
+def test_search_inside_message():
+    assert find_barber_in_text("quero com o calros amanha")["name"] == "Carlos Silva"
+    assert find_service_in_text("pode ser cabelo e barba as 14h")["name"] == "Corte e barba"
+    assert find_service_in_text("so o corte")["name"] == "Corte"
+    assert find_barber_in_text("quero agendar amanha as 15h") is None
+
+
+def test_ambiguous_first_name_is_not_an_alias():
+    index = NameIndex([{"id": 1, "name": "Carlos Silva"}, {"id": 2, "name": "Carlos Souza"}])
+    assert index.lookup("carlos souza")[0]["id"] == 2
+    assert index.lookup("carlos", min_score=1.0) is None
+    assert len(index) == 2
+
+
+def test_index_rebuilt_only_when_catalog_changes():
+    builds = services_cache.stats()["index_builds"]
+    for _ in range(3):
+        find_service_by_name("cabelo e barba")
+    assert services_cache.stats()["index_builds"] == builds + 1
+    index = services_cache.name_index()
+
+    conn = get_conn()
+    try:
+        conn.execute("UPDATE services SET aliases = 'degrade' WHERE name = 'Corte'")
+        conn.commit()
+    finally:
+        conn.close()
+    assert find_service_by_name("degradê")["name"] == "Corte"
+    assert services_cache.name_index() is not index
+    assert services_cache.stats()["index_builds"] == builds + 2
+    # Catálogo de barbeiros não mudou: nada é refeito por lá
+    barber_index = barbers_cache.name_index()
+    find_barber_by_name("jota")
+    assert barbers_cache.name_index() is barber_index
+
+
+def test_short_name_disambiguates_shared_first_names():
+    index = NameIndex([
+        {"id": 1, "name": "Carlos Silva"},
+        {"id": 2, "name": "Carlos Souza"},
+        {"id": 3, "name": "João Pedro"},
+    ])
+    assert index.short_name(1) == "C. Silva"
+    assert index.short_name(2) == "C. Souza"
+    assert index.short_name(3) == "João"
+    assert index.short_name(99) is None
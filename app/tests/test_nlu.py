@@ -0,0 +1,45 @@
+"""
+Testes da detecção de intenção (matcher pré-compilado com fronteiras de palavra).
+"""
+import pytest
+
+from app.scripts.bench_nlu import accuracy, legacy_detect_intent
+from app.services.nlu import detect_intent, match_intents, normalize_text
+
+
+def test_corpus_accuracy_beats_legacy():
+    acc, errors = accuracy(detect_intent)
+    assert errors == []
+    legacy_acc, _ = accuracy(legacy_detect_intent)
+    assert legacy_acc < acc
+
+
+@pytest.mark.parametrize("message", ["noite", "o corte foi dez", "horário", "coisa boa"])
+def test_greeting_requires_whole_word(message):
+    assert "GREETING" not in {m.intent for m in match_intents(message)}
+
+
+def test_remarcar_is_not_booking():
+    assert detect_intent("quero remarcar") == "REMARK_APPOINTMENT"
+    assert detect_intent("quero marcar") == "BOOK_APPOINTMENT"
+
+
+def test_all_intents_returned_by_priority():
+    matches = match_intents("Oi! Não posso mudar, quero outro horário")
+    assert [m.intent for m in matches] == [
+        "BOOK_APPOINTMENT", "CANCEL_APPOINTMENT", "REMARK_APPOINTMENT", "GREETING",
+    ]
+    assert [m.priority for m in matches] == [0, 1, 2, 3]
+    # "posso mudar" se sobrepõe a "não posso" e também é encontrada
+    assert {m.keyword for m in match_intents("não posso mudar")} == {"nao posso", "posso mudar"}
+
+
+def test_matches_with_and_without_accents():
+    assert detect_intent("NAO VOU") == detect_intent("Não vou") == "CANCEL_APPOINTMENT"
+    assert detect_intent("recomecar") == "CANCEL_APPOINTMENT"
+    assert normalize_text("  Não   É  ") == "nao e"
+
+
+def test_unknown_when_nothing_matches():
+    assert detect_intent("") == "UNKNOWN"
+    assert match_intents("qual o endereço?") == []
@@ -0,0 +1,118 @@
+"""
+Testes da interface de motores de NLU (intent + entidades, lote e cache).
+"""
+from datetime import time
+
+import pytest
+
+from app.domain.enums import State
+from app.repositories.db import init_db, get_conn
+from app.repositories.catalog_cache import invalidate_catalog
+from app.services.conversation import handle_message
+from app.services.nlu_engine import (
+    NLUEngine,
+    RuleBasedEngine,
+    TrigramModelEngine,
+    load_nlu_engine,
+    normalize_message,
+    set_nlu_engine,
+)
+
+
+@pytest.fixture(autouse=True)
+def catalog():
+    init_db()
+    conn = get_conn()
+    try:
+        conn.execute("DELETE FROM appointments")
+        conn.execute("DELETE FROM services")
+        conn.execute("DELETE FROM barbers")
+        conn.execute("INSERT INTO barbers(name, is_active) VALUES('João', 1)")
+        conn.execute("INSERT INTO services(name, duration_minutes, is_active) VALUES('Corte e barba', 45, 1)")
+        conn.commit()
+    finally:
+        conn.close()
+    invalidate_catalog()
+    yield
+    set_nlu_engine(None)
+
+
+class CountingEngine(RuleBasedEngine):
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+
+    def classify(self, texts):
+        self.batches.append(list(texts))
+        return super().classify(texts)
+
+
+def test_intent_and_entities():
+    engine = RuleBasedEngine()
+    result = engine.analyze("Quero agendar corte e barba com o joao")
+    assert result.intent == "BOOK_APPOINTMENT"
+    assert result.barber_name == "João"
+    assert result.service_name == "Corte e barba"
+
+    assert engine.analyze("14h").time == time(14, 0)
+    assert engine.analyze("20/01").date.month == 1
+    assert engine.analyze("qualquer coisa").intent == "UNKNOWN"
+
+
+def test_normalized_texts_hit_the_cache():
+    engine = CountingEngine()
+    for message in ("Sim", "sim!", " SIM ", "Oi", "oi!!", "14h", "14H."):
+        engine.analyze(message)
+    assert engine.batches == [["sim"], ["oi"], ["14h"]]
+    assert engine.stats()["hits"] == 4
+    assert normalize_message("  Olá, TUDO bem?! ") == "ola, tudo bem"
+
+
+def test_batch_analyzes_each_distinct_text_once():
+    engine = CountingEngine()
+    results = engine.analyze_batch(["oi", "Cancelar", "oi", "OI!", "cancelar"])
+    assert [r.intent for r in results] == ["GREETING", "CANCEL_APPOINTMENT", "GREETING", "GREETING", "CANCEL_APPOINTMENT"]
+    assert engine.batches == [["oi", "cancelar"]]
+
+
+def test_catalog_change_invalidates_cached_entities():
+    engine = RuleBasedEngine()
+    assert engine.analyze("com o Carlos").barber_name is None
+    conn = get_conn()
+    try:
+        conn.execute("INSERT INTO barbers(name, is_active) VALUES('Carlos', 1)")
+        conn.commit()
+    finally:
+        conn.close()
+    assert engine.analyze("com o Carlos").barber_name == "Carlos"
+
+
+def test_engines_loadable_from_config():
+    assert isinstance(load_nlu_engine("rules"), RuleBasedEngine)
+    assert isinstance(load_nlu_engine("trigram"), TrigramModelEngine)
+    assert isinstance(load_nlu_engine("app.services.nlu_engine:TrigramModelEngine"), TrigramModelEngine)
+    with pytest.raises(ValueError):
+        load_nlu_engine("app.services.nlu:detect_intent")
+    with pytest.raises(ValueError):
+        load_nlu_engine("llm")
+
+
+def test_trigram_model_tolerates_typos():
+    engine = TrigramModelEngine()
+    assert engine.analyze("quero cancelr").intent == "CANCEL_APPOINTMENT"
+    assert engine.analyze("quero agenda amanha").intent == "BOOK_APPOINTMENT"
+    assert engine.analyze("noite").intent == "UNKNOWN"
+    assert engine.analyze("quero remarcar").intent == "REMARK_APPOINTMENT"
+
+
+def test_conversation_uses_configured_engine():
+    class AlwaysBook(NLUEngine):
+        name = "always-book"
+
+        def classify(self, texts):
+            return [("BOOK_APPOINTMENT",) for _ in texts]
+
+    set_nlu_engine(AlwaysBook())
+    reply, state, _, buttons = handle_message(State.START, {}, "bora?")
+    assert state == State.WAIT_BARBER
+    assert buttons
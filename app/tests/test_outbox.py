@@ -0,0 +1,143 @@
+"""
+Testes para a outbox (fila de saída persistente) e seu dispatcher.
+"""
+import asyncio
+from datetime import datetime, timedelta, time
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from app.repositories.db import get_conn, transaction
+from app.repositories.outbox_repo import enqueue_outbound, get_outbox_counts
+from app.services import outbox
+from app.services.outbox import OutboxDispatcher
+
+
+@pytest.fixture(autouse=True)
+def clean_outbox(clean_db, monkeypatch):
+    monkeypatch.setattr(outbox, "retry_delay", lambda attempts: 0)
+
+
+def _rows():
+    conn = get_conn()
+    try:
+        return [dict(r) for r in conn.execute("SELECT * FROM outbox ORDER BY id").fetchall()]
+    finally:
+        conn.close()
+
+
+def test_enqueue_joins_the_callers_transaction():
+    with pytest.raises(RuntimeError):
+        with transaction():
+            enqueue_outbound("whatsapp", "5511", "não deve existir")
+            raise RuntimeError("turno falhou")
+    assert _rows() == []
+
+    with transaction():
+        enqueue_outbound("whatsapp", "5511", "ok")
+    assert [r["status"] for r in _rows()] == ["pending"]
+
+
+def test_per_recipient_order_is_kept_across_retries():
+    delivered = []
+    failures = {"a1": 1}
+
+    async def transport(recipient, payload):
+        text = payload["text"]
+        if failures.get(text):
+            failures[text] -= 1
+            return False
+        delivered.append(text)
+        return True
+
+    for text, recipient in (("a1", "A"), ("b1", "B"), ("a2", "A"), ("a3", "A")):
+        enqueue_outbound("whatsapp", recipient, text)
+
+    dispatcher = OutboxDispatcher(transports={"whatsapp": transport}, rate_per_second=1000)
+
+    async def drain():
+        while await dispatcher.dispatch_once():
+            pass
+
+    asyncio.run(drain())
+    # a1 falhou uma vez: a2/a3 esperaram por ele; B não foi bloqueado
+    assert delivered == ["b1", "a1", "a2", "a3"]
+    assert get_outbox_counts()["pending"] == 0
+    stats = dispatcher.stats()
+    assert stats["failed_attempts"] == 1
+    assert stats["retried"] == 1  # a1 na segunda tentativa
+    assert stats["send_ms_p95"] >= 0
+
+
+def test_dead_letter_after_max_attempts():
+    async def always_fails(recipient, payload):
+        raise ConnectionError("graph fora do ar")
+
+    enqueue_outbound("whatsapp", "A", "perdida")
+    enqueue_outbound("whatsapp", "A", "seguinte")
+    dispatcher = OutboxDispatcher(transports={"whatsapp": always_fails}, max_attempts=3, rate_per_second=1000)
+
+    async def run():
+        for _ in range(3):
+            await dispatcher.dispatch_once()
+
+    asyncio.run(run())
+    rows = _rows()
+    assert rows[0]["status"] == "dead" and rows[0]["attempts"] == 3
+    assert "graph fora do ar" in rows[0]["last_error"]
+    # Dead-letter libera a fila do destinatário
+    assert rows[1]["status"] == "pending"
+    assert get_outbox_counts()["dead"] == 1
+
+
+def test_dispatcher_loop_wakes_on_commit_and_stops_cleanly():
+    delivered = []
+
+    async def transport(recipient, payload):
+        delivered.append(payload["text"])
+        return True
+
+    async def run():
+        dispatcher = OutboxDispatcher(transports={"web": transport}, poll_seconds=30)
+        await dispatcher.start()
+        from app.repositories.outbox_repo import add_outbox_listener
+        add_outbox_listener(dispatcher.wake)
+        await asyncio.to_thread(enqueue_outbound, "web", "user_1", "olá")
+        for _ in range(100):
+            if delivered:
+                break
+            await asyncio.sleep(0.01)
+        await dispatcher.stop()
+        return dispatcher.stats()
+
+    stats = asyncio.run(run())
+    assert delivered == ["olá"]  # entregue sem esperar o poll de 30s
+    assert stats["running"] is False and stats["sent"] == 1
+
+
+def test_reminder_job_enqueues_and_marks_atomically():
+    from app.jobs.reminders_24h import run_reminders_job
+
+    tz = ZoneInfo("America/Sao_Paulo")
+    tomorrow = (datetime.now(tz) + timedelta(days=1)).date()
+    conn = get_conn()
+    try:
+        b = conn.execute("INSERT INTO barbers(name, is_active) VALUES('Outbox', 1)").lastrowid
+        s = conn.execute("INSERT INTO services(name, duration_minutes, is_active) VALUES('Corte', 30, 1)").lastrowid
+        wa = conn.execute("INSERT INTO clients(client_key) VALUES('wa:5511977776666')").lastrowid
+        web = conn.execute("INSERT INTO clients(client_key) VALUES('user_web')").lastrowid
+        for client_id, hour in ((wa, 10), (web, 11)):
+            start = datetime.combine(tomorrow, time(hour, 0), tzinfo=tz)
+            conn.execute(
+                "INSERT INTO appointments(client_id, barber_id, service_id, start_at, end_at, status) VALUES(?, ?, ?, ?, ?, 'scheduled')",
+                (client_id, b, s, start.isoformat(), (start + timedelta(minutes=30)).isoformat()),
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+    summary = asyncio.run(run_reminders_job(tz))
+    assert summary["enqueued"] == 2 and summary["failed"] == 0
+    rows = _rows()
+    assert {(r["channel"], r["recipient"]) for r in rows} == {("whatsapp", "5511977776666"), ("web", "user_web")}
+    assert all("Outbox" in r["payload_json"] for r in rows)
@@ -0,0 +1,30 @@
+"""
+Testes para o token bucket (app/core/rate_limit.py).
+"""
+import asyncio
+import time
+
+import pytest
+
+from app.core.rate_limit import TokenBucket
+
+
+def test_token_bucket_limits_rate():
+    async def burst():
+        bucket = TokenBucket(rate_per_second=200, burst=2)
+        started = time.perf_counter()
+        for _ in range(10):
+            await bucket.acquire()
+        return time.perf_counter() - started, bucket
+
+    elapsed, bucket = asyncio.run(burst())
+    # 2 tokens imediatos + 8 a 200/s ~= 40 ms
+    assert elapsed >= 0.035
+    assert bucket.waits >= 6
+
+
+def test_token_bucket_rejects_invalid_limits():
+    with pytest.raises(ValueError):
+        TokenBucket(rate_per_second=0)
+    with pytest.raises(ValueError):
+        TokenBucket(rate_per_second=10, burst=0)
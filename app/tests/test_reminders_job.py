@@ -0,0 +1,112 @@
+"""
+Testes para o job de lembretes em lote.
+"""
+import asyncio
+import pytest
+from datetime import datetime, timedelta, time
+from zoneinfo import ZoneInfo
+
+from app.jobs import reminders_24h
+from app.jobs.reminders_24h import REMINDER_BATCH_SQL, iter_reminder_batches, run_reminders_job
+from app.repositories.db import get_conn
+
+TZ = ZoneInfo("America/Sao_Paulo")
+TOMORROW = (datetime.now(TZ) + timedelta(days=1)).date()
+
+
+@pytest.fixture(autouse=True)
+def seed(clean_db):
+    conn = get_conn()
+    try:
+        b_id = conn.execute("INSERT INTO barbers(name, is_active) VALUES('Lote', 1)").lastrowid
+        s_id = conn.execute(
+            "INSERT INTO services(name, duration_minutes, price_cents, is_active) VALUES('Barba', 30, 3000, 1)"
+        ).lastrowid
+        web = conn.execute("INSERT INTO clients(client_key) VALUES('user_web')").lastrowid
+        wa = conn.execute("INSERT INTO clients(client_key) VALUES('5511999990000')").lastrowid
+        # 5 agendamentos amanhã, dois no mesmo horário (desempate por id)
+        for i, hour in enumerate((9, 10, 10, 11, 14)):
+            start = datetime.combine(TOMORROW, time(hour, 0), tzinfo=TZ)
+            conn.execute(
+                """
+                INSERT INTO appointments(client_id, barber_id, service_id, start_at, end_at, status)
+                VALUES(?, ?, ?, ?, ?, 'scheduled')
+                """,
+                (web if i % 2 else wa, b_id, s_id, start.isoformat(),
+                 (start + timedelta(minutes=30)).isoformat()),
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _pending() -> int:
+    conn = get_conn()
+    try:
+        return conn.execute("SELECT COUNT(*) FROM appointments WHERE reminder_sent_at IS NULL").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_batches_cover_every_appointment_once():
+    batches = list(iter_reminder_batches(TZ, batch_size=2))
+    assert [len(b) for b in batches] == [2, 2, 1]
+    ids = [a["id"] for b in batches for a in b]
+    assert len(set(ids)) == 5
+    assert batches[0][0]["barber_name"] == "Lote"
+    assert batches[0][0]["service_name"] == "Barba"
+    assert {a["client_key"] for b in batches for a in b} == {"user_web", "5511999990000"}
+
+
+def test_batch_query_uses_status_day_index():
+    conn = get_conn()
+    try:
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN " + REMINDER_BATCH_SQL, (TOMORROW.isoformat(), -1, 0, 10)
+        ).fetchall()
+    finally:
+        conn.close()
+    details = " ".join(r[3] for r in plan)
+    assert "idx_appointments_status_day" in details
+    assert "TEMP B-TREE" not in details
+
+
+def _outbox() -> list[tuple[str, str]]:
+    conn = get_conn()
+    try:
+        return [tuple(r) for r in conn.execute("SELECT channel, recipient FROM outbox WHERE status = 'pending' ORDER BY id")]
+    finally:
+        conn.close()
+
+
+def test_job_enqueues_reminders_in_batches():
+    summary = asyncio.run(run_reminders_job(TZ, batch_size=2))
+    assert {k: summary[k] for k in ("total", "enqueued", "failed")} == {"total": 5, "enqueued": 5, "failed": 0}
+    assert summary["duration_ms"] >= 0
+    # Entrega fica com o dispatcher: aqui só a outbox e a marcação
+    assert len(_outbox()) == 5
+    assert _pending() == 0
+
+
+def test_failed_batch_is_rolled_back_and_left_pending(monkeypatch):
+    real = reminders_24h.enqueue_reminder
+
+    def failing_enqueue(appointment, tz):
+        if appointment["id"] == 3:
+            raise RuntimeError("disco cheio")
+        return real(appointment, tz)
+
+    monkeypatch.setattr(reminders_24h, "enqueue_reminder", failing_enqueue)
+    summary = asyncio.run(run_reminders_job(TZ, batch_size=2))
+    assert {k: summary[k] for k in ("total", "enqueued", "failed")} == {"total": 5, "enqueued": 3, "failed": 2}
+    # O lote do id 3 (ids 3 e 4) foi desfeito inteiro: nada na outbox, nada marcado
+    assert len(_outbox()) == 3
+    assert _pending() == 2
+
+
+def test_message_uses_joined_names_without_lookup(monkeypatch):
+    monkeypatch.setattr(reminders_24h, "find_barber_by_id", lambda _id: pytest.fail("lookup"))
+    monkeypatch.setattr(reminders_24h, "find_service_by_id", lambda _id: pytest.fail("lookup"))
+    appt = next(iter_reminder_batches(TZ))[0]
+    msg = reminders_24h.format_reminder_message(appt, TZ)
+    assert "Lote" in msg and "Barba" in msg
@@ -0,0 +1,114 @@
+"""
+Testes do tracing de requisições (request id, etapas, amostragem, linha JSON).
+"""
+import asyncio
+import json
+import logging
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core import tracing
+from app.core.tracing import add_span, current_request_id, span, trace, traced
+from app.main import app
+from app.repositories.db import init_db, get_conn
+
+
+class _Capture(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.lines: list[dict] = []
+
+    def emit(self, record):
+        self.lines.append(json.loads(record.getMessage()))
+
+
+@pytest.fixture
+def traces(monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(tracing, "TRACE_SLOW_MS", 0.0)
+    capture = _Capture()
+    tracing.trace_logger.addHandler(capture)
+    yield capture.lines
+    tracing.trace_logger.removeHandler(capture)
+
+
+@traced("test.sync")
+def _sync_stage():
+    return current_request_id()
+
+
+@traced("test.async")
+async def _async_stage():
+    await asyncio.sleep(0)
+    # Etapas rodando em thread (asyncio.to_thread) entram no mesmo trace
+    return await asyncio.to_thread(_sync_stage)
+
+
+def test_stages_are_aggregated_into_one_json_line(traces):
+    with trace("job", "req-1", kind="test") as current:
+        assert _sync_stage() == "req-1"
+        assert asyncio.run(_async_stage()) == "req-1"
+        with span("test.block"):
+            pass
+        add_span("test.block", 0.002)
+    assert current_request_id() is None
+
+    [line] = traces
+    assert line["trace"] == "job" and line["request_id"] == "req-1"
+    assert line["kind"] == "test" and line["sampled"] == "random"
+    assert line["stages"]["test.sync"]["count"] == 2
+    assert line["stages"]["test.async"]["count"] == 1
+    assert line["stages"]["test.block"]["count"] == 2
+    assert line["stages"]["test.block"]["ms"] >= 2
+    assert line["duration_ms"] > 0
+
+
+def test_sampling_keeps_slow_traces_only(traces, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 0.0)
+    monkeypatch.setattr(tracing, "TRACE_SLOW_MS", 10_000.0)
+    with trace("fast"):
+        pass
+    monkeypatch.setattr(tracing, "TRACE_SLOW_MS", 0.001)
+    with trace("slow"):
+        add_span("test.block", 0.0)
+    assert [(line["trace"], line["sampled"]) for line in traces] == [("slow", "slow")]
+
+
+def test_disabled_tracing_still_sets_request_id(traces, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 0.0)
+    with trace("off", "req-2") as current:
+        assert current is None
+        assert current_request_id() == "req-2"
+        assert _sync_stage() == "req-2"
+        with span("test.block"):
+            pass
+    assert traces == []
+
+
+def test_http_request_traced_with_stage_breakdown(traces):
+    init_db()
+    conn = get_conn()
+    try:
+        conn.execute("DELETE FROM clients WHERE client_key = 'trace-client'")
+        conn.commit()
+    finally:
+        conn.close()
+
+    client = TestClient(app)
+    response = client.post(
+        "/chat/web",
+        json={"client_id": "trace-client", "message": "oi"},
+        headers={"X-Request-ID": "abc-123"},
+    )
+    assert response.status_code == 200
+    assert response.headers["x-request-id"] == "abc-123"
+
+    [line] = [line for line in traces if line["trace"] == "http"]
+    assert line["request_id"] == "abc-123"
+    assert (line["method"], line["path"], line["status"]) == ("POST", "/chat/web", 200)
+    assert {"db.load_or_create_session", "db.save_session", "nlu.analyze", "state.START"} <= set(line["stages"])
+
+    # Sem X-Request-ID (ou com um inválido), um id é gerado
+    response = client.get("/health", headers={"X-Request-ID": "id invalido!"})
+    assert len(response.headers["x-request-id"]) == 16
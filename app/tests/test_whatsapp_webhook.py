@@ -8,6 +8,7 @@ import hashlib
 from fastapi.testclient import TestClient
 from app.main import app
 from app.repositories.db import init_db, get_conn
+from app.services.inbound import inbound_queue
 
 client = TestClient(app)
 
@@ -16,7 +17,14 @@ client = TestClient(app)
 def setup_db_whatsapp():
     init_db()
     _seed()
-    yield
+    # O webhook só enfileira: com startup/shutdown a fila de entrada está ativa
+    with client:
+        yield
+
+
+def _drain():
+    """Espera a fila de entrada processar o que o webhook enfileirou."""
+    client.portal.call(inbound_queue.join)
 
 
 def _seed():
@@ -26,6 +34,7 @@ def _seed():
         conn.execute("DELETE FROM clients")
         conn.execute("DELETE FROM services")
         conn.execute("DELETE FROM barbers")
+        conn.execute("DELETE FROM processed_messages")
         
         conn.execute("INSERT INTO barbers(name, is_active) VALUES(?, 1)", ("João",))
         conn.execute("INSERT INTO services(name, duration_minutes, price_cents, is_active) VALUES(?, ?, ?, 1)",
@@ -127,28 +136,6 @@ def test_normalize_client_id():
     assert normalize_client_id("11987654321") == "wa:11987654321"
 
 
-def test_extract_message_from_webhook():
-    """Testa extração de mensagem do payload."""
-    from app.integrations.channels.whatsapp import extract_message_from_webhook
-    
-    payload = {
-        "entry": [{
-            "changes": [{
-                "value": {
-                    "messages": [{
-                        "from": "5511987654321",
-                        "text": {"body": "Olá!"},
-                        "type": "text"
-                    }]
-                }
-            }]
-        }]
-    }
-    
-    result = extract_message_from_webhook(payload)
-    assert result == ("5511987654321", "Olá!")
-
-
 def test_verify_webhook_signature():
     """Testa validação de assinatura."""
     from app.integrations.channels.whatsapp import verify_webhook_signature
@@ -169,3 +156,119 @@ def test_verify_webhook_signature():
     
     # Inválida
     assert verify_webhook_signature(body, "sha256=invalid", verify_token) is False
+
+
+def _batch_payload():
+    """Webhook com 2 entries, várias changes e tipos de mensagem variados."""
+    return {
+        "entry": [
+            {"changes": [
+                {"value": {"messages": [
+                    {"id": "m1", "from": "5511900000001", "type": "text", "text": {"body": "Oi"}},
+                    {"id": "m2", "from": "5511900000002", "type": "interactive",
+                     "interactive": {"type": "button_reply", "button_reply": {"id": "SLOT_14:00", "title": "14:00"}}},
+                ]}},
+                {"value": {"statuses": [{"id": "s1", "status": "delivered"}]}},
+            ]},
+            {"changes": [
+                {"value": {"messages": [
+                    {"id": "m3", "from": "5511900000003", "type": "image", "image": {"id": "img"}},
+                    {"id": "m4", "from": "5511900000001", "type": "interactive",
+                     "interactive": {"type": "list_reply", "list_reply": {"id": "APPT_5", "title": "Corte"}}},
+                    {"id": "m5", "from": "5511900000004", "type": "button",
+                     "button": {"payload": "SIM", "text": "Sim"}},
+                ]}},
+            ]},
+        ]
+    }
+
+
+def test_iter_webhook_messages_yields_every_message():
+    """Todas as mensagens do lote, em ordem, incluindo respostas de botões/listas."""
+    from app.integrations.channels.whatsapp import iter_webhook_messages
+
+    assert list(iter_webhook_messages(_batch_payload())) == [
+        ("m1", "5511900000001", "text", "Oi"),
+        ("m2", "5511900000002", "interactive", "SLOT_14:00"),
+        ("m3", "5511900000003", "image", None),
+        ("m4", "5511900000001", "interactive", "APPT_5"),
+        ("m5", "5511900000004", "button", "SIM"),
+    ]
+    assert list(iter_webhook_messages({"entry": [{}]})) == []
+
+
+def test_webhook_processes_every_message_in_batch():
+    """Cada mensagem processável do lote passa pela conversa (clientes criados)."""
+    from app.repositories.clients_repo import get_client_by_key
+
+    response = client.post("/webhook/whatsapp", json=_batch_payload())
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok"}
+    _drain()
+
+    for phone in ("5511900000001", "5511900000002", "5511900000004"):
+        assert get_client_by_key(f"wa:{phone}") is not None
+    # Mensagem de imagem ignorada
+    assert get_client_by_key("wa:5511900000003") is None
+
+
+def test_signature_verified_on_raw_bytes(monkeypatch):
+    """Assinatura calculada sobre os bytes brutos do corpo; inválida -> não processa."""
+    from app.api.routes import whatsapp as whatsapp_route
+    from app.integrations.channels.whatsapp import verify_webhook_signature
+
+    secret = "app_secret"
+    body = json.dumps({"entry": [{"changes": [{"value": {"messages": [{
+        "id": "wamid.signed", "from": "5511933334444", "type": "text", "text": {"body": "Olá ção"},
+    }]}}]}]}, ensure_ascii=False).encode("utf-8")
+    signature = "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+    assert verify_webhook_signature(body, signature, secret) is True
+    assert verify_webhook_signature(body, signature.replace("sha256", "sha1"), secret) is False
+    assert verify_webhook_signature(body + b" ", signature, secret) is False
+
+    monkeypatch.setattr(whatsapp_route, "WHATSAPP_VERIFY_TOKEN", secret)
+    headers = {"Content-Type": "application/json"}
+
+    bad = client.post("/webhook/whatsapp", content=body, headers={**headers, "X-Hub-Signature-256": "sha256=00"})
+    assert bad.json()["status"] != "ok"
+
+    ok = client.post("/webhook/whatsapp", content=body, headers={**headers, "X-Hub-Signature-256": signature})
+    assert ok.json() == {"status": "ok"}
+    _drain()
+    from app.repositories.clients_repo import get_client_by_key
+    assert get_client_by_key("wa:5511933334444") is not None
+
+
+def test_button_replies_drive_the_conversation():
+    """Clique nos botões que o bot enviou: do webhook até a troca de estado."""
+    from app.repositories.clients_repo import get_client_by_key, load_or_create_session, set_client_state_and_ctx
+
+    conn = get_conn()
+    try:
+        barber_id = conn.execute("SELECT id FROM barbers WHERE name = 'João'").fetchone()[0]
+        service_id = conn.execute("SELECT id FROM services WHERE name = 'Corte'").fetchone()[0]
+    finally:
+        conn.close()
+
+    def press(message_id, button_id):
+        payload = {"entry": [{"changes": [{"value": {"messages": [{
+            "id": message_id, "from": "5511955556666", "type": "interactive",
+            "interactive": {"type": "button_reply", "button_reply": {"id": button_id, "title": "..."}},
+        }]}}]}]}
+        assert client.post("/webhook/whatsapp", json=payload).status_code == 200
+        _drain()
+        row = get_client_by_key("wa:5511955556666")
+        return row["conversation_state"], json.loads(row["conversation_ctx_json"])
+
+    load_or_create_session("wa:5511955556666")
+    set_client_state_and_ctx("wa:5511955556666", "WAIT_BARBER", {})
+    state, ctx = press("wamid.btn.1", f"BARBER_{barber_id}")
+    assert state == "WAIT_SERVICE" and ctx["barber_id"] == barber_id
+
+    state, ctx = press("wamid.btn.2", f"SERVICE_{service_id}")
+    assert state == "WAIT_DATE" and ctx["service_id"] == service_id
+
+    set_client_state_and_ctx("wa:5511955556666", "WAIT_CANCEL_CONFIRMATION", {"cancel_appt_id": 1})
+    state, ctx = press("wamid.btn.3", "CANCEL_NO")
+    assert state == "START" and "cancel_appt_id" not in ctx